@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 class CustomUser(AbstractUser):
     DOCTOR = 'DOCTOR'
@@ -18,6 +19,16 @@ class CustomUser(AbstractUser):
     phone_number = models.CharField(max_length=15, blank=True)
     address = models.TextField(blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Ordering and prefix search of the patient directory (see patients/search.py)
+            models.Index(fields=['last_name', 'first_name'], name='user_name_idx'),
+            models.Index(Lower('first_name'), name='user_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('phone_number'), name='user_phone_lower_idx'),
+        ]
     
     def is_doctor(self):
         return self.role == self.DOCTOR
@@ -0,0 +1,133 @@
+"""
+Streaming bulk export of patient records and appointments.
+
+``/api/export/<dataset>/`` and ``manage.py export_data`` write a whole table
+as CSV or NDJSON (one JSON object per line) without paginating it: rows are
+read with ``values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE)`` (a
+server-side cursor on PostgreSQL, chunked fetches elsewhere), the patient and
+doctor names are joined in the same query, and each row is encoded and handed
+to the response or file as soon as it is read. No model instances are built
+and memory stays flat however large the table is.
+
+Rows come in ``updated_at`` order. With ``updated_since`` only the rows changed
+after that time are exported, so a nightly job can pass on the cursor its
+previous run returned (the ``X-Export-Next-Updated-Since`` header) and fetch
+just the changes. Writers stamp ``updated_at`` before they commit, so a row
+stamped just before an export started may only become visible after it read
+the table; the cursor is therefore the start time minus
+``EXPORT_CURSOR_OVERLAP`` seconds, and rows changed in that window (or during
+the export) appear again in the next one. Consumers should upsert by ``id``.
+
+Doctors only get the appointments they are the doctor of; staff get every row.
+The patient and doctor names are read at export time, but renaming a user does
+not touch ``updated_at``, so incremental exports don't resend the rows of a
+renamed user; a full export picks the new names up. Appointments moved to the
+archive table are not exported; they no longer change.
+"""
+import csv
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+from appointments.models import Appointment
+from patients.models import PatientRecord
+
+
+def full_name(prefix):
+    return Concat(f'{prefix}__first_name', Value(' '), f'{prefix}__last_name')
+
+
+# dataset: (model, columns); a column is a field lookup or an expression
+DATASETS = {
+    'patient-records': (PatientRecord, {
+        'id': 'id',
+        'patient': 'patient_id',
+        'patient_name': full_name('patient'),
+        'patient_email': 'patient__email',
+        'blood_group': 'blood_group',
+        'allergies': 'allergies',
+        'medical_history': 'medical_history',
+        'current_medications': 'current_medications',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }),
+    'appointments': (Appointment, {
+        'id': 'id',
+        'patient': 'patient_id',
+        'patient_name': full_name('patient'),
+        'doctor': 'doctor_id',
+        'doctor_name': full_name('doctor'),
+        'date': 'date',
+        'time': 'time',
+        'status': 'status',
+        'reason': 'reason',
+        'notes': 'notes',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }),
+}
+
+# dataset: the field limiting a doctor to their own rows
+DOCTOR_FIELDS = {
+    'appointments': 'doctor',
+}
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def get_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def get_cursor_overlap():
+    return getattr(settings, 'EXPORT_CURSOR_OVERLAP', 60)
+
+
+def next_cursor(started):
+    """The ``updated_since`` for the export after one that started at ``started``."""
+    return started - timedelta(seconds=get_cursor_overlap())
+
+
+def rows(dataset, updated_since=None, chunk_size=None, doctor=None):
+    """
+    The dataset's rows as tuples of its columns, in ``updated_at`` order; with
+    ``doctor``, only that doctor's rows of the datasets in ``DOCTOR_FIELDS``.
+    """
+    model, columns = DATASETS[dataset]
+    expressions = {name: column for name, column in columns.items() if not isinstance(column, str)}
+    queryset = model.objects.all()
+    if doctor is not None and dataset in DOCTOR_FIELDS:
+        queryset = queryset.filter(**{DOCTOR_FIELDS[dataset]: doctor})
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gt=updated_since)
+    # Names that are also model fields can't be annotations, so expressions get a prefix
+    queryset = queryset.annotate(**{f'export_{name}': expression for name, expression in expressions.items()})
+    lookups = [column if isinstance(column, str) else f'export_{name}' for name, column in columns.items()]
+    return queryset.order_by('updated_at', 'id').values_list(*lookups).iterator(chunk_size=chunk_size or get_chunk_size())
+
+
+class Echo:
+    """A file-like object whose ``write`` returns the text, for ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def render(dataset, rows, output='csv'):
+    """Encode ``rows`` one line at a time."""
+    columns = list(DATASETS[dataset][1])
+    if output == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from patients.models import PatientRecord, UpdateRequest
+from patients.review import EDITABLE_FIELDS
 from appointments.models import Appointment
+from .export import FORMATS
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -27,17 +29,27 @@ class UpdateRequestSerializer(serializers.ModelSerializer):
         model = UpdateRequest
         fields = ['id', 'patient', 'field_name', 'current_value', 'requested_value',
                  'reason', 'status', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        # Status only changes through the approve/reject actions
+        read_only_fields = ['id', 'status', 'created_at', 'updated_at']
+
+    def validate_field_name(self, value):
+        if value not in EDITABLE_FIELDS:
+            raise serializers.ValidationError(f'{value!r} cannot be changed by an update request')
+        return value
 
 class AppointmentSerializer(serializers.ModelSerializer):
     patient = UserSerializer(read_only=True)
     doctor = UserSerializer(read_only=True)
+    archived = serializers.SerializerMethodField()
     
     class Meta:
         model = Appointment
         fields = ['id', 'patient', 'doctor', 'date', 'time', 'status',
-                 'reason', 'notes', 'created_at', 'updated_at']
+                 'reason', 'notes', 'created_at', 'updated_at', 'archived']
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def get_archived(self, obj):
+        return getattr(obj, 'archived', False)
         
     def validate(self, data):
         """
@@ -45,3 +57,9 @@ class AppointmentSerializer(serializers.ModelSerializer):
         """
         # Add validation logic here if needed
         return data
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Query parameters of the export endpoint."""
+    # Not ``format``, which DRF reserves for choosing a renderer
+    output = serializers.ChoiceField(choices=list(FORMATS), default='csv')
+    updated_since = serializers.DateTimeField(required=False)
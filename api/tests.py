@@ -1,3 +1,176 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from appointments.models import Appointment
+from blog.models import BlogPost
+from patients.models import PatientRecord, UpdateRequest
 
-# Create your tests here.
+User = get_user_model()
+
+
+class DashboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(
+            username='testdoctor', password='testpass123', role='DOCTOR'
+        )
+        self.patient = User.objects.create_user(
+            username='testpatient', password='testpass123', role='PATIENT',
+            first_name='Test', last_name='Patient'
+        )
+        today = timezone.localdate()
+        for start, appointment_status in [(time(11), 'PENDING'), (time(9), 'APPROVED'), (time(10), 'CANCELLED')]:
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=today,
+                time=start, status=appointment_status, reason='Checkup'
+            )
+        UpdateRequest.objects.create(
+            patient=self.patient, field_name='allergies', current_value='',
+            requested_value='Pollen', reason='New allergy'
+        )
+        BlogPost.objects.create(
+            title='Draft', slug='draft', content='Draft content', author=self.doctor, status='DRAFT'
+        )
+
+    def test_dashboard_aggregates_in_few_queries(self):
+        self.client.force_authenticate(self.doctor)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('doctor-dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry['time'] for entry in response.data['agenda']], [time(9), time(11)])
+        self.assertEqual(response.data['agenda'][0]['patient_name'], 'Test Patient')
+        self.assertEqual(response.data['appointments']['PENDING'], 1)
+        self.assertEqual(response.data['appointments']['COMPLETED'], 0)
+        self.assertEqual(response.data['pending_update_requests'], 1)
+        self.assertEqual(response.data['draft_posts'], 1)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('doctor-dashboard'))
+
+    def test_patients_have_no_dashboard(self):
+        self.client.force_authenticate(self.patient)
+        response = self.client.get(reverse('doctor-dashboard'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class UpdateRequestActionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        self.update_request = UpdateRequest.objects.create(
+            patient=self.patient, field_name='blood_group', current_value='', requested_value='O+',
+            reason='Lab result'
+        )
+        self.url = reverse('update-request-approve', args=[self.update_request.id])
+
+    def test_patients_cannot_approve_their_own_requests(self):
+        self.client.force_authenticate(self.patient)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(UpdateRequest.objects.get().status, 'PENDING')
+        self.assertEqual(PatientRecord.objects.get(patient=self.patient).blood_group, '')
+
+    def test_doctors_approve_any_patients_request(self):
+        self.client.force_authenticate(self.doctor)
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(PatientRecord.objects.get(patient=self.patient).blood_group, 'O+')
+        response = self.client.post(reverse('update-request-reject', args=[self.update_request.id]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(
+            username='testdoctor', password='testpass123', role='DOCTOR', first_name='Ada', last_name='Hahn'
+        )
+        self.patients = [
+            User.objects.create_user(
+                username=f'patient{number}', password='testpass123', role='PATIENT',
+                first_name='Pat', last_name=f'Number {number}'
+            )
+            for number in range(3)
+        ]
+        day = timezone.localdate() + timedelta(days=1)
+        for number, patient in enumerate(self.patients):
+            Appointment.objects.create(
+                patient=patient, doctor=self.doctor, date=day, time=time(9 + number), reason='Checkup, "annual"'
+            )
+        # Changed long ago, so incremental exports leave it out
+        self.old = Appointment.objects.order_by('id').first()
+        Appointment.objects.filter(pk=self.old.pk).update(updated_at=timezone.now() - timedelta(days=30))
+
+    def export(self, dataset, **params):
+        response = self.client.get(reverse('data-export', args=[dataset]), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_streams_joined_names_in_one_query(self):
+        self.client.force_authenticate(self.doctor)
+        with self.assertNumQueries(1):
+            response, content = self.export('appointments')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('appointments.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 3)
+        # Oldest change first
+        self.assertEqual(rows[0]['id'], str(self.old.id))
+        self.assertEqual(rows[0]['doctor_name'], 'Ada Hahn')
+        self.assertEqual(rows[0]['patient_name'], 'Pat Number 0')
+        self.assertEqual(rows[0]['reason'], 'Checkup, "annual"')
+
+    def test_ndjson_and_updated_since(self):
+        self.client.force_authenticate(self.doctor)
+        since = timezone.now() - timedelta(days=1)
+        response, content = self.export('appointments', output='ndjson', updated_since=since.isoformat())
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['patient_name'] for row in rows], ['Pat Number 1', 'Pat Number 2'])
+        # The next cursor starts before this export did, to catch late commits
+        self.assertLessEqual(
+            datetime.fromisoformat(response['X-Export-Next-Updated-Since']),
+            timezone.now() - timedelta(seconds=settings.EXPORT_CURSOR_OVERLAP)
+        )
+
+        PatientRecord.objects.filter(patient=self.patients[0]).update(updated_at=since - timedelta(days=1))
+        response, content = self.export('patient-records', output='ndjson', updated_since=since.isoformat())
+        self.assertEqual([json.loads(line)['patient'] for line in content.splitlines()],
+                         [patient.id for patient in self.patients[1:]])
+
+    def test_doctors_export_only_their_appointments(self):
+        other = User.objects.create_user(username='otherdoctor', password='testpass123', role='DOCTOR')
+        Appointment.objects.create(
+            patient=self.patients[0], doctor=other, date=timezone.localdate() + timedelta(days=1), time=time(9)
+        )
+        self.client.force_authenticate(other)
+        response, content = self.export('appointments', output='ndjson')
+        self.assertEqual([json.loads(line)['doctor'] for line in content.splitlines()], [other.id])
+
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_authenticate(staff)
+        response, content = self.export('appointments', output='ndjson')
+        self.assertEqual(len(content.splitlines()), 4)
+
+    def test_only_staff_and_doctors_export(self):
+        self.client.force_authenticate(self.patients[0])
+        response = self.client.get(reverse('data-export', args=['appointments']))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.doctor)
+        response = self.client.get(reverse('data-export', args=['users']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_command_writes_the_same_export(self):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('export_data', 'patient-records', '--format', 'ndjson', stdout=stdout, stderr=stderr)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+        self.assertIn('Exported 3 rows', stderr.getvalue())
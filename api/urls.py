@@ -8,5 +8,7 @@ router.register(r'update-requests', views.UpdateRequestViewSet, basename='update
 router.register(r'appointments', views.AppointmentViewSet, basename='appointment')
 
 urlpatterns = [
+    path('dashboard/', views.DoctorDashboard.as_view(), name='doctor-dashboard'),
+    path('export/<slug:dataset>/', views.DataExport.as_view(), name='data-export'),
     path('', include(router.urls)),
 ]
@@ -1,15 +1,31 @@
 from django.shortcuts import render, get_object_or_404
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from blog.models import BlogPost
 from patients.models import PatientRecord, UpdateRequest
+from patients.review import review, validate_change
+from appointments.booking import save_booking
 from appointments.models import Appointment
+from appointments.stats import record_deleted
+from appointments.transitions import TransitionError, transition
+from appointments.views import ArchivedAppointmentsMixin
+from . import export
 from .serializers import (
     PatientRecordSerializer,
     UpdateRequestSerializer,
-    AppointmentSerializer
+    AppointmentSerializer,
+    ExportQuerySerializer,
 )
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
 class PatientRecordViewSet(viewsets.ModelViewSet):
     serializer_class = PatientRecordSerializer
@@ -20,8 +36,8 @@ class PatientRecordViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return PatientRecord.objects.all()
-        return PatientRecord.objects.filter(patient=user)
+            return PatientRecord.objects.select_related('patient')
+        return PatientRecord.objects.filter(patient=user).select_related('patient')
 
     def perform_create(self, serializer):
         serializer.save(patient=self.request.user)
@@ -39,31 +55,44 @@ class UpdateRequestViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(patient=self.request.user)
 
+    def decide(self, new_status):
+        """Review the request with ``patients.review``; returns it and the outcome."""
+        user = self.request.user
+        if not (user.is_staff or user.role == 'DOCTOR'):
+            raise PermissionDenied('Only doctors can approve/reject update requests')
+        # Reviewers decide any patient's requests, not just requests they made
+        update_request = get_object_or_404(UpdateRequest, pk=self.kwargs['pk'])
+        return update_request, review({update_request.pk: new_status})[update_request.pk]
+
+    def decision_error(self, update_request, outcome):
+        if outcome == 'conflict':
+            return Response(
+                {'error': 'This request has already been reviewed'},
+                status=status.HTTP_409_CONFLICT
+            )
+        if outcome == 'invalid':
+            return Response(
+                {'error': validate_change(update_request.field_name, update_request.requested_value)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return None
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
-        update_request = self.get_object()
-        update_request.status = 'APPROVED'
-        update_request.save()
-        
-        # Update the patient record
-        patient_record = update_request.patient.medical_record
-        setattr(patient_record, update_request.field_name, update_request.requested_value)
-        patient_record.save()
-        
-        return Response({'status': 'request approved'})
+        update_request, outcome = self.decide('APPROVED')
+        return self.decision_error(update_request, outcome) or Response({'status': 'request approved'})
 
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
-        update_request = self.get_object()
-        update_request.status = 'REJECTED'
-        update_request.save()
-        return Response({'status': 'request rejected'})
+        update_request, outcome = self.decide('REJECTED')
+        return self.decision_error(update_request, outcome) or Response({'status': 'request rejected'})
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(ArchivedAppointmentsMixin, viewsets.ModelViewSet):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['patient__username', 'doctor__username', 'status']
+    keyset_ordering = ('-date', '-time', '-id')
 
     def get_queryset(self):
         user = self.request.user
@@ -74,52 +103,112 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         doctor_id = self.request.data.get('doctor')
         doctor = get_object_or_404(get_user_model(), id=doctor_id, role='DOCTOR')
-        serializer.save(patient=self.request.user, doctor=doctor)
+        save_booking(serializer, patient=self.request.user, doctor=doctor)
+
+    def perform_update(self, serializer):
+        save_booking(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            record_deleted(instance)
+
+    def change_status(self, pk, new_status):
+        try:
+            transition(self.get_queryset(), pk, new_status, self.request.user)
+        except TransitionError as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
+        return Response({'status': f'appointment {new_status.lower()}'})
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
-        appointment = self.get_object()
-        if request.user != appointment.doctor:
-            return Response(
-                {'error': 'Only the assigned doctor can approve appointments'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        appointment.status = 'APPROVED'
-        appointment.save()
-        return Response({'status': 'appointment approved'})
+        return self.change_status(pk, 'APPROVED')
 
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
-        appointment = self.get_object()
-        if request.user != appointment.doctor:
-            return Response(
-                {'error': 'Only the assigned doctor can reject appointments'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        appointment.status = 'REJECTED'
-        appointment.save()
-        return Response({'status': 'appointment rejected'})
+        return self.change_status(pk, 'REJECTED')
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
-        appointment = self.get_object()
-        if request.user != appointment.patient:
-            return Response(
-                {'error': 'Only the patient can cancel their appointments'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        appointment.status = 'CANCELLED'
-        appointment.save()
-        return Response({'status': 'appointment cancelled'})
+        return self.change_status(pk, 'CANCELLED')
 
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
-        appointment = self.get_object()
-        if request.user != appointment.doctor:
-            return Response(
-                {'error': 'Only the assigned doctor can complete appointments'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        appointment.status = 'COMPLETED'
-        appointment.save()
-        return Response({'status': 'appointment completed'})
+        return self.change_status(pk, 'COMPLETED')
+
+class DoctorDashboard(APIView):
+    """
+    Everything the doctor dashboard shows, in four queries: today's agenda,
+    appointment counts by status, pending update requests and draft posts.
+    Cached per doctor for ``DASHBOARD_CACHE_TIMEOUT`` seconds.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        if request.user.role != 'DOCTOR':
+            raise PermissionDenied("Only doctors have a dashboard")
+        key = f'dashboard:{request.user.pk}'
+        data = cache.get(key)
+        if data is None:
+            data = self.build(request.user)
+            cache.set(key, data, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 10))
+        return Response(data)
+
+    def build(self, doctor):
+        today = timezone.localdate()
+        agenda = Appointment.objects.filter(doctor=doctor, date=today).exclude(
+            status__in=['REJECTED', 'CANCELLED']
+        ).select_related('patient').only(
+            'time', 'status', 'reason', 'patient__first_name', 'patient__last_name'
+        ).order_by('time')
+
+        counts = dict.fromkeys((value for value, _ in Appointment.STATUS_CHOICES), 0)
+        counts.update(
+            Appointment.objects.filter(doctor=doctor).order_by().values('status')
+            .annotate(count=Count('id')).values_list('status', 'count')
+        )
+
+        return {
+            'date': today,
+            'agenda': [
+                {
+                    'id': appointment.id,
+                    'time': appointment.time,
+                    'status': appointment.status,
+                    'reason': appointment.reason,
+                    'patient': appointment.patient_id,
+                    'patient_name': f"{appointment.patient.first_name} {appointment.patient.last_name}",
+                }
+                for appointment in agenda
+            ],
+            'appointments': counts,
+            'pending_update_requests': UpdateRequest.objects.filter(status='PENDING').count(),
+            'draft_posts': BlogPost.objects.filter(author=doctor, status='DRAFT').count(),
+        }
+
+class DataExport(APIView):
+    """
+    A whole table as a streamed CSV or NDJSON download for reporting:
+    ``export/patient-records/`` or ``export/appointments/``, with
+    ``?output=ndjson`` and ``?updated_since=`` (see ``api/export.py``).
+    Staff and doctors only; doctors get only their own appointments.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, dataset, format=None):
+        if not (request.user.is_staff or request.user.role == 'DOCTOR'):
+            raise PermissionDenied("Only staff and doctors can export data")
+        if dataset not in export.DATASETS:
+            return Response({'error': f'Unknown dataset: {dataset}'}, status=status.HTTP_404_NOT_FOUND)
+        query = ExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        output = query.validated_data['output']
+        started = timezone.now()
+        content_type, extension = export.FORMATS[output]
+        doctor = None if request.user.is_staff else request.user
+        rows = export.rows(dataset, query.validated_data.get('updated_since'), doctor=doctor)
+        response = StreamingHttpResponse(export.render(dataset, rows, output), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{extension}"'
+        # The updated_since of the next incremental export
+        response['X-Export-Next-Updated-Since'] = export.next_cursor(started).isoformat()
+        return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment
+from .models import Appointment, AppointmentDailyStat, CalendarToken, ScheduleException, WeeklySchedule
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
@@ -7,3 +7,26 @@ class AppointmentAdmin(admin.ModelAdmin):
     list_filter = ('status', 'date', 'doctor')
     search_fields = ('patient__username', 'doctor__username', 'reason')
     date_hierarchy = 'date'
+
+@admin.register(WeeklySchedule)
+class WeeklyScheduleAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'weekday', 'start_time', 'end_time', 'slot_minutes')
+    list_filter = ('weekday', 'doctor')
+
+@admin.register(ScheduleException)
+class ScheduleExceptionAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'date', 'start_time', 'end_time', 'is_available', 'reason')
+    list_filter = ('is_available', 'doctor')
+    date_hierarchy = 'date'
+
+@admin.register(CalendarToken)
+class CalendarTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created_at')
+    search_fields = ('user__username',)
+    exclude = ('token',)
+
+@admin.register(AppointmentDailyStat)
+class AppointmentDailyStatAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'date', 'status', 'count')
+    list_filter = ('status', 'doctor')
+    date_hierarchy = 'date'
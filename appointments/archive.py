@@ -0,0 +1,68 @@
+"""
+Hot/cold storage of appointments.
+
+Finished appointments (completed, cancelled or rejected) older than
+``APPOINTMENT_ARCHIVE_AFTER_DAYS`` are moved, in batches, from ``Appointment``
+to ``ArchivedAppointment`` by ``manage.py archive_appointments``. Each batch is
+copied and deleted in its own transaction, so the command can be stopped and
+rerun at any point and never holds locks for long.
+
+The appointment lists read the hot table only. With ``?include_archived=1``
+they read ``with_archived``: both tables filtered alike and combined with
+``UNION ALL``, which yields ``Appointment`` instances carrying an
+``archived`` flag.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from .models import Appointment, ArchivedAppointment
+
+ARCHIVED_STATUSES = ('COMPLETED', 'CANCELLED', 'REJECTED')
+
+# The columns both tables share, in the order both models declare them
+FIELDS = [field.name for field in Appointment._meta.concrete_fields]
+
+
+def get_cutoff(days=None):
+    """Finished appointments dated before this are archived."""
+    if days is None:
+        days = getattr(settings, 'APPOINTMENT_ARCHIVE_AFTER_DAYS', 180)
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    return Appointment.objects.filter(status__in=ARCHIVED_STATUSES, date__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to ``batch_size`` archivable appointments; returns how many moved."""
+    with transaction.atomic():
+        rows = list(archivable(cutoff).order_by('id').values(
+            *[field.attname for field in Appointment._meta.concrete_fields]
+        )[:batch_size])
+        if not rows:
+            return 0
+        ArchivedAppointment.objects.bulk_create([ArchivedAppointment(**row) for row in rows])
+        # Finished statuses are final (see transitions.TRANSITIONS), so the
+        # copied rows can't have changed since they were read
+        ids = [row['id'] for row in rows]
+        Appointment.objects.filter(pk__in=ids).delete()
+        return len(ids)
+
+
+def archive(cutoff, batch_size=1000):
+    total = 0
+    while moved := archive_batch(cutoff, batch_size):
+        total += moved
+    return total
+
+
+def with_archived(hot, cold, ordering):
+    """``hot`` (Appointments) and ``cold`` (ArchivedAppointments) as one ordered queryset."""
+    hot = hot.order_by().only(*FIELDS).annotate(archived=Value(False))
+    cold = cold.order_by().only(*FIELDS).annotate(archived=Value(True))
+    return hot.union(cold, all=True).order_by(*ordering)
@@ -0,0 +1,130 @@
+"""
+Free appointment slots.
+
+A doctor's working hours come from their ``WeeklySchedule`` blocks, adjusted
+per date by ``ScheduleException`` rows, and are cut into slots of the block's
+``slot_minutes``. A slot is taken when a pending or approved appointment
+overlaps it (an appointment is assumed to last one slot). ``free_slots`` needs
+three queries whatever the number of doctors and days: schedules, exceptions,
+and one range scan over the ``(doctor, date, time)`` index for the bookings.
+Everything else is done in memory.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import time, timedelta
+from functools import lru_cache
+
+from django.utils import timezone
+
+from .models import Appointment, ScheduleException, WeeklySchedule
+
+BLOCKING_STATUSES = Appointment.ACTIVE_STATUSES
+DEFAULT_SLOT_MINUTES = 30
+
+
+TIMES = [time(minute // 60, minute % 60) for minute in range(24 * 60)]
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    return TIMES[minutes]
+
+
+@lru_cache(maxsize=1024)
+def slot_starts(start, end, slot):
+    return tuple(range(start, end - slot + 1, slot))
+
+
+def subtract(windows, start, end):
+    """Remove ``[start, end)`` from a list of ``(start, end, slot)`` windows."""
+    result = []
+    for window_start, window_end, slot in windows:
+        if end <= window_start or start >= window_end:
+            result.append((window_start, window_end, slot))
+            continue
+        if window_start < start:
+            result.append((window_start, start, slot))
+        if end < window_end:
+            result.append((end, window_end, slot))
+    return result
+
+
+def working_windows(weekly, exceptions, day):
+    """``[(start_minute, end_minute, slot_minutes), ...]`` for one doctor and date."""
+    windows = list(weekly.get(day.weekday(), ()))
+    for exception in exceptions.get(day, ()):
+        if exception.start_time is None:
+            if not exception.is_available:
+                return []
+            continue
+        start, end = to_minutes(exception.start_time), to_minutes(exception.end_time)
+        if exception.is_available:
+            slot = exception.slot_minutes or (windows[0][2] if windows else DEFAULT_SLOT_MINUTES)
+            windows.append((start, end, slot))
+        else:
+            windows = subtract(windows, start, end)
+    return sorted(windows)
+
+
+def free_slots(doctor_ids, start_date, end_date, now=None):
+    """
+    Free slots for each doctor between ``start_date`` and ``end_date``
+    (inclusive), as ``{doctor_id: {date: [(time, slot_minutes), ...]}}``.
+    Days without a free slot are left out. Slots that have already started
+    are not offered.
+    """
+    now = timezone.localtime(now)
+    doctor_ids = list(doctor_ids)
+
+    weekly = defaultdict(lambda: defaultdict(list))
+    for block in WeeklySchedule.objects.filter(doctor_id__in=doctor_ids):
+        weekly[block.doctor_id][block.weekday].append(
+            (to_minutes(block.start_time), to_minutes(block.end_time), block.slot_minutes)
+        )
+
+    exceptions = defaultdict(lambda: defaultdict(list))
+    for exception in ScheduleException.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(start_date, end_date)
+    ):
+        exceptions[exception.doctor_id][exception.date].append(exception)
+
+    booked = defaultdict(list)
+    for doctor_id, date, start in Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        date__range=(start_date, end_date),
+        status__in=BLOCKING_STATUSES,
+    ).order_by().values_list('doctor_id', 'date', 'time'):
+        booked[doctor_id, date].append(to_minutes(start))
+    for minutes in booked.values():
+        minutes.sort()
+
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    today, current = now.date(), to_minutes(now)
+    result = {}
+    for doctor_id in doctor_ids:
+        doctor_days = {}
+        for day in days:
+            if day < today:
+                continue
+            taken = booked.get((doctor_id, day), ())
+            earliest = current + 1 if day == today else 0
+            slots = []
+            seen = set()
+            for window_start, window_end, slot in working_windows(weekly[doctor_id], exceptions[doctor_id], day):
+                for minute in slot_starts(window_start, window_end, slot):
+                    if minute < earliest or minute in seen:
+                        continue
+                    seen.add(minute)
+                    if taken:
+                        # Taken if any booking starts less than one slot before or after
+                        index = bisect_left(taken, minute - slot + 1)
+                        if index < len(taken) and taken[index] < minute + slot:
+                            continue
+                    slots.append((TIMES[minute], slot))
+            if slots:
+                doctor_days[day] = slots
+        result[doctor_id] = doctor_days
+    return result
@@ -0,0 +1,43 @@
+"""
+Booking a slot.
+
+A doctor can't have two active (pending or approved) appointments at the same
+date and time. Checking first and inserting afterwards leaves a window in which
+two requests both see the slot free, so the rule is enforced by the
+``appointment_unique_active_slot`` partial unique index instead: the database
+lets exactly one insert through and the others fail with ``IntegrityError``,
+without locking the table. ``save_booking`` turns that failure into a 409.
+"""
+from django.db import IntegrityError, transaction
+
+from .exceptions import SlotUnavailable
+from .models import Appointment
+
+
+def slot_taken(doctor, date, time, exclude=None):
+    appointments = Appointment.objects.filter(
+        doctor=doctor, date=date, time=time, status__in=Appointment.ACTIVE_STATUSES
+    )
+    if exclude is not None:
+        appointments = appointments.exclude(pk=exclude)
+    return appointments.exists()
+
+
+def save_booking(serializer, **kwargs):
+    """
+    ``serializer.save(**kwargs)`` in a savepoint, raising ``SlotUnavailable``
+    if another active appointment already holds the slot.
+    """
+    try:
+        with transaction.atomic():
+            return serializer.save(**kwargs)
+    except IntegrityError:
+        data = {**serializer.validated_data, **kwargs}
+        instance = serializer.instance
+        slot = {
+            name: data[name] if name in data else getattr(instance, name, None)
+            for name in ('doctor', 'date', 'time')
+        }
+        if slot_taken(**slot, exclude=getattr(instance, 'pk', None)):
+            raise SlotUnavailable()
+        raise
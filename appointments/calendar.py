@@ -0,0 +1,117 @@
+"""
+iCalendar (``.ics``) feed of a doctor's appointments.
+
+Calendar apps poll the feed every few minutes, usually with nothing new. The
+feed's ETag is built from one aggregate query (count and latest ``updated_at``
+of the appointments it covers, joined through the token), so an unchanged
+calendar costs that query and a 304. Otherwise the events are streamed from an
+``iterator()`` over the columns they need, without building the whole
+document in memory.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.http import Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from .availability import DEFAULT_SLOT_MINUTES
+from .models import Appointment, CalendarToken
+
+EVENT_STATUSES = {
+    'PENDING': 'TENTATIVE',
+    'APPROVED': 'CONFIRMED',
+    'COMPLETED': 'CONFIRMED',
+    'REJECTED': 'CANCELLED',
+    'CANCELLED': 'CANCELLED',
+}
+
+
+def get_since():
+    """Appointments before this date are left out of the feed."""
+    return timezone.localdate() - timedelta(days=getattr(settings, 'CALENDAR_PAST_DAYS', 90))
+
+
+def escape_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces, as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Don't cut a multi-byte character in half
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(appointment, host):
+    start = timezone.make_aware(datetime.combine(appointment.date, appointment.time))
+    patient = appointment.patient
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:appointment-{appointment.id}@{host}',
+        f'DTSTAMP:{format_utc(appointment.updated_at)}',
+        f'LAST-MODIFIED:{format_utc(appointment.updated_at)}',
+        f'DTSTART:{format_utc(start)}',
+        f'DTEND:{format_utc(start + timedelta(minutes=DEFAULT_SLOT_MINUTES))}',
+        f'SUMMARY:{escape_text(f"Appointment with {patient.first_name} {patient.last_name}".strip())}',
+        f'DESCRIPTION:{escape_text(appointment.reason)}',
+        f'STATUS:{EVENT_STATUSES[appointment.status]}',
+        'END:VEVENT',
+    ]
+    return ''.join(fold(line) for line in lines)
+
+
+def render_calendar(doctor_id, since, host):
+    yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Homoeo Clinic//Appointments//EN\r\n'
+    yield 'CALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\nX-WR-CALNAME:Homoeo Clinic appointments\r\n'
+    appointments = Appointment.objects.filter(doctor_id=doctor_id, date__gte=since).select_related('patient').only(
+        'id', 'date', 'time', 'status', 'reason', 'updated_at', 'patient__first_name', 'patient__last_name'
+    ).order_by('date', 'time')
+    for appointment in appointments.iterator(chunk_size=500):
+        yield render_event(appointment, host)
+    yield 'END:VCALENDAR\r\n'
+
+
+@require_safe
+def calendar_feed(request, token):
+    since = get_since()
+    recent = Q(user__doctor_appointments__date__gte=since)
+    feed = CalendarToken.objects.filter(
+        token=token, user__role='DOCTOR', user__is_active=True
+    ).values('user_id').annotate(
+        count=Count('user__doctor_appointments', filter=recent),
+        latest=Max('user__doctor_appointments__updated_at', filter=recent),
+    ).order_by('user_id').first()
+    if feed is None:
+        raise Http404('No such calendar')
+
+    latest = feed['latest'].timestamp() if feed['latest'] else 0
+    etag = f'"{feed["user_id"]}-{since.isoformat()}-{feed["count"]}-{latest}"'
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and etag in parse_etags(if_none_match):
+        response = HttpResponseNotModified()
+    else:
+        response = StreamingHttpResponse(
+            render_calendar(feed['user_id'], since, request.get_host().split(':')[0]),
+            content_type='text/calendar; charset=utf-8'
+        )
+        response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,113 @@
+"""
+Server-sent events for appointment changes.
+
+New bookings and status changes are published, once their transaction has
+committed, to the channels of the doctor and the patient involved (see
+``appointments/signals.py``). ``/api/appointments/events/`` streams a user's
+channel as ``text/event-stream``, so the front end can react to a booking
+instead of polling the appointment list.
+
+The view is async: an idle connection is a suspended coroutine waiting on its
+queue, not a worker thread. It must be served by an ASGI server (uvicorn,
+daphne); under WSGI the stream would hold a worker for its whole life. Each
+stream ends after ``APPOINTMENT_EVENTS_MAX_AGE`` seconds and ``EventSource``
+reconnects, which also frees subscriptions of clients that went away without
+the server noticing.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from homoeoclinic_backend.pubsub import get_broker
+from .models import Appointment
+
+FIELDS = ('id', 'doctor_id', 'patient_id', 'date', 'time', 'status')
+
+
+def channel_for(user_id):
+    return f'appointments:user:{user_id}'
+
+
+def publish(event, rows):
+    """Send ``event`` for each appointment row (a dict of ``FIELDS``) to both parties."""
+    broker = get_broker()
+    for row in rows:
+        message = {
+            'event': event,
+            'appointment': {
+                'id': row['id'],
+                'doctor': row['doctor_id'],
+                'patient': row['patient_id'],
+                'date': row['date'],
+                'time': row['time'],
+                'status': row['status'],
+            },
+        }
+        broker.publish(channel_for(row['doctor_id']), message)
+        broker.publish(channel_for(row['patient_id']), message)
+
+
+def publish_created(appointment):
+    publish('appointment.created', [{name: getattr(appointment, name) for name in FIELDS}])
+
+
+def publish_status_changed(appointment_ids):
+    publish('appointment.status_changed', Appointment.objects.filter(pk__in=appointment_ids).values(*FIELDS))
+
+
+def get_token(request):
+    # EventSource can't send headers, so the access token may come in the query string
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    return request.GET.get('token')
+
+
+def authenticate(request):
+    raw_token = get_token(request)
+    if not raw_token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def format_event(message):
+    data = json.dumps(message['appointment'], cls=JSONEncoder)
+    return f'event: {message["event"]}\ndata: {data}\n\n'
+
+
+async def stream(user_id):
+    keepalive = getattr(settings, 'APPOINTMENT_EVENTS_KEEPALIVE', 15)
+    deadline = time.monotonic() + getattr(settings, 'APPOINTMENT_EVENTS_MAX_AGE', 300)
+    async with get_broker().subscribe(channel_for(user_id)) as queue:
+        yield 'retry: 5000\n\n'
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                message = await asyncio.wait_for(queue.get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(message)
+
+
+async def appointment_events(request):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    user = await sync_to_async(authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    response = StreamingHttpResponse(stream(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from appointments import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move completed, cancelled and rejected appointments older than '
+        'APPOINTMENT_ARCHIVE_AFTER_DAYS into the archive table, one batch per transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive appointments older than this many days.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived.')
+
+    def handle(self, *args, **options):
+        cutoff = archive.get_cutoff(options['days'])
+        if options['dry_run']:
+            count = archive.archivable(cutoff).count()
+            self.stdout.write(f'{count} appointments dated before {cutoff} would be archived.')
+            return
+        total = archive.archive(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} appointments dated before {cutoff}.'))
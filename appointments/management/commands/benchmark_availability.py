@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from appointments.availability import BLOCKING_STATUSES, free_slots, to_minutes, to_time
+from appointments.models import Appointment, ScheduleException, WeeklySchedule
+
+
+class Command(BaseCommand):
+    help = (
+        'Time free-slot queries for many doctors over a date range against a per-slot '
+        'lookup baseline, on generated schedules and bookings. Runs inside a transaction '
+        'that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--history-days', type=int, default=365,
+                            help='Days of past bookings to generate so the table is not trivially small.')
+        parser.add_argument('--booked', type=float, default=0.4, help='Share of slots already booked.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = timezone.localdate() + timedelta(days=1)
+        end = start + timedelta(days=options['days'] - 1)
+        with transaction.atomic():
+            doctor_ids = self.generate(options, rng, start, end)
+            self.stdout.write(f'{Appointment.objects.count()} appointments, {len(doctor_ids)} doctors, '
+                              f'{options["days"]} days')
+
+            timings = []
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    slots = free_slots(doctor_ids, start, end)
+                    timings.append((time.perf_counter() - started) * 1000)
+            free = sum(len(day) for days in slots.values() for day in days.values())
+            self.stdout.write(f'free_slots: median {statistics.median(timings):.1f} ms, '
+                              f'max {max(timings):.1f} ms, {len(queries)} queries, {free} free slots')
+
+            started = time.perf_counter()
+            naive_free, naive_queries = self.per_slot_lookup(doctor_ids, start, end)
+            self.stdout.write(f'per-slot exists(): {(time.perf_counter() - started) * 1000:.1f} ms, '
+                              f'{naive_queries} queries, {naive_free} free slots')
+            transaction.set_rollback(True)
+
+    def generate(self, options, rng, start, end):
+        User = get_user_model()
+        patient = User.objects.create_user(username='benchmark-patient', role='PATIENT')
+        doctor_ids = []
+        schedules, exceptions, appointments = [], [], []
+        for number in range(options['doctors']):
+            doctor = User.objects.create_user(username=f'benchmark-doctor-{number}', role='DOCTOR')
+            doctor_ids.append(doctor.id)
+            slot = rng.choice([15, 20, 30])
+            for weekday in range(6):
+                schedules.append(WeeklySchedule(doctor=doctor, weekday=weekday, slot_minutes=slot,
+                                                start_time=to_time(9 * 60), end_time=to_time(13 * 60)))
+                schedules.append(WeeklySchedule(doctor=doctor, weekday=weekday, slot_minutes=slot,
+                                                start_time=to_time(14 * 60), end_time=to_time(18 * 60)))
+            exceptions.append(ScheduleException(doctor=doctor, date=start + timedelta(days=rng.randrange(options['days']))))
+
+            day = start - timedelta(days=options['history_days'])
+            while day <= end:
+                if day.weekday() < 6:
+                    for minute in list(range(9 * 60, 13 * 60, slot)) + list(range(14 * 60, 18 * 60, slot)):
+                        if rng.random() < options['booked']:
+                            appointments.append(Appointment(
+                                patient=patient, doctor=doctor, date=day, time=to_time(minute),
+                                status=rng.choice(BLOCKING_STATUSES if day >= start else ['COMPLETED', 'CANCELLED']),
+                                reason='Benchmark',
+                            ))
+                day += timedelta(days=1)
+        WeeklySchedule.objects.bulk_create(schedules)
+        ScheduleException.objects.bulk_create(exceptions)
+        Appointment.objects.bulk_create(appointments, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Appointment._meta.db_table}')
+        return doctor_ids
+
+    def per_slot_lookup(self, doctor_ids, start, end):
+        """The approach the index replaces: one exists() per candidate slot."""
+        free = queries = 0
+        for doctor_id in doctor_ids:
+            blocks = list(WeeklySchedule.objects.filter(doctor_id=doctor_id))
+            queries += 1
+            day = start
+            while day <= end:
+                for block in blocks:
+                    if block.weekday != day.weekday():
+                        continue
+                    for minute in range(to_minutes(block.start_time), to_minutes(block.end_time), block.slot_minutes):
+                        queries += 1
+                        if not Appointment.objects.filter(
+                            doctor_id=doctor_id, date=day, time=to_time(minute), status__in=BLOCKING_STATUSES
+                        ).exists():
+                            free += 1
+                day += timedelta(days=1)
+        return free, queries
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from appointments import stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-doctor, per-day appointment statistics from the appointment and archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = stats.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} appointment statistics rows.'))
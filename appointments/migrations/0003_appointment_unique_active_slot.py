@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+ACTIVE_STATUSES = ('PENDING', 'APPROVED')
+
+
+def cancel_double_bookings(apps, schema_editor):
+    """
+    Before the constraint, two patients could hold the same slot. Keep one
+    active appointment per doctor, date and time (the approved one, else the
+    earliest booked) and cancel the others so the constraint can be added.
+    """
+    Appointment = apps.get_model('appointments', 'Appointment')
+    active = Appointment.objects.filter(status__in=ACTIVE_STATUSES)
+    slots = active.order_by().values('doctor_id', 'date', 'time').annotate(
+        count=models.Count('id')
+    ).filter(count__gt=1)
+    cancelled = []
+    for slot in slots.iterator():
+        rows = active.filter(doctor_id=slot['doctor_id'], date=slot['date'], time=slot['time']).values_list(
+            'id', 'status', 'created_at'
+        )
+        keep = min(rows, key=lambda row: (row[1] != 'APPROVED', row[2], row[0]))
+        cancelled.extend(row[0] for row in rows if row[0] != keep[0])
+    if cancelled:
+        Appointment.objects.filter(pk__in=cancelled).update(status='CANCELLED')
+        print(f'\n  Cancelled {len(cancelled)} double-booked appointments: {sorted(cancelled)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_availability'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('PENDING', 'APPROVED'))), fields=('doctor', 'date', 'time'), name='appointment_unique_active_slot'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_existing_appointments(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    ArchivedAppointment = apps.get_model('appointments', 'ArchivedAppointment')
+    AppointmentDailyStat = apps.get_model('appointments', 'AppointmentDailyStat')
+    counts = {}
+    for model in (Appointment, ArchivedAppointment):
+        rows = model.objects.order_by().values_list('doctor_id', 'date', 'status').annotate(count=models.Count('id'))
+        for doctor_id, date, status, count in rows:
+            counts[doctor_id, date, status] = counts.get((doctor_id, date, status), 0) + count
+    AppointmentDailyStat.objects.bulk_create(
+        [AppointmentDailyStat(doctor_id=doctor_id, date=date, status=status, count=count)
+         for (doctor_id, date, status), count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0005_archivedappointment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointment_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['doctor', 'date', 'status'],
+                'indexes': [models.Index(fields=['date'], name='appointment_date_4e3d44_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentdailystat',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date', 'status'), name='appointmentdailystat_unique_key'),
+        ),
+        migrations.RunPython(count_existing_appointments, migrations.RunPython.noop),
+    ]
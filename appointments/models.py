@@ -1,6 +1,12 @@
+import secrets
+
 from django.db import models
 from django.conf import settings
 
+# Statuses that hold a slot; at most one such appointment per doctor, date and time
+ACTIVE_STATUSES = ('PENDING', 'APPROVED')
+
+
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -9,6 +15,7 @@ class Appointment(models.Model):
         ('COMPLETED', 'Completed'),
         ('CANCELLED', 'Cancelled'),
     ]
+    ACTIVE_STATUSES = ACTIVE_STATUSES
     
     patient = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -34,6 +41,181 @@ class Appointment(models.Model):
 
     class Meta:
         ordering = ['-date', '-time']
+        indexes = [
+            models.Index(fields=['doctor', 'date', 'time']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='appointment_unique_active_slot'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.patient}'s appointment with Dr. {self.doctor} on {self.date}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets appointments.stats move the appointment between rollup rows on save
+        instance._loaded_stat_key = (
+            instance.__dict__.get('doctor_id'), instance.__dict__.get('date'), instance.__dict__.get('status')
+        )
+        # Lets appointments.reminders notice approvals and reschedules on save
+        instance._loaded_schedule = (
+            instance.__dict__.get('date'), instance.__dict__.get('time'), instance.__dict__.get('status')
+        )
+        return instance
+
+class ArchivedAppointment(models.Model):
+    """
+    A finished appointment moved out of the hot ``Appointment`` table by the
+    ``archive_appointments`` command. It keeps its original id, and its fields
+    follow ``Appointment``'s in the same order so the two tables can be read
+    with one ``UNION`` (see ``appointments/archive.py``).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_patient_appointments'
+    )
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_doctor_appointments'
+    )
+    date = models.DateField()
+    time = models.TimeField()
+    status = models.CharField(max_length=10, choices=Appointment.STATUS_CHOICES)
+    reason = models.TextField()
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', '-time']
+        indexes = [
+            models.Index(fields=['doctor', 'date', 'time']),
+            models.Index(fields=['patient', 'date', 'time']),
+        ]
+
+    def __str__(self):
+        return f"{self.patient}'s archived appointment with Dr. {self.doctor} on {self.date}"
+
+class AppointmentDailyStat(models.Model):
+    """
+    Number of appointments per doctor, date and status, kept current as
+    appointments are booked, moved and change status (see
+    ``appointments/stats.py``). Archived appointments stay counted.
+    """
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='appointment_stats'
+    )
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=Appointment.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['doctor', 'date', 'status']
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date', 'status'], name='appointmentdailystat_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"Dr. {self.doctor} on {self.date}: {self.count} {self.status.lower()}"
+
+class WeeklySchedule(models.Model):
+    """A recurring block of working hours, cut into bookable slots of ``slot_minutes``."""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='weekly_schedules'
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+
+    class Meta:
+        ordering = ['doctor', 'weekday', 'start_time']
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(end_time__gt=models.F('start_time')),
+                name='weeklyschedule_end_after_start'
+            ),
+            models.CheckConstraint(check=models.Q(slot_minutes__gt=0), name='weeklyschedule_positive_slot'),
+        ]
+
+    def __str__(self):
+        return f"Dr. {self.doctor} on {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+class ScheduleException(models.Model):
+    """
+    A one-off change to a doctor's week. Without times it covers the whole
+    day; ``is_available=False`` takes the hours off, ``is_available=True``
+    adds extra hours.
+    """
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='schedule_exceptions'
+    )
+    date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    is_available = models.BooleanField(default=False)
+    slot_minutes = models.PositiveSmallIntegerField(null=True, blank=True)
+    reason = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['doctor', 'date', 'start_time']
+        indexes = [
+            models.Index(fields=['doctor', 'date']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(start_time__isnull=True, end_time__isnull=True)
+                    | models.Q(end_time__gt=models.F('start_time'))
+                ),
+                name='scheduleexception_valid_window'
+            ),
+        ]
+
+    def __str__(self):
+        kind = 'available' if self.is_available else 'unavailable'
+        return f"Dr. {self.doctor} {kind} on {self.date}"
+
+def make_calendar_token():
+    return secrets.token_urlsafe(32)
+
+class CalendarToken(models.Model):
+    """Secret that lets a calendar app poll a doctor's ``.ics`` feed without logging in."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_token'
+    )
+    token = models.CharField(max_length=64, unique=True, default=make_calendar_token)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Calendar token of {self.user}"
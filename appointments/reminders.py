@@ -0,0 +1,59 @@
+"""
+Reminders of approved appointments.
+
+Each approved appointment has one queued ``appointments.send_reminder`` job,
+keyed ``appointment-reminder:<id>`` and due ``APPOINTMENT_REMINDER_HOURS``
+before the appointment (or at once when that has already passed). The job is
+kept in step from ``appointments/signals.py``, in the transaction of the
+change:
+
+* approving appointments schedules their reminders;
+* moving an approved appointment to another date or time replaces its reminder;
+* any other status change, or deleting the appointment, cancels it.
+
+The job carries the date and time it reminds of, and ``appointments/tasks.py``
+checks them against the appointment before sending, so a reminder that was
+already running when its appointment changed sends nothing.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+
+NAME = 'appointments.send_reminder'
+
+
+def job_key(appointment_id):
+    return f'appointment-reminder:{appointment_id}'
+
+
+def starts_at(date, time):
+    return timezone.make_aware(datetime.combine(date, time))
+
+
+def schedule(rows):
+    """Schedule reminders for ``(id, date, time)`` rows of approved appointments."""
+    now = timezone.now()
+    lead = timedelta(hours=getattr(settings, 'APPOINTMENT_REMINDER_HOURS', 24))
+    jobs, past = [], []
+    for appointment_id, date, time in rows:
+        start = starts_at(date, time)
+        if start <= now:
+            past.append(appointment_id)
+            continue
+        jobs.append(Job(
+            name=NAME,
+            key=job_key(appointment_id),
+            payload={'appointment': appointment_id, 'date': date.isoformat(), 'time': time.isoformat()},
+            run_at=max(start - lead, now),
+        ))
+    if past:
+        cancel(past)
+    queue.enqueue_many(jobs)
+
+
+def cancel(appointment_ids):
+    queue.cancel(*[job_key(appointment_id) for appointment_id in appointment_ids])
@@ -1,16 +1,22 @@
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Appointment
+from .models import Appointment, ScheduleException, WeeklySchedule
 
 class AppointmentSerializer(serializers.ModelSerializer):
     patient_name = serializers.SerializerMethodField()
     doctor_name = serializers.SerializerMethodField()
+    archived = serializers.SerializerMethodField()
     
     class Meta:
         model = Appointment
         fields = ('id', 'patient', 'doctor', 'patient_name', 'doctor_name',
                  'date', 'time', 'status', 'reason', 'notes',
-                 'created_at', 'updated_at')
+                 'created_at', 'updated_at', 'archived')
         read_only_fields = ('status', 'patient', 'patient_name', 'doctor_name')
+        # No check-then-insert validator for appointment_unique_active_slot: the
+        # index decides, and a clash is a 409 (see appointments.booking)
+        validators = []
     
     def get_patient_name(self, obj):
         return f"{obj.patient.first_name} {obj.patient.last_name}"
@@ -18,6 +24,10 @@ class AppointmentSerializer(serializers.ModelSerializer):
     def get_doctor_name(self, obj):
         return f"{obj.doctor.first_name} {obj.doctor.last_name}"
 
+    def get_archived(self, obj):
+        # Set on rows read through appointments.archive.with_archived
+        return getattr(obj, 'archived', False)
+
     def validate(self, data):
         if not data.get('doctor'):
             raise serializers.ValidationError({'doctor': 'Doctor is required'})
@@ -28,3 +38,89 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if not data.get('reason'):
             raise serializers.ValidationError({'reason': 'Reason is required'})
         return data
+
+class WeeklyScheduleSerializer(serializers.ModelSerializer):
+    weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+
+    class Meta:
+        model = WeeklySchedule
+        fields = ('id', 'doctor', 'weekday', 'weekday_display', 'start_time', 'end_time', 'slot_minutes')
+        read_only_fields = ('doctor',)
+
+    def validate(self, data):
+        start = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end = data.get('end_time', getattr(self.instance, 'end_time', None))
+        if start and end and end <= start:
+            raise serializers.ValidationError({'end_time': 'End time must be after start time'})
+        slot = data.get('slot_minutes', getattr(self.instance, 'slot_minutes', None))
+        if slot is not None and not 5 <= slot <= 240:
+            raise serializers.ValidationError({'slot_minutes': 'Slot length must be between 5 and 240 minutes'})
+        return data
+
+class ScheduleExceptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScheduleException
+        fields = ('id', 'doctor', 'date', 'start_time', 'end_time', 'is_available', 'slot_minutes', 'reason')
+        read_only_fields = ('doctor',)
+
+    def validate(self, data):
+        start = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end = data.get('end_time', getattr(self.instance, 'end_time', None))
+        if (start is None) != (end is None):
+            raise serializers.ValidationError({'end_time': 'Give both start and end time, or neither for the whole day'})
+        if start and end <= start:
+            raise serializers.ValidationError({'end_time': 'End time must be after start time'})
+        if start is None and data.get('is_available', getattr(self.instance, 'is_available', False)):
+            raise serializers.ValidationError({'start_time': 'Extra working hours need a start and end time'})
+        return data
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """Query parameters of the availability endpoint."""
+    DEFAULT_DAYS = 14
+    MAX_DAYS = 62
+    MAX_DOCTORS = 100
+
+    doctor = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if len(data.get('doctor', [])) > self.MAX_DOCTORS:
+            raise serializers.ValidationError({'doctor': f'At most {self.MAX_DOCTORS} doctors per request'})
+        data['start'] = data.get('start') or timezone.localdate()
+        data['end'] = data.get('end') or data['start'] + timedelta(days=self.DEFAULT_DAYS - 1)
+        if data['end'] < data['start']:
+            raise serializers.ValidationError({'end': 'End date must not be before start date'})
+        if (data['end'] - data['start']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'end': f'At most {self.MAX_DAYS} days per request'})
+        return data
+
+class BulkStatusSerializer(serializers.Serializer):
+    """Body of the bulk status endpoint: one target status for many appointments."""
+    MAX_IDS = 500
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_IDS
+    )
+    status = serializers.ChoiceField(choices=['APPROVED', 'REJECTED', 'CANCELLED', 'COMPLETED'])
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+class StatsQuerySerializer(serializers.Serializer):
+    """Query parameters of the appointment statistics endpoint."""
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 366
+
+    doctor = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        data['end'] = data.get('end') or timezone.localdate()
+        data['start'] = data.get('start') or data['end'] - timedelta(days=self.DEFAULT_DAYS - 1)
+        if data['end'] < data['start']:
+            raise serializers.ValidationError({'end': 'End date must not be before start date'})
+        if (data['end'] - data['start']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'end': f'At most {self.MAX_DAYS} days per request'})
+        return data
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from . import events, reminders, stats
+from .models import Appointment
+
+# Sent, inside the transaction, after appointments change status through a
+# conditional UPDATE, which bypasses post_save. Arguments:
+# ``appointment_ids``, ``status`` and ``previous``, the status they all left.
+status_changed = Signal()
+
+@receiver(post_save, sender=Appointment)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    stats.record_saved(instance, created)
+
+@receiver(status_changed)
+def update_stats_on_transition(sender, appointment_ids, status, previous, **kwargs):
+    stats.record_transition(appointment_ids, previous, status)
+
+@receiver(post_save, sender=Appointment)
+def publish_new_appointment(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: events.publish_created(instance))
+
+@receiver(status_changed)
+def publish_status_change(sender, appointment_ids, **kwargs):
+    transaction.on_commit(lambda: events.publish_status_changed(appointment_ids))
+
+@receiver(status_changed)
+def update_reminders_on_transition(sender, appointment_ids, status, previous, **kwargs):
+    if status == 'APPROVED':
+        reminders.schedule(Appointment.objects.filter(pk__in=appointment_ids).values_list('id', 'date', 'time'))
+    elif previous == 'APPROVED':
+        reminders.cancel(appointment_ids)
+
+@receiver(post_save, sender=Appointment)
+def update_reminder_on_save(sender, instance, created, **kwargs):
+    new = (instance.date, instance.time, instance.status)
+    old = None if created else getattr(instance, '_loaded_schedule', None)
+    if created or (old and old != new):
+        if instance.status == 'APPROVED':
+            reminders.schedule([(instance.pk, instance.date, instance.time)])
+        elif old and old[2] == 'APPROVED':
+            reminders.cancel([instance.pk])
+    instance._loaded_schedule = new
+
+@receiver(post_delete, sender=Appointment)
+def cancel_reminder_on_delete(sender, instance, **kwargs):
+    if instance.status == 'APPROVED':
+        reminders.cancel([instance.pk])
@@ -0,0 +1,93 @@
+"""
+Rollup of appointment counts per doctor, date and status.
+
+Reports read ``AppointmentDailyStat`` instead of grouping the whole
+appointment history. The rollup is adjusted in the transaction of each change
+(see ``appointments/signals.py``):
+
+* a new appointment adds one to its row;
+* a saved appointment whose doctor, date or status changed moves from its old
+  row to its new one;
+* a status transition (``status_changed``, which knows the previous status)
+  moves the appointments between the two statuses' rows;
+* a deleted appointment is taken off by the views that delete them.
+
+Archiving is not a change: archived appointments stay counted. Anything that
+bypasses these paths (raw SQL, ``QuerySet.update`` outside
+``appointments.transitions``, admin deletes) leaves the rollup out of date
+until ``manage.py rebuild_appointment_stats`` recounts it.
+"""
+from collections import Counter
+
+from django.db import models, transaction
+
+from .models import Appointment, AppointmentDailyStat, ArchivedAppointment
+
+
+def apply(deltas):
+    """Add ``{(doctor_id, date, status): delta}`` to the rollup."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    match, changes = models.Q(), []
+    for (doctor_id, date, status), delta in deltas.items():
+        key = models.Q(doctor_id=doctor_id, date=date, status=status)
+        match |= key
+        changes.append(models.When(key, then=models.Value(delta)))
+    with transaction.atomic(savepoint=False):
+        # Make sure the rows to add to exist, then adjust them all in place with
+        # one UPDATE, so concurrent changes add up instead of overwriting
+        AppointmentDailyStat.objects.bulk_create(
+            [AppointmentDailyStat(doctor_id=doctor_id, date=date, status=status)
+             for (doctor_id, date, status), delta in deltas.items() if delta > 0],
+            ignore_conflicts=True,
+        )
+        AppointmentDailyStat.objects.filter(match).update(
+            count=models.F('count') + models.Case(*changes, default=0, output_field=models.IntegerField())
+        )
+
+
+def stat_key(appointment):
+    return (appointment.doctor_id, appointment.date, appointment.status)
+
+
+def record_saved(appointment, created):
+    new_key = stat_key(appointment)
+    if created:
+        apply({new_key: 1})
+    else:
+        old_key = getattr(appointment, '_loaded_stat_key', None)
+        if old_key and None not in old_key and old_key != new_key:
+            apply({old_key: -1, new_key: 1})
+    appointment._loaded_stat_key = new_key
+
+
+def record_deleted(appointment):
+    apply({stat_key(appointment): -1})
+
+
+def record_transition(appointment_ids, previous, status):
+    deltas = Counter()
+    for doctor_id, date in Appointment.objects.filter(pk__in=appointment_ids).values_list('doctor_id', 'date'):
+        deltas[doctor_id, date, previous] -= 1
+        deltas[doctor_id, date, status] += 1
+    apply(deltas)
+
+
+def rebuild(batch_size=1000):
+    """Recount the whole rollup from the hot and the archive tables."""
+    counts = Counter()
+    for model in (Appointment, ArchivedAppointment):
+        rows = model.objects.order_by().values_list('doctor_id', 'date', 'status').annotate(
+            count=models.Count('id')
+        )
+        for doctor_id, date, status, count in rows:
+            counts[doctor_id, date, status] += count
+    with transaction.atomic():
+        AppointmentDailyStat.objects.all().delete()
+        AppointmentDailyStat.objects.bulk_create(
+            [AppointmentDailyStat(doctor_id=doctor_id, date=date, status=status, count=count)
+             for (doctor_id, date, status), count in counts.items()],
+            batch_size=batch_size,
+        )
+    return len(counts)
@@ -0,0 +1,24 @@
+from homoeoclinic_backend.notifications import get_backend
+from jobs.queue import task
+from . import reminders
+from .models import Appointment
+
+
+@task(reminders.NAME)
+def send_reminder(payload):
+    appointment = Appointment.objects.select_related('patient', 'doctor').filter(
+        pk=payload['appointment'], status='APPROVED'
+    ).first()
+    if appointment is None:
+        return
+    if (appointment.date.isoformat(), appointment.time.isoformat()) != (payload['date'], payload['time']):
+        # Rescheduled since; the reminder for the new time is its own job
+        return
+    doctor = appointment.doctor
+    doctor_name = f'{doctor.first_name} {doctor.last_name}'.strip() or doctor.username
+    get_backend().send(
+        appointment.patient,
+        'Appointment reminder',
+        f'Your appointment with Dr. {doctor_name} is on {appointment.date:%A %d %B %Y} '
+        f'at {appointment.time:%H:%M}.',
+    )
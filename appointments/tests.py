@@ -1,3 +1,535 @@
-from django.test import TestCase
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from homoeoclinic_backend.notifications import LocmemBackend
+from homoeoclinic_backend.pubsub import get_broker
+from jobs.models import Job
+from .availability import free_slots
+from .events import channel_for
+from .models import Appointment, AppointmentDailyStat, ArchivedAppointment, ScheduleException, WeeklySchedule
+from .signals import status_changed
+from .transitions import bulk_transition, transition
 
-# Create your tests here.
+User = get_user_model()
+
+
+def next_weekday(weekday):
+    """The first date strictly after today falling on ``weekday``."""
+    today = timezone.localdate()
+    return today + timedelta(days=(weekday - today.weekday() - 1) % 7 + 1)
+
+
+class AvailabilityTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        self.other_doctor = User.objects.create_user(
+            username='otherdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        self.patient = User.objects.create_user(
+            username='testpatient',
+            password='testpass123',
+            role='PATIENT'
+        )
+        self.monday = next_weekday(0)
+        WeeklySchedule.objects.create(
+            doctor=self.doctor, weekday=0, start_time=time(9), end_time=time(11), slot_minutes=30
+        )
+        WeeklySchedule.objects.create(
+            doctor=self.other_doctor, weekday=0, start_time=time(14), end_time=time(15), slot_minutes=20
+        )
+
+    def slot_times(self, doctor, day):
+        slots = free_slots([doctor.id], day, day)[doctor.id].get(day, [])
+        return [start.strftime('%H:%M') for start, _ in slots]
+
+    def test_weekly_schedule_is_cut_into_slots(self):
+        self.assertEqual(self.slot_times(self.doctor, self.monday), ['09:00', '09:30', '10:00', '10:30'])
+        self.assertEqual(self.slot_times(self.doctor, self.monday + timedelta(days=1)), [])
+
+    def test_bookings_take_overlapping_slots(self):
+        for start, appointment_status in [(time(9), 'PENDING'), (time(10, 10), 'APPROVED'), (time(9, 30), 'CANCELLED')]:
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=self.monday,
+                time=start, status=appointment_status, reason='Checkup'
+            )
+        self.assertEqual(self.slot_times(self.doctor, self.monday), ['09:30'])
+
+    def test_exceptions_remove_and_add_hours(self):
+        ScheduleException.objects.create(
+            doctor=self.doctor, date=self.monday, start_time=time(9, 30), end_time=time(10, 30)
+        )
+        ScheduleException.objects.create(
+            doctor=self.doctor, date=self.monday, start_time=time(17), end_time=time(18), is_available=True
+        )
+        self.assertEqual(self.slot_times(self.doctor, self.monday), ['09:00', '10:30', '17:00', '17:30'])
+
+        ScheduleException.objects.create(doctor=self.doctor, date=self.monday)
+        self.assertEqual(self.slot_times(self.doctor, self.monday), [])
+
+    def test_started_slots_are_not_offered(self):
+        now = timezone.make_aware(datetime.combine(self.monday, time(9, 40)))
+        slots = free_slots([self.doctor.id], self.monday, self.monday, now=now)[self.doctor.id][self.monday]
+        self.assertEqual([start for start, _ in slots], [time(10), time(10, 30)])
+
+    def test_endpoint_returns_slots_for_many_doctors(self):
+        self.client.force_authenticate(self.patient)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('doctor-availability'), {
+                'doctor': f'{self.doctor.id},{self.other_doctor.id}',
+                'start': self.monday.isoformat(),
+                'end': (self.monday + timedelta(days=6)).isoformat(),
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        doctors = {entry['doctor']: entry['days'] for entry in response.data['doctors']}
+        self.assertEqual(len(doctors[self.doctor.id][0]['slots']), 4)
+        self.assertEqual(
+            doctors[self.other_doctor.id][0]['slots'],
+            [{'time': '14:00', 'minutes': 20}, {'time': '14:20', 'minutes': 20}, {'time': '14:40', 'minutes': 20}]
+        )
+
+    def test_endpoint_rejects_long_ranges(self):
+        self.client.force_authenticate(self.patient)
+        response = self.client.get(reverse('doctor-availability'), {
+            'start': date(2030, 1, 1).isoformat(),
+            'end': date(2030, 6, 1).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_doctors_manage_their_own_schedule(self):
+        self.client.force_authenticate(self.doctor)
+        response = self.client.post(reverse('weekly-schedule-list'), {
+            'weekday': 2, 'start_time': '09:00', 'end_time': '08:00', 'slot_minutes': 15
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('weekly-schedule-list'), {
+            'weekday': 2, 'start_time': '09:00', 'end_time': '12:00', 'slot_minutes': 15
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.client.get(reverse('weekly-schedule-list')).data['results']), 2)
+
+        self.client.force_authenticate(self.patient)
+        response = self.client.get(reverse('weekly-schedule-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookingTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        self.other_patient = User.objects.create_user(username='otherpatient', password='testpass123', role='PATIENT')
+        self.day = next_weekday(0)
+        self.booking = {'doctor': self.doctor.id, 'date': self.day.isoformat(), 'time': '09:00', 'reason': 'Checkup'}
+
+    def book(self, patient, **changes):
+        self.client.force_authenticate(patient)
+        return self.client.post(reverse('appointment-list'), {**self.booking, **changes})
+
+    def test_taken_slot_is_a_conflict(self):
+        self.assertEqual(self.book(self.patient).status_code, status.HTTP_201_CREATED)
+        response = self.book(self.other_patient)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_inactive_appointments_free_the_slot(self):
+        self.book(self.patient)
+        Appointment.objects.update(status='CANCELLED')
+        self.assertEqual(self.book(self.other_patient).status_code, status.HTTP_201_CREATED)
+
+    def test_moving_into_a_taken_slot_is_a_conflict(self):
+        self.book(self.patient)
+        appointment_id = self.book(self.other_patient, time='10:00').data['id']
+        response = self.client.patch(reverse('appointment-detail', args=[appointment_id]), {
+            **self.booking, 'time': '09:00'
+        })
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Many patients race for one slot; the unique index must let exactly one through."""
+    attempts = 200
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('an in-memory SQLite database is shared by all threads')
+
+    def test_only_one_parallel_booking_succeeds(self):
+        doctor = User.objects.create_user(username='testdoctor', role='DOCTOR')
+        User.objects.bulk_create([
+            User(username=f'patient-{number}', role='PATIENT') for number in range(self.attempts)
+        ])
+        patients = list(User.objects.filter(role='PATIENT'))
+        payload = {'doctor': doctor.id, 'date': next_weekday(0).isoformat(), 'time': '09:00', 'reason': 'Checkup'}
+        barrier = threading.Barrier(len(patients))
+
+        def book(patient):
+            client = APIClient()
+            client.force_authenticate(patient)
+            try:
+                barrier.wait()
+                return client.post(reverse('appointment-list'), payload).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(patients)) as executor:
+            codes = list(executor.map(book, patients))
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(codes.count(status.HTTP_409_CONFLICT), len(patients) - 1)
+        self.assertEqual(Appointment.objects.filter(doctor=doctor).count(), 1)
+
+
+class StatusTransitionTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        self.appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=next_weekday(0), time=time(9), reason='Checkup'
+        )
+
+    def post(self, user, name):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse(name, args=[self.appointment.id]))
+
+    def test_transition_is_a_conditional_update(self):
+        received = []
+        status_changed.connect(lambda **kwargs: received.append(kwargs), weak=False, dispatch_uid='test')
+        self.addCleanup(status_changed.disconnect, dispatch_uid='test')
+        self.client.force_authenticate(self.doctor)
+        # The conditional UPDATE, then the rollup (read the appointment's day,
+        # ensure the row, adjust counts) and the reminder (read the slot,
+        # replace the queued job), all inside one savepoint
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse('appointment-approve', args=[self.appointment.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'APPROVED')
+        self.assertEqual(received[0]['appointment_ids'], [self.appointment.id])
+
+    def test_only_the_assigned_party_may_act(self):
+        self.assertEqual(self.post(self.patient, 'appointment-approve').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.post(self.doctor, 'appointment-cancel').status_code, status.HTTP_403_FORBIDDEN)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'PENDING')
+
+    def test_disallowed_transition_is_a_conflict(self):
+        self.assertEqual(self.post(self.doctor, 'appointment-complete').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.post(self.patient, 'appointment-cancel').status_code, status.HTTP_200_OK)
+        # The cancel won; a late approval must not resurrect the appointment
+        response = self.post(self.doctor, 'appointment-approve')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['error'], 'A cancelled appointment cannot be approved')
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'CANCELLED')
+
+
+class BulkStatusTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.other_doctor = User.objects.create_user(username='otherdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        day = next_weekday(0)
+        self.pending = [
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=day, time=time(9, minute), reason='Checkup'
+            ).id
+            for minute in (0, 15, 30)
+        ]
+        self.approved = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=day, time=time(10), status='APPROVED', reason='Checkup'
+        ).id
+        self.foreign = Appointment.objects.create(
+            patient=self.patient, doctor=self.other_doctor, date=day, time=time(9), reason='Checkup'
+        ).id
+
+    def test_bulk_approval_reports_each_id(self):
+        self.client.force_authenticate(self.doctor)
+        ids = self.pending + [self.approved, self.foreign, 999999]
+        # one read, one UPDATE for the pending group, three for its rollup and
+        # three for its reminders, plus the savepoint
+        with self.assertNumQueries(10):
+            response = self.client.post(
+                reverse('appointment-bulk-status'), {'ids': ids, 'status': 'APPROVED'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 3)
+        results = {entry['id']: entry['result'] for entry in response.data['results']}
+        self.assertEqual(results, {
+            **dict.fromkeys(self.pending, 'updated'),
+            self.approved: 'conflict', self.foreign: 'forbidden', 999999: 'not_found',
+        })
+        self.assertEqual(Appointment.objects.filter(status='APPROVED').count(), 4)
+
+    def test_one_update_per_current_status(self):
+        self.client.force_authenticate(self.doctor)
+        # Rejecting the approved one also cancels its reminder
+        with self.assertNumQueries(12):
+            response = self.client.post(
+                reverse('appointment-bulk-status'),
+                {'ids': self.pending + [self.approved], 'status': 'REJECTED'}, format='json'
+            )
+        self.assertEqual(response.data['updated'], 4)
+        self.assertFalse(Appointment.objects.filter(doctor=self.doctor).exclude(status='REJECTED').exists())
+
+    def test_invalid_status_is_rejected(self):
+        self.client.force_authenticate(self.doctor)
+        response = self.client.post(
+            reverse('appointment-bulk-status'), {'ids': self.pending, 'status': 'PENDING'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CalendarFeedTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(
+            username='testpatient', password='testpass123', role='PATIENT', first_name='Test', last_name='Patient'
+        )
+        self.appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=next_weekday(0), time=time(9),
+            reason='Headache; since Monday, worse at night'
+        )
+        self.client.force_authenticate(self.doctor)
+        self.url = self.client.get(reverse('calendar-token')).data['url']
+        self.client.force_authenticate(None)
+
+    def test_feed_streams_events(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn(f'UID:appointment-{self.appointment.id}@testserver', body)
+        self.assertIn(f'DTSTART:{self.appointment.date:%Y%m%d}T090000Z', body)
+        self.assertIn('SUMMARY:Appointment with Test Patient', body)
+        self.assertIn('DESCRIPTION:Headache\; since Monday\\, worse at night', body)
+        self.assertIn('STATUS:TENTATIVE', body)
+
+    def test_unchanged_feed_is_one_query_and_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Appointment.objects.filter(pk=self.appointment.pk).update(
+            status='APPROVED', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_rotated_token_stops_old_feed(self):
+        self.client.force_authenticate(self.doctor)
+        new_url = self.client.post(reverse('calendar-token')).data['url']
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(new_url).status_code, status.HTTP_200_OK)
+
+
+class AppointmentEventTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+
+    def test_changes_are_published_to_both_parties(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        subscription = get_broker().subscribe(channel_for(self.doctor.id), channel_for(self.patient.id))
+        queue = loop.run_until_complete(subscription.__aenter__())
+        self.addCleanup(loop.run_until_complete, subscription.__aexit__(None, None, None))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment = Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=next_weekday(0), time=time(9), reason='Checkup'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            transition(Appointment.objects.all(), appointment.id, 'APPROVED', self.doctor)
+
+        def receive():
+            return loop.run_until_complete(asyncio.wait_for(queue.get(), 1))
+
+        events = [receive()['event'] for _ in range(4)]
+        self.assertEqual(events, ['appointment.created'] * 2 + ['appointment.status_changed'] * 2)
+        self.assertTrue(queue.empty())
+
+    async def test_stream_requires_a_token_and_pushes_events(self):
+        url = reverse('appointment-events')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get(url, {'token': str(AccessToken.for_user(self.doctor))})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+        get_broker().publish(channel_for(self.doctor.id), {
+            'event': 'appointment.created', 'appointment': {'id': 1, 'status': 'PENDING'}
+        })
+        chunk = await asyncio.wait_for(anext(chunks), 1)
+        self.assertEqual(chunk, b'event: appointment.created\ndata: {"id": 1, "status": "PENDING"}\n\n')
+        await chunks.aclose()
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        old = timezone.localdate() - timedelta(days=400)
+        for offset, appointment_status in enumerate(['COMPLETED', 'CANCELLED', 'REJECTED', 'APPROVED']):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=old + timedelta(days=offset),
+                time=time(9), status=appointment_status, reason='Old visit'
+            )
+        self.upcoming = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=next_weekday(0), time=time(9), reason='Checkup'
+        )
+
+    def test_command_moves_old_finished_appointments_in_batches(self):
+        call_command('archive_appointments', batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            sorted(ArchivedAppointment.objects.values_list('status', flat=True)),
+            ['CANCELLED', 'COMPLETED', 'REJECTED']
+        )
+        self.assertEqual(sorted(Appointment.objects.values_list('status', flat=True)), ['APPROVED', 'PENDING'])
+        archived = ArchivedAppointment.objects.get(status='COMPLETED')
+        self.assertEqual(archived.reason, 'Old visit')
+
+    def test_lists_read_the_archive_only_on_request(self):
+        call_command('archive_appointments', stdout=StringIO())
+        self.client.force_authenticate(self.doctor)
+        response = self.client.get(reverse('appointment-list'))
+        self.assertEqual(response.data['count'], 2)
+
+        response = self.client.get(reverse('appointment-list'), {'include_archived': '1'})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results'][0]['id'], self.upcoming.id)
+        self.assertEqual(
+            [entry['archived'] for entry in response.data['results']], [False, False, True, True, True]
+        )
+
+        response = self.client.get(reverse('appointment-list'), {'include_archived': '1', 'ordering': 'date'})
+        self.assertEqual(response.data['results'][0]['status'], 'COMPLETED')
+        self.assertTrue(response.data['results'][0]['archived'])
+
+
+class AppointmentStatsTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        self.manager = User.objects.create_user(
+            username='manager', password='testpass123', role='PATIENT', is_staff=True
+        )
+        self.day = next_weekday(0)
+
+    def book(self, minute, patient=None):
+        return Appointment.objects.create(
+            patient=patient or self.patient, doctor=self.doctor, date=self.day,
+            time=time(9, minute), reason='Checkup'
+        )
+
+    def counts(self):
+        return {
+            (row.date, row.status): row.count
+            for row in AppointmentDailyStat.objects.filter(doctor=self.doctor, count__gt=0)
+        }
+
+    def test_rollup_follows_creates_transitions_and_moves(self):
+        first, second, third = self.book(0), self.book(15), self.book(30)
+        transition(Appointment.objects.all(), first.id, 'APPROVED', self.doctor)
+        transition(Appointment.objects.all(), first.id, 'CANCELLED', self.patient)
+        bulk_transition(Appointment.objects.all(), [second.id, third.id], 'REJECTED', self.doctor)
+        later = self.day + timedelta(days=7)
+        moved = Appointment.objects.get(pk=second.id)
+        moved.date = later
+        moved.save()
+
+        expected = {(self.day, 'CANCELLED'): 1, (self.day, 'REJECTED'): 1, (later, 'REJECTED'): 1}
+        self.assertEqual(self.counts(), expected)
+
+        AppointmentDailyStat.objects.all().delete()
+        call_command('rebuild_appointment_stats', stdout=StringIO())
+        self.assertEqual(self.counts(), expected)
+
+    def test_report_reads_the_rollup(self):
+        self.book(0)
+        approved = self.book(15)
+        transition(Appointment.objects.all(), approved.id, 'APPROVED', self.doctor)
+        self.client.force_authenticate(self.manager)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('appointment-stats'), {
+                'start': self.day.isoformat(), 'end': self.day.isoformat()
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['doctors'], [{
+            'doctor': self.doctor.id,
+            'totals': {'APPROVED': 1, 'PENDING': 1},
+            'days': [{'date': self.day, 'counts': {'APPROVED': 1, 'PENDING': 1}}],
+        }])
+
+        self.client.force_authenticate(self.patient)
+        self.assertEqual(self.client.get(reverse('appointment-stats')).status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(
+    NOTIFICATION_BACKEND='homoeoclinic_backend.notifications.LocmemBackend', APPOINTMENT_REMINDER_HOURS=24
+)
+class ReminderTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(
+            username='testdoctor', password='testpass123', role='DOCTOR', first_name='Ada', last_name='Hahn'
+        )
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        self.day = next_weekday(2)
+        self.appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=self.day, time=time(10), reason='Checkup'
+        )
+        LocmemBackend.outbox.clear()
+
+    def reminders(self):
+        return list(Job.objects.filter(key=f'appointment-reminder:{self.appointment.id}').values_list(
+            'status', 'run_at', 'payload__time'
+        ))
+
+    def test_approval_schedules_and_reschedule_replaces_the_reminder(self):
+        transition(Appointment.objects.all(), self.appointment.id, 'APPROVED', self.doctor)
+        start = timezone.make_aware(datetime.combine(self.day, time(10)))
+        self.assertEqual(self.reminders(), [('QUEUED', start - timedelta(hours=24), '10:00:00')])
+
+        appointment = Appointment.objects.get(pk=self.appointment.id)
+        appointment.time = time(11)
+        appointment.save()
+        self.assertEqual([(job[0], job[2]) for job in self.reminders()], [('CANCELLED', '10:00:00'), ('QUEUED', '11:00:00')])
+
+        transition(Appointment.objects.all(), self.appointment.id, 'CANCELLED', self.patient)
+        self.assertFalse(Job.objects.filter(status='QUEUED').exists())
+
+    def test_worker_sends_due_reminders(self):
+        transition(Appointment.objects.all(), self.appointment.id, 'APPROVED', self.doctor)
+        Job.objects.update(run_at=timezone.now())
+        call_command('run_jobs', once=True, stdout=StringIO())
+
+        self.assertEqual(Job.objects.get().status, 'DONE')
+        [message] = LocmemBackend.outbox
+        self.assertEqual(message['user'], self.patient.id)
+        self.assertIn('Dr. Ada Hahn', message['body'])
+        self.assertIn('10:00', message['body'])
+
+    def test_reminder_for_a_changed_appointment_sends_nothing(self):
+        transition(Appointment.objects.all(), self.appointment.id, 'APPROVED', self.doctor)
+        # Rejected after the worker picked the job up
+        Job.objects.update(run_at=timezone.now())
+        Appointment.objects.filter(pk=self.appointment.id).update(status='REJECTED')
+        call_command('run_jobs', once=True, stdout=StringIO())
+        self.assertEqual(Job.objects.get().status, 'DONE')
+        self.assertEqual(LocmemBackend.outbox, [])
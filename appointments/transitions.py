@@ -0,0 +1,118 @@
+"""
+Appointment status changes.
+
+``TRANSITIONS`` maps each target status to the statuses it may be reached
+from, and ``ACTORS`` to whoever may make the change. ``transition`` applies a
+change as a conditional ``UPDATE ... WHERE id = %s AND <actor> = %s AND
+status = %s``, trying each allowed current status in turn (usually the first
+matches); the row count decides it, so a cancel racing an approve can't both
+win and no other column is rewritten. The row is only read when no update
+matches, to tell the caller why. Knowing which update matched tells
+``status_changed`` receivers the previous status.
+
+``bulk_transition`` does the same for many appointments: one read to sort
+them out, then one ``UPDATE`` per current status inside a transaction.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from .models import Appointment
+from .signals import status_changed
+
+TRANSITIONS = {
+    'APPROVED': ('PENDING',),
+    'REJECTED': ('PENDING', 'APPROVED'),
+    'CANCELLED': ('PENDING', 'APPROVED'),
+    'COMPLETED': ('APPROVED',),
+}
+
+ACTORS = {
+    'APPROVED': 'doctor',
+    'REJECTED': 'doctor',
+    'CANCELLED': 'patient',
+    'COMPLETED': 'doctor',
+}
+
+FORBIDDEN_MESSAGES = {
+    'APPROVED': 'Only the assigned doctor can approve appointments',
+    'REJECTED': 'Only the assigned doctor can reject appointments',
+    'CANCELLED': 'Only the patient can cancel their appointments',
+    'COMPLETED': 'Only the assigned doctor can complete appointments',
+}
+
+
+class TransitionError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def transition(appointments, pk, new_status, user):
+    """
+    Move appointment ``pk`` (looked up in the ``appointments`` queryset) to
+    ``new_status`` on behalf of ``user``. Raises ``TransitionError`` with a 404,
+    403 or 409 status when the appointment is missing, belongs to someone else,
+    or is not in a status the change is allowed from.
+    """
+    actor = ACTORS[new_status]
+    with transaction.atomic():
+        for previous in TRANSITIONS[new_status]:
+            updated = appointments.filter(
+                pk=pk, status=previous, **{actor: user}
+            ).update(status=new_status, updated_at=timezone.now())
+            if updated:
+                status_changed.send(
+                    sender=Appointment, appointment_ids=[pk], status=new_status, previous=previous
+                )
+                return
+
+    current = appointments.filter(pk=pk).values(f'{actor}_id', 'status').first()
+    if current is None:
+        raise TransitionError('Appointment not found', status.HTTP_404_NOT_FOUND)
+    if current[f'{actor}_id'] != user.pk:
+        raise TransitionError(FORBIDDEN_MESSAGES[new_status], status.HTTP_403_FORBIDDEN)
+    raise TransitionError(
+        f"A {current['status'].lower()} appointment cannot be {new_status.lower()}",
+        status.HTTP_409_CONFLICT
+    )
+
+
+def bulk_transition(appointments, ids, new_status, user):
+    """
+    Move every appointment in ``ids`` that ``user`` may change to
+    ``new_status``. Returns ``{id: outcome}`` with outcome one of
+    ``'updated'``, ``'not_found'``, ``'forbidden'`` or ``'conflict'``.
+    """
+    actor, sources = ACTORS[new_status], TRANSITIONS[new_status]
+    outcomes = dict.fromkeys(ids, 'not_found')
+    groups = defaultdict(list)
+    for pk, actor_id, current in appointments.filter(pk__in=ids).values_list('pk', f'{actor}_id', 'status'):
+        if actor_id != user.pk:
+            outcomes[pk] = 'forbidden'
+        elif current not in sources:
+            outcomes[pk] = 'conflict'
+        else:
+            groups[current].append(pk)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for current, group in groups.items():
+            count = appointments.filter(pk__in=group, status=current, **{actor: user}).update(
+                status=new_status, updated_at=now
+            )
+            if count < len(group):
+                # Some rows changed since they were read; keep the ones this update stamped
+                group = list(appointments.filter(
+                    pk__in=group, status=new_status, updated_at=now
+                ).values_list('pk', flat=True))
+                outcomes.update((pk, 'conflict') for pk in groups[current])
+            outcomes.update((pk, 'updated') for pk in group)
+            if group:
+                status_changed.send(
+                    sender=Appointment, appointment_ids=group, status=new_status, previous=current
+                )
+    return outcomes
@@ -1,9 +1,19 @@
 from django.urls import path
-from . import views
+from . import calendar, events, views
 from rest_framework.urlpatterns import format_suffix_patterns
 
 urlpatterns = format_suffix_patterns([
     path('', views.AppointmentList.as_view(), name='appointment-list'),
+    path('bulk-status/', views.AppointmentBulkStatus.as_view(), name='appointment-bulk-status'),
+    path('calendar-token/', views.CalendarTokenView.as_view(), name='calendar-token'),
+    path('calendar/<str:token>.ics', calendar.calendar_feed, name='appointment-calendar'),
+    path('events/', events.appointment_events, name='appointment-events'),
+    path('stats/', views.AppointmentStats.as_view(), name='appointment-stats'),
+    path('availability/', views.DoctorAvailability.as_view(), name='doctor-availability'),
+    path('schedules/', views.WeeklyScheduleList.as_view(), name='weekly-schedule-list'),
+    path('schedules/<int:pk>/', views.WeeklyScheduleDetail.as_view(), name='weekly-schedule-detail'),
+    path('schedule-exceptions/', views.ScheduleExceptionList.as_view(), name='schedule-exception-list'),
+    path('schedule-exceptions/<int:pk>/', views.ScheduleExceptionDetail.as_view(), name='schedule-exception-detail'),
     path('<int:pk>/', views.AppointmentDetail.as_view(), name='appointment-detail'),
     path('<int:pk>/status/', views.AppointmentStatusUpdate.as_view(), name='appointment-status'),
     path('<int:pk>/approve/', views.AppointmentApprove.as_view(), name='appointment-approve'),
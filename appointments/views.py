@@ -1,22 +1,83 @@
 from rest_framework import generics, permissions, status, serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Appointment
-from .serializers import AppointmentSerializer
+from django.utils import timezone
+from .archive import with_archived
+from .availability import free_slots
+from .booking import save_booking
+from .stats import record_deleted
+from .transitions import TRANSITIONS, TransitionError, bulk_transition, transition
+from .models import (
+    Appointment,
+    AppointmentDailyStat,
+    ArchivedAppointment,
+    CalendarToken,
+    ScheduleException,
+    WeeklySchedule,
+    make_calendar_token,
+)
+from .serializers import (
+    AppointmentSerializer,
+    AvailabilityQuerySerializer,
+    BulkStatusSerializer,
+    StatsQuerySerializer,
+    ScheduleExceptionSerializer,
+    WeeklyScheduleSerializer,
+)
 
 class IsDoctorOrPatient(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.user == obj.doctor or request.user == obj.patient
 
-class AppointmentList(generics.ListCreateAPIView):
+class ArchivedAppointmentsMixin:
+    """
+    Appointment lists read the hot table only; ``?include_archived=1`` adds
+    the archive with a ``UNION ALL``. Such lists are page-number paginated,
+    as a keyset cursor can't filter a union.
+    """
+
+    def include_archived(self):
+        return (
+            getattr(self, 'action', 'list') == 'list'
+            and self.request.query_params.get('include_archived') in ('1', 'true')
+        )
+
+    def get_archived_queryset(self):
+        user = self.request.user
+        if user.role == 'DOCTOR':
+            return ArchivedAppointment.objects.filter(doctor=user)
+        return ArchivedAppointment.objects.filter(patient=user)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.include_archived():
+            return queryset
+        archived = super().filter_queryset(self.get_archived_queryset())
+        ordering = list(queryset.query.order_by or Appointment._meta.ordering)
+        return with_archived(queryset, archived, ordering + ['-id'])
+
+    def paginate_queryset(self, queryset):
+        if self.include_archived():
+            self.keyset_ordering = None
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            prefetch_related_objects(page, 'patient', 'doctor')
+        return page
+
+class AppointmentList(ArchivedAppointmentsMixin, generics.ListCreateAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
     filterset_fields = ['status']
     search_fields = ['doctor__username', 'doctor__first_name', 'doctor__last_name', 'reason']
     ordering_fields = ['date', 'time', 'created_at', 'status']
     ordering = ['-date', '-time']
+    keyset_ordering = ('-date', '-time', '-id')
 
     def get_queryset(self):
         user = self.request.user
@@ -45,7 +106,8 @@ class AppointmentList(generics.ListCreateAPIView):
                 'appointment': 'You already have a pending appointment with this doctor for this date'
             })
         
-        serializer.save(
+        save_booking(
+            serializer,
             patient=self.request.user,
             doctor=doctor,
             status='PENDING'
@@ -66,7 +128,12 @@ class AppointmentDetail(generics.RetrieveUpdateDestroyAPIView):
         if serializer.validated_data.get('status'):
             if self.request.user.role != 'DOCTOR':
                 raise serializers.ValidationError({'status': 'Only doctors can update appointment status'})
-        serializer.save()
+        save_booking(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            record_deleted(instance)
 
 class AppointmentStatusUpdate(generics.UpdateAPIView):
     queryset = Appointment.objects.all()
@@ -74,91 +141,225 @@ class AppointmentStatusUpdate(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def update(self, request, *args, **kwargs):
-        appointment = self.get_object()
         new_status = kwargs.get('status', request.data.get('status'))
-        
-        if new_status in ['APPROVED', 'REJECTED', 'COMPLETED']:
-            if request.user != appointment.doctor:
-                return Response(
-                    {'error': 'Only the assigned doctor can update this appointment status'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        elif new_status == 'CANCELLED':
-            if request.user != appointment.patient:
-                return Response(
-                    {'error': 'Only the patient can cancel their appointments'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        else:
+        if new_status not in TRANSITIONS:
             return Response(
                 {'error': 'Invalid status update'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        appointment.status = new_status
-        appointment.save()
+
+        try:
+            transition(self.get_queryset(), kwargs['pk'], new_status, request.user)
+        except TransitionError as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
         return Response({'status': f'appointment {new_status.lower()}'})
 
 class AppointmentBaseAction(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_appointment(self, pk):
-        return get_object_or_404(Appointment, pk=pk)
-
     def post(self, request, pk, format=None):
-        appointment = self.get_appointment(pk)
-        if not self.check_permission(request.user, appointment):
-            return Response(
-                {'error': self.error_message},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        appointment.status = self.new_status
-        appointment.save()
+        try:
+            transition(Appointment.objects.all(), pk, self.new_status, request.user)
+        except TransitionError as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
         return Response({'status': f'appointment {self.new_status.lower()}'})
 
 class AppointmentApprove(AppointmentBaseAction):
     new_status = 'APPROVED'
-    error_message = 'Only the assigned doctor can approve appointments'
-
-    def check_permission(self, user, appointment):
-        return user == appointment.doctor
 
 class AppointmentReject(AppointmentBaseAction):
     new_status = 'REJECTED'
-    error_message = 'Only the assigned doctor can reject appointments'
-
-    def check_permission(self, user, appointment):
-        return user == appointment.doctor
 
 class AppointmentCancel(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        appointment = get_object_or_404(Appointment, pk=pk)
-        
-        # Only allow cancellation if the appointment is pending or approved
-        if appointment.status not in ['PENDING', 'APPROVED']:
-            return Response(
-                {'error': 'Only pending or approved appointments can be cancelled'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Check if user is the patient
-        if request.user != appointment.patient:
-            return Response(
-                {'error': 'Only the patient can cancel their appointments'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        appointment.status = 'CANCELLED'
-        appointment.save()
-        
-        serializer = AppointmentSerializer(appointment)
+        try:
+            transition(Appointment.objects.all(), pk, 'CANCELLED', request.user)
+        except TransitionError as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
+
+        serializer = AppointmentSerializer(
+            Appointment.objects.select_related('patient', 'doctor').get(pk=pk)
+        )
         return Response(serializer.data)
 
 class AppointmentComplete(AppointmentBaseAction):
     new_status = 'COMPLETED'
-    error_message = 'Only the assigned doctor can complete appointments'
 
-    def check_permission(self, user, appointment):
-        return user == appointment.doctor
+class AppointmentBulkStatus(APIView):
+    """
+    Change the status of many appointments at once, e.g. a doctor approving a
+    morning's queue: ``{"ids": [...], "status": "APPROVED"}``. Each id is
+    reported as updated, not_found, forbidden or conflict.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_status = serializer.validated_data['status']
+        outcomes = bulk_transition(
+            Appointment.objects.all(), serializer.validated_data['ids'], new_status, request.user
+        )
+        return Response({
+            'status': new_status,
+            'updated': sum(outcome == 'updated' for outcome in outcomes.values()),
+            'results': [{'id': pk, 'result': outcome} for pk, outcome in outcomes.items()],
+        })
+
+class DoctorScheduleMixin:
+    """Doctors manage their own schedule rows; nobody else sees them."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.role != 'DOCTOR':
+            raise PermissionDenied("Only doctors have schedules")
+        return self.queryset.filter(doctor=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(doctor=self.request.user)
+
+class WeeklyScheduleList(DoctorScheduleMixin, generics.ListCreateAPIView):
+    queryset = WeeklySchedule.objects.all()
+    serializer_class = WeeklyScheduleSerializer
+
+class WeeklyScheduleDetail(DoctorScheduleMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = WeeklySchedule.objects.all()
+    serializer_class = WeeklyScheduleSerializer
+
+class ScheduleExceptionList(DoctorScheduleMixin, generics.ListCreateAPIView):
+    queryset = ScheduleException.objects.all()
+    serializer_class = ScheduleExceptionSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        upcoming = self.request.query_params.get('upcoming', None)
+        if upcoming == 'true':
+            queryset = queryset.filter(date__gte=timezone.localdate())
+        return queryset
+
+class ScheduleExceptionDetail(DoctorScheduleMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = ScheduleException.objects.all()
+    serializer_class = ScheduleExceptionSerializer
+
+class DoctorAvailability(APIView):
+    """
+    Free slots of one or more doctors over a date range:
+    ``?doctor=3&doctor=7`` (or ``?doctor=3,7``; all active doctors if omitted),
+    ``start``/``end`` dates (default: the next two weeks).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        params = {
+            'doctor': [part for value in request.query_params.getlist('doctor') for part in value.split(',') if part],
+        }
+        for name in ('start', 'end'):
+            if name in request.query_params:
+                params[name] = request.query_params[name]
+        query = AvailabilityQuerySerializer(data=params)
+        query.is_valid(raise_exception=True)
+
+        start, end = query.validated_data['start'], query.validated_data['end']
+
+        doctors = get_user_model().objects.filter(role='DOCTOR', is_active=True)
+        if query.validated_data.get('doctor'):
+            doctors = doctors.filter(id__in=query.validated_data['doctor'])
+        doctor_ids = list(doctors.order_by('id').values_list('id', flat=True)[:AvailabilityQuerySerializer.MAX_DOCTORS])
+
+        slots = free_slots(doctor_ids, start, end)
+        return Response({
+            'start': start,
+            'end': end,
+            'doctors': [
+                {
+                    'doctor': doctor_id,
+                    'days': [
+                        {
+                            'date': day,
+                            'slots': [
+                                {'time': start.isoformat('minutes'), 'minutes': minutes}
+                                for start, minutes in day_slots
+                            ],
+                        }
+                        for day, day_slots in slots[doctor_id].items()
+                    ],
+                }
+                for doctor_id in doctor_ids
+            ],
+        })
+
+class CalendarTokenView(APIView):
+    """
+    The doctor's calendar feed URL (``GET``, created on first use). ``POST``
+    issues a new token, cutting off every app subscribed with the old one.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_token(self, request):
+        if request.user.role != 'DOCTOR':
+            raise PermissionDenied("Only doctors have a calendar feed")
+        return CalendarToken.objects.get_or_create(user=request.user)[0]
+
+    def respond(self, request, calendar_token):
+        return Response({
+            'token': calendar_token.token,
+            'url': request.build_absolute_uri(reverse('appointment-calendar', args=[calendar_token.token])),
+        })
+
+    def get(self, request, format=None):
+        return self.respond(request, self.get_token(request))
+
+    def post(self, request, format=None):
+        calendar_token = self.get_token(request)
+        calendar_token.token = make_calendar_token()
+        calendar_token.save(update_fields=['token'])
+        return self.respond(request, calendar_token)
+
+class AppointmentStats(APIView):
+    """
+    Appointment counts per doctor, day and status, read from the
+    ``AppointmentDailyStat`` rollup: ``?doctor=3,7&start=...&end=...``
+    (default: the last 30 days). Staff see every doctor, doctors themselves.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        if not request.user.is_staff and request.user.role != 'DOCTOR':
+            raise PermissionDenied("Only staff and doctors can view appointment statistics")
+        params = {
+            'doctor': [part for value in request.query_params.getlist('doctor') for part in value.split(',') if part],
+        }
+        for name in ('start', 'end'):
+            if name in request.query_params:
+                params[name] = request.query_params[name]
+        query = StatsQuerySerializer(data=params)
+        query.is_valid(raise_exception=True)
+        start, end = query.validated_data['start'], query.validated_data['end']
+
+        rows = AppointmentDailyStat.objects.filter(date__range=(start, end), count__gt=0)
+        if not request.user.is_staff:
+            rows = rows.filter(doctor=request.user)
+        elif query.validated_data.get('doctor'):
+            rows = rows.filter(doctor_id__in=query.validated_data['doctor'])
+
+        doctors = {}
+        for doctor_id, day, appointment_status, count in rows.order_by('doctor_id', 'date').values_list(
+            'doctor_id', 'date', 'status', 'count'
+        ):
+            doctor = doctors.setdefault(doctor_id, {'doctor': doctor_id, 'totals': {}, 'days': {}})
+            doctor['days'].setdefault(day, {})[appointment_status] = count
+            doctor['totals'][appointment_status] = doctor['totals'].get(appointment_status, 0) + count
+        return Response({
+            'start': start,
+            'end': end,
+            'doctors': [
+                {
+                    'doctor': doctor['doctor'],
+                    'totals': doctor['totals'],
+                    'days': [{'date': day, 'counts': counts} for day, counts in doctor['days'].items()],
+                }
+                for doctor in doctors.values()
+            ],
+        })
@@ -0,0 +1,184 @@
+"""
+Response cache for the public (published-only) blog endpoints.
+
+Anonymous users and patients see the same published posts, so their list and
+detail responses are cached under a key built from the URL, the query string
+and a global version number. ``BlogPost`` saves/deletes and ``Comment`` approval
+changes bump the version (see ``blog/signals.py``), which orphans every cached
+entry at once. Each entry carries a strong ETag and a Last-Modified, so a
+conditional GET on a warm entry is answered with 304 without touching the
+database or the serializers. Last-Modified is the latest of the posts'
+``updated_at`` and the time of the last version bump: deleting a post or
+approving a comment changes a response without changing any post it shows.
+HTTP dates only have one-second precision, so the ETag stays the exact
+validator.
+
+Sitemaps and feeds are cached the same way under their own version
+(``FEEDS_VERSION_KEY``), which only post saves and deletes bump, so comment
+moderation does not throw them away.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+VERSION_KEY = 'blog:published:version'
+FEEDS_VERSION_KEY = 'blog:feeds:version'
+
+
+def get_timeout():
+    return getattr(settings, 'BLOG_CACHE_TIMEOUT', 300)
+
+
+def get_version(key=VERSION_KEY):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def get_changed_at(key=VERSION_KEY):
+    """When ``bump_version(key)`` last ran, as a timestamp, or None."""
+    return cache.get(f'{key}:changed_at')
+
+
+def bump_version(key=VERSION_KEY):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+    cache.set(f'{key}:changed_at', time.time(), None)
+
+
+def invalidate(key=VERSION_KEY):
+    """
+    Orphan every cached response. The version is bumped again after commit so a
+    reader that re-cached the old rows before the transaction committed does
+    not keep serving them.
+    """
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def get_feeds_timeout():
+    # No expiry by default: entries are orphaned by version bumps instead
+    return getattr(settings, 'BLOG_FEEDS_CACHE_TIMEOUT', None)
+
+
+def cached_document(request, name, build):
+    """
+    Serve the sitemap or feed ``name`` from the cache, rendering it with
+    ``build()`` (which returns an ``HttpResponse``) on a miss.
+    """
+    key = f'blog:document:{get_version(FEEDS_VERSION_KEY)}:{request.scheme}://{request.get_host()}:{name}'
+    entry = cache.get(key)
+    if entry is None:
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': '"%s"' % hashlib.sha256(response.content).hexdigest(),
+        }
+        cache.set(key, entry, get_feeds_timeout())
+    if is_not_modified(request, entry['etag'], None):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    return response
+
+
+def is_cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    user = request.user
+    return not user.is_authenticated or user.role == 'PATIENT'
+
+
+def make_key(request):
+    # Links in the payload (pagination, images) are absolute, so the host is part of the key
+    params = sorted(request.query_params.lists())
+    url = [request.scheme, request.get_host(), request.path, params]
+    digest = hashlib.sha256(json.dumps(url).encode('utf-8')).hexdigest()
+    return f'blog:response:{get_version()}:{digest}'
+
+
+def make_etag(data):
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return bool(if_modified_since and last_modified and int(last_modified) <= if_modified_since)
+
+
+def add_validators(response, entry):
+    response['ETag'] = entry['etag']
+    if entry['last_modified']:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class PublishedResponseCacheMixin:
+    """
+    Serve ``list`` and ``retrieve`` for anonymous users and patients from the
+    cache. Doctors, who also see drafts, always get a fresh response.
+    """
+
+    def cached_response(self, request, build):
+        if not is_cacheable(request):
+            return build()[0]
+        key = make_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response, instances = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            updated = [obj.updated_at.timestamp() for obj in instances]
+            changed_at = get_changed_at()
+            if changed_at is not None:
+                updated.append(changed_at)
+            entry = {
+                'data': response.data,
+                'etag': make_etag(response.data),
+                'last_modified': max(updated) if updated else None,
+            }
+            cache.set(key, entry, get_timeout())
+        if is_not_modified(request, entry['etag'], entry['last_modified']):
+            return add_validators(Response(status=status.HTTP_304_NOT_MODIFIED), entry)
+        return add_validators(Response(entry['data']), entry)
+
+    def list(self, request, *args, **kwargs):
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data), page
+            instances = list(queryset)
+            return Response(self.get_serializer(instances, many=True).data), instances
+        return self.cached_response(request, build)
+
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            instance = self.get_object()
+            return Response(self.get_serializer(instance).data), [instance]
+        return self.cached_response(request, build)
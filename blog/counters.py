@@ -0,0 +1,136 @@
+"""
+Buffered view counting and the trending score for blog posts.
+
+Post detail views call ``record_view(slug)``, which only bumps an in-process
+counter. The buffer is written out by ``flush()`` once it holds
+``BLOG_VIEW_FLUSH_THRESHOLD`` views or ``BLOG_VIEW_FLUSH_INTERVAL`` seconds
+have passed since the last flush (and at interpreter exit). A flush issues one
+``UPDATE ... SET view_count = view_count + n`` per distinct ``n`` rather than
+one write per request, and adds the same counts to today's ``PostViewDaily``
+rows.
+
+``compute_trending()`` (``manage.py compute_trending``, run periodically)
+turns the daily rows into ``BlogPost.trending_score``: views decay by half every
+``BLOG_TRENDING_HALF_LIFE`` days and rows older than ``BLOG_TRENDING_DAYS`` are
+ignored. ``?ordering=trending`` sorts on the stored score.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def get_flush_threshold():
+    return getattr(settings, 'BLOG_VIEW_FLUSH_THRESHOLD', 100)
+
+
+def get_flush_interval():
+    return getattr(settings, 'BLOG_VIEW_FLUSH_INTERVAL', 30)
+
+
+class ViewBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.pending = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, slug, count=1):
+        """Buffer ``count`` views and say whether a flush is due."""
+        with self.lock:
+            self.counts[slug] += count
+            self.pending += count
+            return self.pending >= get_flush_threshold() or time.monotonic() - self.last_flush >= get_flush_interval()
+
+    def drain(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.pending = 0
+            self.last_flush = time.monotonic()
+            return counts
+
+    def restore(self, counts):
+        with self.lock:
+            self.counts.update(counts)
+            self.pending += sum(counts.values())
+
+
+_buffer = ViewBuffer()
+
+
+def record_view(slug):
+    if _buffer.add(slug):
+        flush()
+
+
+def write_counts(counts):
+    """Add ``{slug: views}`` to the posts' totals and to today's daily rows."""
+    from .models import BlogPost, PostViewDaily
+
+    ids = dict(BlogPost.objects.filter(slug__in=list(counts)).values_list('slug', 'id'))
+    by_count = defaultdict(list)
+    for slug, count in counts.items():
+        if slug in ids:
+            by_count[count].append(ids[slug])
+    if not by_count:
+        return
+    today = timezone.localdate()
+    with transaction.atomic():
+        # Make sure today's rows exist, then increment them in place so that
+        # concurrent flushes from other processes add up instead of overwriting.
+        PostViewDaily.objects.bulk_create(
+            [PostViewDaily(post_id=post_id, date=today) for post_id in ids.values()],
+            ignore_conflicts=True,
+        )
+        for count, post_ids in by_count.items():
+            BlogPost.objects.filter(pk__in=post_ids).update(view_count=models.F('view_count') + count)
+            PostViewDaily.objects.filter(post_id__in=post_ids, date=today).update(views=models.F('views') + count)
+
+
+def flush():
+    counts = _buffer.drain()
+    if not counts:
+        return
+    try:
+        write_counts(counts)
+    except Exception:
+        # Keep the views for the next attempt rather than losing them
+        _buffer.restore(counts)
+        logger.exception('Flushing %d buffered blog post views failed', sum(counts.values()))
+
+
+def reset():
+    """Discard the buffered views without writing them and restart the flush interval."""
+    _buffer.drain()
+
+
+atexit.register(flush)
+
+
+def compute_trending(now=None):
+    """Recompute ``trending_score`` for every post; returns the number of posts with a score."""
+    from .models import BlogPost, PostViewDaily
+
+    today = timezone.localdate(now)
+    days = getattr(settings, 'BLOG_TRENDING_DAYS', 14)
+    half_life = getattr(settings, 'BLOG_TRENDING_HALF_LIFE', 3)
+
+    scores = defaultdict(float)
+    rows = PostViewDaily.objects.filter(date__gt=today - timedelta(days=days)).values_list('post_id', 'date', 'views')
+    for post_id, date, views in rows.iterator():
+        scores[post_id] += views * 0.5 ** ((today - date).days / half_life)
+
+    with transaction.atomic():
+        # Posts that dropped out of the window go back to zero
+        BlogPost.objects.exclude(trending_score=0).update(trending_score=0)
+        posts = [BlogPost(pk=post_id, trending_score=round(score, 4)) for post_id, score in scores.items()]
+        BlogPost.objects.bulk_update(posts, ['trending_score'], batch_size=500)
+    return len(posts)
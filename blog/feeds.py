@@ -0,0 +1,58 @@
+"""
+RSS and Atom feeds of the latest ``BLOG_FEED_ITEMS`` published posts, cached
+until a post is saved or deleted (see ``blog.cache.cached_document``).
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import require_safe
+
+from .cache import cached_document
+from .models import BlogPost
+from .serializers import display_author_name
+
+
+class LatestPostsFeed(Feed):
+    title = 'Homoeo Clinic blog'
+    link = '/blog/'
+    description = 'Latest articles from our doctors.'
+
+    def items(self):
+        return BlogPost.objects.filter(status='PUBLISHED').select_related('author').only(
+            'title', 'slug', 'summary', 'excerpt', 'created_at', 'updated_at',
+            'author__username', 'author__first_name', 'author__last_name', 'author__role',
+        ).order_by('-created_at')[:getattr(settings, 'BLOG_FEED_ITEMS', 50)]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.summary or item.excerpt
+
+    def item_author_name(self, item):
+        return display_author_name(item.author)
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+rss_feed = LatestPostsFeed()
+atom_feed = LatestPostsAtomFeed()
+
+
+@require_safe
+def rss(request):
+    return cached_document(request, 'rss', lambda: rss_feed(request))
+
+
+@require_safe
+def atom(request):
+    return cached_document(request, 'atom', lambda: atom_feed(request))
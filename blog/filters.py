@@ -0,0 +1,17 @@
+from rest_framework import filters
+
+
+class PostOrderingFilter(filters.OrderingFilter):
+    """
+    ``OrderingFilter`` plus named orderings that expand to several columns,
+    e.g. ``?ordering=trending`` for the precomputed ``trending_score``.
+    """
+    named_orderings = {
+        'trending': ['-trending_score', '-created_at'],
+    }
+
+    def get_ordering(self, request, queryset, view):
+        param = request.query_params.get(self.ordering_param)
+        if param and param.strip() in self.named_orderings:
+            return self.named_orderings[param.strip()]
+        return super().get_ordering(request, queryset, view)
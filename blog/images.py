@@ -0,0 +1,170 @@
+"""
+Responsive derivatives for ``BlogPost.image``.
+
+After an upload is committed the original is resized, off the request path, to
+each width in ``BLOG_IMAGE_WIDTHS`` and encoded in its own format plus every
+format in ``BLOG_IMAGE_FORMATS`` that the installed Pillow can write. The files
+are stored next to the original under content-hashed names
+(``blog_images/<name>.<hash>.<width>w.<ext>``) and recorded on the post as::
+
+    image_variants = {'webp': {'320': 'blog_images/...320w.webp', ...}, ...}
+
+``manage.py generate_image_variants`` backfills existing images with a process
+pool.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+PILLOW_FORMATS = {'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP', 'avif': 'AVIF', 'gif': 'GIF'}
+EXTENSIONS = {'jpeg': 'jpg', 'png': 'png', 'webp': 'webp', 'avif': 'avif', 'gif': 'gif'}
+SAVE_OPTIONS = {
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'optimize': True},
+    'webp': {'quality': 80, 'method': 4},
+    'avif': {'quality': 60},
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_widths():
+    return sorted(getattr(settings, 'BLOG_IMAGE_WIDTHS', [320, 640, 1280]))
+
+
+def get_formats():
+    formats = []
+    for fmt in getattr(settings, 'BLOG_IMAGE_FORMATS', ['webp', 'avif']):
+        if fmt in ('webp', 'avif') and not features.check(fmt):
+            continue
+        formats.append(fmt)
+    return formats
+
+
+def _target_widths(original_width):
+    widths = [width for width in get_widths() if width < original_width]
+    # Never upscale; an image narrower than every breakpoint gets one copy at its own size
+    return widths or [original_width]
+
+
+def _prepare(image, fmt):
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    if fmt in ('webp', 'avif') and image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+    return image
+
+
+def generate_variants(name, storage=None):
+    """
+    Write every derivative of the stored image ``name`` and return the variants
+    mapping. Only touches storage, never the database, so it is safe to call
+    from a worker process.
+    """
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, _ = os.path.splitext(name)
+
+    with Image.open(io.BytesIO(data)) as original:
+        original_format = (original.format or 'PNG').lower()
+        if original_format not in PILLOW_FORMATS:
+            original_format = 'png'
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    variants = {}
+    for fmt in [original_format] + [f for f in get_formats() if f != original_format]:
+        variants[fmt] = {}
+        for width in _target_widths(image.width):
+            path = f'{stem}.{digest}.{width}w.{EXTENSIONS[fmt]}'
+            if not storage.exists(path):
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+                buffer = io.BytesIO()
+                _prepare(resized, fmt).save(buffer, PILLOW_FORMATS[fmt], **SAVE_OPTIONS.get(fmt, {}))
+                saved = storage.save(path, ContentFile(buffer.getvalue()))
+                if saved != path:
+                    # Another worker wrote the same content-hashed file first
+                    storage.delete(saved)
+            variants[fmt][str(width)] = path
+    return variants
+
+
+def delete_variants(variants, keep=None, storage=None):
+    storage = storage or default_storage
+    keep = {path for paths in (keep or {}).values() for path in paths.values()}
+    for paths in variants.values():
+        for path in paths.values():
+            if path not in keep:
+                storage.delete(path)
+
+
+def process_post(post_id):
+    """Generate derivatives for a post's current image and record them."""
+    from .cache import invalidate
+    from .models import BlogPost
+
+    post = BlogPost.objects.filter(pk=post_id).only('image', 'image_variants').first()
+    if post is None or not post.image:
+        return
+    previous = post.image_variants or {}
+    variants = generate_variants(post.image.name)
+    # Only record the result if the image was not replaced while we worked;
+    # otherwise the job scheduled for the new image records its own variants.
+    updated = BlogPost.objects.filter(pk=post_id, image=post.image.name).update(image_variants=variants)
+    if updated:
+        delete_variants(previous, keep=variants)
+        invalidate()
+
+
+def _run(post_id):
+    try:
+        process_post(post_id)
+    except Exception:
+        logger.exception('Generating image variants for blog post %s failed', post_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BLOG_IMAGE_WORKERS', 2),
+                thread_name_prefix='blog-images',
+            )
+    return _executor
+
+
+def schedule_variants(post_id):
+    """Queue derivative generation once the current transaction commits."""
+    if getattr(settings, 'BLOG_IMAGE_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run, post_id))
+    else:
+        transaction.on_commit(lambda: process_post(post_id))
+
+
+def srcset(variants, build_url):
+    """``{'webp': 'url 320w, url 640w', ...}`` for a variants mapping."""
+    return {
+        fmt: ', '.join(
+            f'{build_url(path)} {width}w'
+            for width, path in sorted(paths.items(), key=lambda item: int(item[0]))
+        )
+        for fmt, paths in variants.items()
+    }
@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from blog import related
+from blog.models import BlogPost
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'pe', 'da', 'gu', 'hi', 'zo', 'be', 'fa', 'ri']
+
+
+def make_word(rng):
+    return ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the batch build of related posts (TF-IDF fit, top-k search, storage) and an '
+        'incremental refresh on generated posts. Runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=50_000)
+        parser.add_argument('--topics', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.generate(options['posts'], options['topics'], rng)
+
+            started = time.perf_counter()
+            model = related.TfidfModel.fit(related.published_documents())
+            fitted = time.perf_counter()
+            neighbours = model.neighbours(model.ids, related.get_k())
+            searched = time.perf_counter()
+            related.store(neighbours, replace_all=True)
+            stored = time.perf_counter()
+            self.stdout.write(
+                f'{len(model.ids)} posts, {len(model.vocabulary)} terms, {model.matrix.nnz} non-zeros\n'
+                f'  fit     {fitted - started:8.1f}s\n'
+                f'  top-k   {searched - fitted:8.1f}s\n'
+                f'  store   {stored - searched:8.1f}s\n'
+                f'  total   {stored - started:8.1f}s'
+            )
+
+            related._index = model
+            post = BlogPost.objects.order_by('?').first()
+            BlogPost.objects.filter(pk=post.pk).update(title=f'{post.title} revised')
+            started = time.perf_counter()
+            related.refresh_posts([post.pk])
+            self.stdout.write(f'Incremental refresh of one post: {(time.perf_counter() - started) * 1000:.0f} ms')
+            related._index = None
+            transaction.set_rollback(True)
+
+    def generate(self, count, topics, rng):
+        author = get_user_model().objects.create_user(username='benchmark-author', role='DOCTOR')
+        common = [make_word(rng) for _ in range(5_000)]
+        topic_words = [[make_word(rng) for _ in range(60)] for _ in range(topics)]
+        batch = []
+        for i in range(count):
+            words = topic_words[rng.randrange(topics)]
+            title = ' '.join(rng.choices(words, k=3) + rng.choices(common, k=3))
+            content = ' '.join(rng.choices(words, k=90) + rng.choices(common, k=210))
+            batch.append(BlogPost(
+                title=title, slug=f'benchmark-{i}', content=content,
+                summary=content[:200], author=author, status='PUBLISHED',
+            ))
+            if len(batch) == 5_000:
+                BlogPost.objects.bulk_create(batch)
+                batch = []
+        BlogPost.objects.bulk_create(batch)
@@ -0,0 +1,84 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework import filters
+from rest_framework.request import Request
+from blog import search
+from blog.models import BlogPost
+from blog.views import BlogPostList
+
+WORDS = [
+    'arnica', 'belladonna', 'bryonia', 'calendula', 'chamomilla', 'gelsemium',
+    'ignatia', 'lycopodium', 'nux', 'pulsatilla', 'rhus', 'sepia', 'sulphur',
+    'thuja', 'allergy', 'asthma', 'migraine', 'eczema', 'insomnia', 'fever',
+    'digestion', 'anxiety', 'children', 'dosage', 'potency', 'season', 'diet',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare blog search latency between the full-text index and the icontains '
+        'SearchFilter on generated posts. Runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        backend = search.get_backend(connection.alias)
+        if backend is None:
+            raise CommandError('The default database has no full-text search backend.')
+        rng = random.Random(options['seed'])
+        vocabulary = WORDS + [f'term{i}' for i in range(20_000)]
+
+        with transaction.atomic():
+            self.generate(options['posts'], vocabulary, rng, backend)
+            queries = ['arnica', 'migraine children', 'term1234', 'term19999 potency', 'nothingmatches']
+            view = BlogPostList(search_fields=BlogPostList.search_fields, ordering=['-created_at'])
+            factory = RequestFactory()
+            self.stdout.write(f'{"query":<22}{"fts ms":>10}{"icontains ms":>15}{"hits":>8}')
+            for query in queries:
+                request = Request(factory.get('/', {'search': query}))
+                fts = self.time_query(search.FullTextSearchFilter(), request, view, options['repeat'])
+                like = self.time_query(filters.SearchFilter(), request, view, options['repeat'])
+                self.stdout.write(f'{query:<22}{fts[0]:>10.1f}{like[0]:>15.1f}{fts[1]:>8}')
+            transaction.set_rollback(True)
+
+    def generate(self, count, vocabulary, rng, backend):
+        author = get_user_model().objects.create_user(
+            username='benchmark-author', first_name='Bench', last_name='Mark', role='DOCTOR'
+        )
+        batch = []
+        for i in range(count):
+            title = ' '.join(rng.choices(vocabulary, k=6))
+            content = ' '.join(rng.choices(vocabulary, k=300))
+            batch.append(BlogPost(
+                title=title, slug=f'benchmark-{i}', content=content,
+                summary=content[:200], author=author, status='PUBLISHED',
+            ))
+            if len(batch) == 5_000:
+                BlogPost.objects.bulk_create(batch)
+                batch = []
+        BlogPost.objects.bulk_create(batch)
+        user_table = connection.ops.quote_name(get_user_model()._meta.db_table)
+        started = time.perf_counter()
+        backend.rebuild(user_table)
+        self.stdout.write(f'Indexed {count} posts in {time.perf_counter() - started:.1f}s')
+
+    def time_query(self, search_filter, request, view, repeat):
+        timings = []
+        for _ in range(repeat):
+            queryset = BlogPost.objects.filter(status='PUBLISHED').order_by('-created_at')
+            started = time.perf_counter()
+            queryset = search_filter.filter_queryset(request, queryset, view)
+            hits = queryset.count()
+            list(queryset[:10])
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), hits
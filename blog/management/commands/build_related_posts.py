@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from blog import related
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the TF-IDF model and the stored related posts of every published post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', type=int, default=None, help='Neighbours per post (defaults to BLOG_RELATED_POSTS).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        model = related.build_all(options['k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Related posts rebuilt for {len(model.ids)} posts '
+            f'({len(model.vocabulary)} terms) in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from blog import counters
+from blog.cache import invalidate
+
+
+class Command(BaseCommand):
+    help = 'Recompute BlogPost.trending_score from the daily view counts. Run it periodically (e.g. from cron).'
+
+    def handle(self, *args, **options):
+        # Write out this process's own buffered views first (normally none)
+        counters.flush()
+        scored = counters.compute_trending()
+        invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Trending scores updated for {scored} posts.'))
@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from blog import images
+from blog.cache import invalidate
+from blog.models import BlogPost
+
+
+def _init_worker():
+    # Needed when the pool spawns fresh interpreters instead of forking
+    django.setup()
+
+
+def _generate(name):
+    return name, images.generate_variants(name)
+
+
+class Command(BaseCommand):
+    help = 'Generate resized/WebP/AVIF derivatives for existing blog post images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (defaults to the CPU count).')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate posts that already have variants.')
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            posts = posts.filter(image_variants={})
+        # Posts can share a file; each distinct image is processed once
+        names = set(posts.values_list('image', flat=True))
+        if not names:
+            self.stdout.write('No images to process.')
+            return
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_generate, name) for name in names]
+            for future in as_completed(futures):
+                try:
+                    name, variants = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'Failed: {exc}')
+                    continue
+                done += posts.filter(image=name).update(image_variants=variants)
+        invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} posts ({failed} failed).'))
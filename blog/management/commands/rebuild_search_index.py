@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from blog import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blog full-text search index from the blog_blogpost table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = search.get_backend(using)
+        if backend is None:
+            raise CommandError(f'No full-text search backend for database "{using}".')
+        user_table = connections[using].ops.quote_name(get_user_model()._meta.db_table)
+        with transaction.atomic(using=using):
+            backend.rebuild(user_table)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
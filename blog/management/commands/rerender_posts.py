@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from blog import rendering
+from blog.cache import invalidate
+from blog.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Re-render content_html/excerpt for posts rendered by an older renderer version.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--all', action='store_true',
+                            help='Re-render every post, not only those with a stale render_version.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = BlogPost.objects.only('id', 'content')
+        if not options['all']:
+            posts = posts.exclude(render_version=rendering.RENDERER_VERSION)
+
+        # bulk_update skips save() and its signals: no search reindex, no
+        # slug/summary handling and updated_at is left alone, which is what a
+        # pure re-render wants.
+        fields = ['content_html', 'excerpt', 'render_version']
+        total = 0
+        batch = []
+        with transaction.atomic():
+            for post in posts.order_by('id').iterator(chunk_size=batch_size):
+                post.render()
+                batch.append(post)
+                if len(batch) >= batch_size:
+                    BlogPost.objects.bulk_update(batch, fields)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                BlogPost.objects.bulk_update(batch, fields)
+                total += len(batch)
+            if total:
+                invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Re-rendered {total} posts.'))
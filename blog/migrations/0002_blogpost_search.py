@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:48
+
+import blog.search
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    backend = blog.search.get_backend(connection.alias)
+    if backend is None:
+        return
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {blog.search.FTS_TABLE} '
+            f'USING fts5(title, summary, content, author)'
+        )
+        schema_editor.execute(
+            f"INSERT INTO {blog.search.FTS_TABLE} ({blog.search.FTS_TABLE}, rank) "
+            f"VALUES ('rank', '{blog.search.SQLITE_RANK}')"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE blog_blogpost ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            'CREATE INDEX blog_blogpost_search_vector_gin ON blog_blogpost USING GIN (search_vector)'
+        )
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    backend.rebuild(schema_editor.quote_name(user_table))
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if blog.search.get_backend(connection.alias) is None:
+        return
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {blog.search.FTS_TABLE}')
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS blog_blogpost_search_vector_gin')
+        schema_editor.execute('ALTER TABLE blog_blogpost DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogPostSearchIndex',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='blog.blogpost')),
+                ('document', blog.search.SearchDocumentField(db_column='blog_blogpost_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'blog_blogpost_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
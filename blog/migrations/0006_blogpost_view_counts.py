@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_blogpost_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, help_text='Time-decayed recent views, see blog.counters'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-trending_score', '-created_at'], name='blog_blogpo_trendin_3f5f0a_idx'),
+        ),
+        migrations.AddField(
+            model_name='postviewdaily',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='blog.blogpost'),
+        ),
+        migrations.AddIndex(
+            model_name='postviewdaily',
+            index=models.Index(fields=['date'], name='blog_postvi_date_20328f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postviewdaily',
+            constraint=models.UniqueConstraint(fields=('post', 'date'), name='blog_postviewdaily_post_date_unique'),
+        ),
+    ]
@@ -1,7 +1,44 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils.text import slugify
 from django.contrib.auth import get_user_model
+from . import images, related, rendering, search
+
+
+class BlogPostQuerySet(models.QuerySet):
+    def for_listing(self):
+        """
+        Rows for index pages: the author in the same query and the number of
+        approved comments as an annotation, instead of loading either per post.
+        """
+        # Meta.ordering is not applied to aggregate queries, so restate it.
+        return self.select_related('author').annotate(
+            comment_count=models.Count('comments', filter=models.Q(comments__is_approved=True))
+        ).order_by(*self.model._meta.ordering)
+
+    def with_comments(self):
+        """
+        Rows for detail pages: the approved comment count plus only the latest
+        ``BLOG_LATEST_COMMENTS`` approved comments (as ``latest_comments``). The
+        rest are paged through ``/posts/<slug>/comments/``. The precomputed
+        related posts come along as ``related_list``.
+        """
+        latest = getattr(settings, 'BLOG_LATEST_COMMENTS', 3)
+        return self.select_related('author').annotate(
+            comment_count=models.Count('comments', filter=models.Q(comments__is_approved=True))
+        ).prefetch_related(
+            models.Prefetch(
+                'comments',
+                queryset=Comment.objects.filter(is_approved=True).select_related('author')[:latest],
+                to_attr='latest_comments',
+            ),
+            models.Prefetch(
+                'related_entries',
+                queryset=RelatedPost.objects.for_posts(),
+                to_attr='related_list',
+            ),
+        )
+
 
 class BlogPost(models.Model):
     STATUS_CHOICES = [
@@ -19,25 +56,79 @@ class BlogPost(models.Model):
     image = models.ImageField(upload_to='blog_images/', null=True, blank=True)
     summary = models.TextField(max_length=500, blank=True, help_text="A brief summary of the post")
     featured = models.BooleanField(default=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False,
+                                      help_text="Resized derivatives of the image, by format and width")
+    content_html = models.TextField(blank=True, editable=False, help_text="Sanitised HTML rendered from content")
+    excerpt = models.TextField(blank=True, editable=False, help_text="Plain-text excerpt of the rendered content")
+    render_version = models.PositiveSmallIntegerField(default=0, editable=False)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False,
+                                       help_text="Time-decayed recent views, see blog.counters")
+
+    objects = BlogPostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
             models.Index(fields=['status', '-created_at']),
+            models.Index(fields=['-trending_score', '-created_at']),
         ]
     
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image name so save() can tell when it was replaced
+        instance._loaded_image = instance.__dict__.get('image') or ''
+        instance._loaded_related_source = instance.related_source()
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def related_source(self):
+        return tuple(self.__dict__.get(field) for field in related.SOURCE_FIELDS)
         
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
         
-        if not self.summary and self.content:
-            # Create a summary from the first 200 characters of content
-            self.summary = self.content[:200] + '...' if len(self.content) > 200 else self.content
+        self.render()
+        if not self.summary and self.excerpt:
+            # Use the plain-text excerpt so the summary never ends inside markup
+            self.summary = self.excerpt
         
+        loaded_image = getattr(self, '_loaded_image', '')
+        stale_variants = {}
+        image_changed = 'image' in self.__dict__ and (self.image.name or '') != loaded_image
+        if image_changed:
+            stale_variants, self.image_variants = self.image_variants, {}
+
+        loaded_source = getattr(self, '_loaded_related_source', None)
+        # Drafts have no neighbours, so only published posts (or ones just unpublished) need a refresh
+        related_changed = self.related_source() != loaded_source and (
+            'PUBLISHED' in (self.status, getattr(self, '_loaded_status', None))
+        )
+
         super().save(*args, **kwargs)
+        search.index_post(self, using=self._state.db)
+
+        if related_changed:
+            self._loaded_related_source = self.related_source()
+            related.schedule_refresh([self.pk])
+
+        if image_changed:
+            self._loaded_image = self.image.name or ''
+            if stale_variants:
+                transaction.on_commit(lambda: images.delete_variants(stale_variants))
+            if self.image:
+                images.schedule_variants(self.pk)
+
+    def render(self):
+        """Fill ``content_html`` and ``excerpt`` from ``content``."""
+        self.content_html, self.excerpt = rendering.render(self.content)
+        self.render_version = rendering.RENDERER_VERSION
 
     def get_absolute_url(self):
         return f"/blog/{self.slug}/"
@@ -52,6 +143,84 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['post', 'is_approved', 'created_at']),
+        ]
 
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored approval so signal handlers can detect changes
+        instance._loaded_is_approved = instance.__dict__.get('is_approved')
+        return instance
+
+    @property
+    def approval_changed(self):
+        return self.is_approved != getattr(self, '_loaded_is_approved', False)
+
+class PostViewDaily(models.Model):
+    """Views of a post per day, written in batches by ``blog.counters.flush()``."""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='daily_views')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'date'], name='blog_postviewdaily_post_date_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} on {self.date}: {self.views}'
+
+class RelatedPostQuerySet(models.QuerySet):
+    def for_posts(self):
+        """Published neighbours in rank order, with just the columns a teaser needs."""
+        return self.filter(related__status='PUBLISHED').select_related('related').only(
+            'post_id', 'rank', 'score',
+            'related__id', 'related__title', 'related__slug', 'related__summary',
+            'related__image', 'related__created_at',
+        ).order_by('rank')
+
+class RelatedPost(models.Model):
+    """The top-k most similar posts of a post, maintained by ``blog.related``."""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    objects = RelatedPostQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['post', 'rank']
+        indexes = [
+            models.Index(fields=['post', 'rank']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id} ({self.score:.3f})'
+
+class BlogPostSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table behind full-text search (see ``blog.search``). It is
+    created and filled with raw SQL; the model only lets the ORM join and rank it.
+    """
+    post = models.OneToOneField(
+        BlogPost,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_entry'
+    )
+    document = search.SearchDocumentField(db_column=search.FTS_TABLE)
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = search.FTS_TABLE
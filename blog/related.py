@@ -0,0 +1,339 @@
+"""
+Precomputed "related posts" for the blog.
+
+Published posts are turned into TF-IDF vectors (title, summary and content,
+with the title and summary weighted up) held as a row-normalised SciPy CSR
+matrix, so cosine similarity is a sparse matrix product. The top
+``BLOG_RELATED_POSTS`` neighbours of every post are stored in ``RelatedPost``
+and served with the post through one indexed prefetch.
+
+``manage.py build_related_posts`` fits the model and rewrites every list.
+Between batch builds, ``BlogPost.save()`` and deletes schedule
+``refresh_posts()`` after commit. It re-vectorises only the changed posts
+in the process's cached model (IDF weights follow) and recomputes their lists.
+It also recomputes the lists of the posts they enter or drop out of, looking
+only at the ``BLOG_RELATED_REFRESH_CANDIDATES`` posts most similar to a changed
+one. Other posts' lists are left as they are until the next batch build. The
+cached model is refitted from the database after ``BLOG_RELATED_INDEX_TTL``
+seconds, which also picks up changes made by other processes.
+"""
+import itertools
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+STOP_WORDS = frozenset("""
+    about above after again against all also am an and any are as at be because been before being below
+    between both but by can could did do does doing down during each few for from further had has have
+    having he her here hers herself him himself his how if in into is it its itself just me more most my
+    myself no nor not now of off on once only or other our ours ourselves out over own same she should so
+    some such than that the their theirs them themselves then there these they this those through to too
+    under until up very was we were what when where which while who whom why will with would you your
+    yours yourself yourselves http https www com
+""".split())
+# Repeat counts for each field when building a post's term frequencies
+FIELD_WEIGHTS = (('title', 3), ('summary', 2), ('content', 1))
+# Fields whose change makes a post's neighbours stale
+SOURCE_FIELDS = ('title', 'summary', 'content', 'status')
+CHUNK_SIZE = 512
+
+_index = None
+_index_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_k():
+    return getattr(settings, 'BLOG_RELATED_POSTS', 5)
+
+
+def get_refresh_candidates():
+    return getattr(settings, 'BLOG_RELATED_REFRESH_CANDIDATES', 200)
+
+
+def term_counts(title, summary, content):
+    tokens = []
+    for (_, weight), text in zip(FIELD_WEIGHTS, (title, summary, content)):
+        tokens.extend(TOKEN_RE.findall((text or '').lower()) * weight)
+    counts = Counter(tokens)
+    for token in STOP_WORDS.intersection(counts):
+        del counts[token]
+    return counts
+
+
+class TfidfModel:
+    """
+    TF-IDF vectors of the published posts. The raw (field-weighted) term counts
+    are kept so posts can be added, replaced or removed without re-tokenising
+    the others; the weighted, row-normalised ``matrix`` is rederived from them
+    on demand. Row ``i`` belongs to post ``ids[i]``. Rows of removed posts are
+    zeroed rather than reused, so they never score above zero.
+    """
+
+    def __init__(self, ids, vocabulary, counts, min_df=2, max_terms=None):
+        self.ids = list(ids)
+        self.rows = {post_id: row for row, post_id in enumerate(self.ids)}
+        self.vocabulary = vocabulary
+        self.counts = counts
+        self.min_df = min_df
+        self.max_terms = max_terms or getattr(settings, 'BLOG_RELATED_MAX_TERMS', 40)
+        self.fitted_at = time.monotonic()
+        self._matrix = None
+
+    @classmethod
+    def fit(cls, documents):
+        """Fit on ``(id, title, summary, content)`` tuples."""
+        ids, indices, data, indptr = [], [], [], [0]
+        # Hands out the next column number to every unseen term
+        columns = defaultdict(itertools.count().__next__)
+        for post_id, title, summary, content in documents:
+            ids.append(post_id)
+            counts = term_counts(title, summary, content)
+            indices.extend(map(columns.__getitem__, counts))
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        vocabulary = dict(columns)
+        counts = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(ids), len(vocabulary)),
+        )
+        return cls(ids, vocabulary, counts)
+
+    @property
+    def matrix(self):
+        """Sublinear TF times IDF, every row scaled to unit length."""
+        if self._matrix is None:
+            df = np.bincount(self.counts.indices, minlength=self.counts.shape[1])
+            idf = (np.log((1 + len(self.rows)) / (1 + df)) + 1).astype(np.float32)
+            # A term used by a single post cannot relate two posts
+            idf[df < self.min_df] = 0
+            matrix = self.counts.copy()
+            matrix.data = (1 + np.log(matrix.data)) * idf[matrix.indices]
+            self.keep_top_terms(matrix)
+            matrix.eliminate_zeros()
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            self._matrix = sparse.diags(1 / norms).dot(matrix).astype(np.float32).tocsr()
+        return self._matrix
+
+    def keep_top_terms(self, matrix):
+        """
+        Zero all but each row's ``max_terms`` heaviest terms. The similarity
+        product costs roughly the sum of squared term frequencies, so capping
+        rows keeps it near linear while the terms that characterise a post
+        survive.
+        """
+        limit = self.max_terms
+        lengths = np.diff(matrix.indptr)
+        for row in np.flatnonzero(lengths > limit):
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            values = matrix.data[start:end]
+            values[np.argpartition(values, -limit)[:-limit]] = 0
+
+    def remove(self, post_id):
+        row = self.rows.pop(post_id, None)
+        if row is not None:
+            mask = np.ones(self.counts.shape[0], dtype=np.float32)
+            mask[row] = 0
+            self.counts = sparse.diags(mask).dot(self.counts).tocsr()
+            self.counts.eliminate_zeros()
+            self._matrix = None
+
+    def upsert(self, post_id, title, summary, content):
+        self.remove(post_id)
+        counts = term_counts(title, summary, content)
+        columns = [self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts]
+        row = sparse.csr_matrix(
+            (np.asarray(list(counts.values()), dtype=np.float32), ([0] * len(columns), columns)),
+            shape=(1, len(self.vocabulary)),
+        )
+        self.counts.resize((self.counts.shape[0], len(self.vocabulary)))
+        self.counts = sparse.vstack([self.counts, row], format='csr')
+        self.rows[post_id] = len(self.ids)
+        self.ids.append(post_id)
+        self._matrix = None
+
+    def neighbours(self, post_ids, k):
+        """``{post_id: [(related_id, score), ...]}`` best first, for indexed posts."""
+        post_ids = [post_id for post_id in post_ids if post_id in self.rows]
+        ids = np.asarray(self.ids)
+        matrix = self.matrix
+        transposed = matrix.T.tocsr()
+        result = {}
+        for start in range(0, len(post_ids), CHUNK_SIZE):
+            chunk = post_ids[start:start + CHUNK_SIZE]
+            scores = (matrix[[self.rows[post_id] for post_id in chunk]] @ transposed).tocsr()
+            # Only the non-zero similarities of each row are ranked, never all N columns
+            for i, post_id in enumerate(chunk):
+                begin, end = scores.indptr[i], scores.indptr[i + 1]
+                columns, values = scores.indices[begin:end], scores.data[begin:end]
+                own = columns != self.rows[post_id]
+                columns, values = columns[own], values[own]
+                if len(values) > k:
+                    best = np.argpartition(-values, k - 1)[:k]
+                    columns, values = columns[best], values[best]
+                order = np.lexsort((ids[columns], -values))
+                result[post_id] = [
+                    (int(ids[column]), float(value))
+                    for column, value in zip(columns[order], values[order]) if value > 0
+                ]
+        return result
+
+
+def published_documents():
+    from .models import BlogPost
+
+    return BlogPost.objects.filter(status='PUBLISHED').order_by('id').values_list(
+        'id', 'title', 'summary', 'content'
+    ).iterator(chunk_size=2000)
+
+
+def get_model():
+    """The process's cached model, refitted when older than ``BLOG_RELATED_INDEX_TTL``."""
+    global _index
+    ttl = getattr(settings, 'BLOG_RELATED_INDEX_TTL', 3600)
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.fitted_at > ttl:
+            _index = TfidfModel.fit(published_documents())
+        return _index
+
+
+def store(neighbours, replace_all=False):
+    """Replace the stored lists of the posts in ``neighbours`` (or every list)."""
+    from .models import RelatedPost
+
+    with transaction.atomic():
+        if replace_all:
+            RelatedPost.objects.all().delete()
+        else:
+            RelatedPost.objects.filter(post_id__in=list(neighbours)).delete()
+        RelatedPost.objects.bulk_create(
+            [
+                RelatedPost(post_id=post_id, related_id=related_id, score=score, rank=rank)
+                for post_id, related in neighbours.items()
+                for rank, (related_id, score) in enumerate(related, start=1)
+            ],
+            batch_size=5000,
+        )
+
+
+def build_all(k=None):
+    """Fit a fresh model and rewrite every post's list; returns the model."""
+    from .cache import invalidate
+
+    global _index
+    model = TfidfModel.fit(published_documents())
+    store(model.neighbours(model.ids, k or get_k()), replace_all=True)
+    with _index_lock:
+        _index = model
+    invalidate()
+    return model
+
+
+def refresh_posts(post_ids, affected=()):
+    """
+    Re-vectorise ``post_ids`` and recompute their lists, plus the lists of
+    ``affected`` posts and of every post the changed ones now belong in.
+    """
+    from .cache import invalidate
+    from .models import BlogPost, RelatedPost
+
+    k = get_k()
+    model = get_model()
+    post_ids = set(post_ids)
+    affected = set(affected)
+    affected.update(RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True))
+
+    live = []
+    rows = BlogPost.objects.filter(pk__in=post_ids).values_list('id', 'status', 'title', 'summary', 'content')
+    found = set()
+    for post_id, status, title, summary, content in rows:
+        found.add(post_id)
+        if status == 'PUBLISHED':
+            model.upsert(post_id, title, summary, content)
+            live.append(post_id)
+        else:
+            model.remove(post_id)
+    for post_id in post_ids - found:
+        model.remove(post_id)
+
+    if live:
+        # Posts whose current k-th neighbour is weaker than a changed post. Only
+        # the changed rows are multiplied, so the cost follows the posts sharing
+        # their terms, and only the closest ``limit`` of those are checked.
+        matrix = model.matrix
+        live_rows = [model.rows[post_id] for post_id in live]
+        similarity = (matrix[live_rows] @ matrix.T).tocsr()
+        best = np.asarray(similarity.max(axis=0).todense()).ravel()
+        best[live_rows] = 0
+        rows = np.flatnonzero(best > 0)
+        limit = get_refresh_candidates()
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-best[rows], limit - 1)[:limit]]
+        candidates = [model.ids[row] for row in rows]
+        floors = {
+            row['post_id']: (row['size'], row['floor'])
+            for row in RelatedPost.objects.filter(post_id__in=candidates).order_by().values('post_id').annotate(
+                size=models.Count('id'), floor=models.Min('score')
+            )
+        }
+        for post_id in candidates:
+            size, floor = floors.get(post_id, (0, 0))
+            if size < k or best[model.rows[post_id]] > floor:
+                affected.add(post_id)
+
+    targets = affected | set(live)
+    neighbours = model.neighbours(targets, k)
+    while True:
+        referenced = {related_id for entries in neighbours.values() for related_id, _ in entries}
+        stale = referenced - set(
+            BlogPost.objects.filter(pk__in=referenced, status='PUBLISHED').values_list('id', flat=True)
+        )
+        if not stale:
+            break
+        # Deleted or unpublished by another process since this model was fitted
+        for post_id in stale:
+            model.remove(post_id)
+        neighbours = model.neighbours(targets, k)
+    # Posts that are no longer indexed (deleted, unpublished) lose their list
+    neighbours.update((post_id, []) for post_id in (affected | post_ids) - set(neighbours))
+    store(neighbours)
+    invalidate()
+
+
+def _run(post_ids, affected):
+    try:
+        refresh_posts(post_ids, affected)
+    except Exception:
+        logger.exception('Refreshing related posts for %s failed', sorted(post_ids))
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One worker keeps refreshes of the shared model in order
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blog-related')
+    return _executor
+
+
+def schedule_refresh(post_ids, affected=()):
+    """Queue ``refresh_posts`` once the current transaction commits."""
+    post_ids, affected = list(post_ids), list(affected)
+    if getattr(settings, 'BLOG_RELATED_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run, post_ids, affected))
+    else:
+        transaction.on_commit(lambda: refresh_posts(post_ids, affected))
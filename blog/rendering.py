@@ -0,0 +1,144 @@
+"""
+Markdown rendering for ``BlogPost.content``.
+
+Posts are rendered once, in ``BlogPost.save()``, into sanitised HTML
+(``content_html``) and a plain-text ``excerpt``. ``RENDERER_VERSION`` is stored
+alongside; bump it whenever the output of ``render()`` changes and run
+``manage.py rerender_posts`` to bring stored posts up to date.
+"""
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import markdown
+
+RENDERER_VERSION = 1
+EXCERPT_LENGTH = 200
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists']
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'dd', 'del', 'dl', 'dt', 'em',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre',
+    'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'code': {'class'},
+    'td': {'align'},
+    'th': {'align'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+# Dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript'}
+VOID_TAGS = {'br', 'hr', 'img'}
+BLOCK_TAGS = {
+    'blockquote', 'br', 'dd', 'dl', 'dt', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+    'li', 'ol', 'p', 'pre', 'table', 'td', 'th', 'tr', 'ul',
+}
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _safe_url(value):
+    value = value.strip()
+    try:
+        scheme = urlsplit(value).scheme.lower()
+    except ValueError:
+        return False
+    return scheme in ALLOWED_SCHEMES
+
+
+class Sanitizer(HTMLParser):
+    """
+    Whitelist sanitiser: keeps ``ALLOWED_TAGS`` with ``ALLOWED_ATTRIBUTES``,
+    unwraps any other tag, drops ``DROP_CONTENT_TAGS`` entirely and collects the
+    visible text for the excerpt along the way.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        rendered = ''.join(
+            f' {name}="{escape(value or "", quote=True)}"'
+            for name, value in attrs
+            if name in allowed and (name not in URL_ATTRIBUTES or _safe_url(value or ''))
+        )
+        self.html.append(f'<{tag}{rendered}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in self.open_tags:
+            return
+        # Close anything left open inside this element so the output stays well formed
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.html.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.html.append(f'</{self.open_tags.pop()}>')
+
+
+def sanitize(html):
+    """Return ``(safe_html, plain_text)`` for a fragment of HTML."""
+    parser = Sanitizer()
+    parser.feed(html)
+    parser.close()
+    text = WHITESPACE_RE.sub(' ', ''.join(parser.text)).strip()
+    return ''.join(parser.html), text
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip(' ,.;:') + '...'
+
+
+def render(content):
+    """Render Markdown ``content`` to ``(content_html, excerpt)``."""
+    html = markdown.markdown(content or '', extensions=MARKDOWN_EXTENSIONS, output_format='html')
+    safe_html, text = sanitize(html)
+    return safe_html, make_excerpt(text)
@@ -0,0 +1,194 @@
+"""
+Full-text search for blog posts.
+
+SQLite keeps an FTS5 virtual table (``blog_blogpost_fts``) keyed by the post id;
+PostgreSQL keeps a weighted ``tsvector`` column on ``blog_blogpost`` behind a GIN
+index. Both are created by ``blog/migrations/0002_blogpost_search.py``, refreshed
+from ``BlogPost.save()`` and the ``post_delete`` signal, and can be rebuilt with
+``manage.py rebuild_search_index``. On any other database, or when SQLite was
+built without FTS5, ``FullTextSearchFilter`` falls back to DRF's ``icontains``
+search.
+"""
+import re
+
+from django.db import connections, models
+from rest_framework import filters
+
+FTS_TABLE = 'blog_blogpost_fts'
+POSTGRES_CONFIG = 'english'
+# Relative column weights: title, summary, content, author.
+SQLITE_RANK = 'bm25(10.0, 4.0, 1.0, 2.0)'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchDocumentField(models.TextField):
+    """The FTS5 hidden column named after its table, which accepts ``MATCH``."""
+
+
+SearchDocumentField.register_lookup(FullTextMatch)
+
+
+def _author_text(first_name, last_name, username):
+    return ' '.join(part for part in (first_name, last_name, username) if part)
+
+
+class SQLiteBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index(self, post):
+        author = post.author
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, summary, content, author) VALUES (%s, %s, %s, %s, %s)',
+                [post.pk, post.title, post.summary, post.content,
+                 _author_text(author.first_name, author.last_name, author.username)],
+            )
+
+    def remove(self, post_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def rebuild(self, user_table):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, summary, content, author) "
+                f"SELECT p.id, p.title, p.summary, p.content, "
+                f"TRIM(u.first_name || ' ' || u.last_name || ' ' || u.username) "
+                f"FROM blog_blogpost p INNER JOIN {user_table} u ON u.id = p.author_id"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+            # Without statistics the planner assumes ``status = ?`` is selective and
+            # probes the FTS table once per post instead of driving the join from it.
+            cursor.execute('ANALYZE blog_blogpost')
+
+    def build_query(self, terms):
+        # Quote every token so user input can never be parsed as FTS5 syntax;
+        # the last one is a prefix match for search-as-you-type.
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, queryset, terms):
+        return queryset.filter(
+            search_entry__document__match=self.build_query(terms)
+        ).annotate(
+            search_rank=models.F('search_entry__rank')
+        ).order_by('search_entry__rank', '-created_at')
+
+
+class PostgresBackend:
+    VECTOR_SQL = (
+        "setweight(to_tsvector('{config}', coalesce({alias}.title, '')), 'A') || "
+        "setweight(to_tsvector('{config}', coalesce({alias}.summary, '')), 'B') || "
+        "setweight(to_tsvector('{config}', coalesce({alias}.content, '')), 'C') || "
+        "setweight(to_tsvector('{config}', {author}), 'B')"
+    )
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index(self, post):
+        author = post.author
+        vector = self.VECTOR_SQL.format(config=POSTGRES_CONFIG, alias='blog_blogpost', author='%s')
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE blog_blogpost SET search_vector = {vector} WHERE id = %s',
+                [_author_text(author.first_name, author.last_name, author.username), post.pk],
+            )
+
+    def remove(self, post_id):
+        # The vector lives on the post row and goes away with it.
+        pass
+
+    def rebuild(self, user_table):
+        author = "concat_ws(' ', u.first_name, u.last_name, u.username)"
+        vector = self.VECTOR_SQL.format(config=POSTGRES_CONFIG, alias='p', author=author)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE blog_blogpost p SET search_vector = {vector} '
+                f'FROM {user_table} u WHERE u.id = p.author_id'
+            )
+
+    def search(self, queryset, terms):
+        tsquery = f"to_tsquery('{POSTGRES_CONFIG}', %s)"
+        query = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        return queryset.filter(
+            models.expressions.RawSQL(
+                f'blog_blogpost.search_vector @@ {tsquery}', [query], output_field=models.BooleanField()
+            )
+        ).annotate(
+            search_rank=models.expressions.RawSQL(
+                f'ts_rank_cd(blog_blogpost.search_vector, {tsquery})', [query], output_field=models.FloatField()
+            )
+        ).order_by('-search_rank', '-created_at')
+
+
+def sqlite_supports_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+_fts5_support = {}
+
+
+def get_backend(using='default'):
+    """Return the search backend for a database alias, or None to fall back."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return PostgresBackend(connection)
+    if connection.vendor == 'sqlite':
+        if using not in _fts5_support:
+            _fts5_support[using] = sqlite_supports_fts5(connection)
+        if _fts5_support[using]:
+            return SQLiteBackend(connection)
+    return None
+
+
+def index_post(post, using='default'):
+    backend = get_backend(using)
+    if backend is not None:
+        backend.index(post)
+
+
+def remove_post(post_id, using='default'):
+    backend = get_backend(using)
+    if backend is not None:
+        backend.remove(post_id)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query)[:16]
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the full-text index, ordered by relevance unless the
+    client asked for an explicit ``?ordering=``. Falls back to the regular
+    ``SearchFilter`` behaviour when no index is available.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        terms = tokenize(query)
+        backend = get_backend(queryset.db)
+        if not terms or backend is None:
+            return super().filter_queryset(request, queryset, view)
+        ordering = queryset.query.order_by
+        queryset = backend.search(queryset, terms)
+        if request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by(*ordering)
+        return queryset
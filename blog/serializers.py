@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import BlogPost, Comment
+from django.core.files.storage import default_storage
+from .models import BlogPost, Comment, RelatedPost
+from . import images
 
 User = get_user_model()
 
@@ -16,14 +19,83 @@ class CommentSerializer(serializers.ModelSerializer):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
+class PostCommentSerializer(CommentSerializer):
+    """Comments created under ``/posts/<slug>/comments/``, where the URL names the post."""
+
+    class Meta(CommentSerializer.Meta):
+        read_only_fields = CommentSerializer.Meta.read_only_fields + ['post']
+
+def display_author_name(author):
+    if hasattr(author, 'role') and author.role == 'DOCTOR':
+        first = author.first_name or ''
+        last = author.last_name or ''
+        name = f"Dr. {first} {last}".strip()
+        return name if name != 'Dr.' else author.username
+    return author.username
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Renders ``BlogPost.image_variants`` as ``{format: srcset string}``."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image_variants'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        def build_url(path):
+            url = default_storage.url(path)
+            return request.build_absolute_uri(url) if request is not None else url
+        return images.srcset(value or {}, build_url)
+
+class BlogPostListSerializer(serializers.ModelSerializer):
+    """
+    Compact representation for listings. Expects a queryset built with
+    ``BlogPost.objects.for_listing()`` so that ``author`` is already joined and
+    ``comment_count`` is annotated.
+    """
+    author_name = serializers.SerializerMethodField()
+    comment_count = serializers.IntegerField(read_only=True)
+    image_srcset = ImageSrcsetField()
+
+    class Meta:
+        model = BlogPost
+        fields = (
+            'id',
+            'title',
+            'slug',
+            'status',
+            'summary',
+            'featured',
+            'image',
+            'image_srcset',
+            'author',
+            'author_name',
+            'comment_count',
+            'view_count',
+            'created_at',
+        )
+        read_only_fields = fields
+
+    def get_author_name(self, obj):
+        return display_author_name(obj.author)
+
+class RelatedPostSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BlogPost
+        fields = ('id', 'title', 'slug', 'summary', 'image', 'created_at')
+        read_only_fields = fields
+
 class BlogPostSerializer(serializers.ModelSerializer):
     author_name = serializers.SerializerMethodField()
     is_author = serializers.SerializerMethodField()
     author_role = serializers.SerializerMethodField()
     created_at_formatted = serializers.SerializerMethodField()
     updated_at_formatted = serializers.SerializerMethodField()
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
+    comment_count = serializers.SerializerMethodField()
+    related_posts = serializers.SerializerMethodField()
     author_details = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
     
     class Meta:
         model = BlogPost
@@ -31,6 +103,8 @@ class BlogPostSerializer(serializers.ModelSerializer):
             'id', 
             'title', 
             'content',
+            'content_html',
+            'excerpt',
             'slug',
             'status',
             'summary',
@@ -44,19 +118,38 @@ class BlogPostSerializer(serializers.ModelSerializer):
             'updated_at',
             'updated_at_formatted',
             'image',
+            'image_srcset',
             'comments',
+            'comment_count',
+            'view_count',
+            'related_posts',
             'author_details',
         )
-        read_only_fields = ('author', 'created_at', 'updated_at')
+        read_only_fields = ('author', 'content_html', 'excerpt', 'created_at', 'updated_at')
 
     def get_author_name(self, obj):
-        if hasattr(obj.author, 'role') and obj.author.role == 'DOCTOR':
-            first = obj.author.first_name or ''
-            last = obj.author.last_name or ''
-            name = f"Dr. {first} {last}".strip()
-            return name if name != 'Dr.' else obj.author.username
-        else:
-            return obj.author.username
+        return display_author_name(obj.author)
+
+    def get_comments(self, obj):
+        # Filled by BlogPost.objects.with_comments(); fall back to a query otherwise
+        comments = getattr(obj, 'latest_comments', None)
+        if comments is None:
+            latest = getattr(settings, 'BLOG_LATEST_COMMENTS', 3)
+            comments = obj.comments.filter(is_approved=True).select_related('author')[:latest]
+        return CommentSerializer(comments, many=True, context=self.context).data
+
+    def get_related_posts(self, obj):
+        # Filled by BlogPost.objects.with_comments(); fall back to a query otherwise
+        entries = getattr(obj, 'related_list', None)
+        if entries is None:
+            entries = RelatedPost.objects.for_posts().filter(post=obj)
+        return RelatedPostSerializer([entry.related for entry in entries], many=True, context=self.context).data
+
+    def get_comment_count(self, obj):
+        count = getattr(obj, 'comment_count', None)
+        if count is None:
+            count = obj.comments.filter(is_approved=True).count()
+        return count
 
     def get_author_details(self, obj):
         return {
@@ -74,7 +167,7 @@ class BlogPostSerializer(serializers.ModelSerializer):
     def get_is_author(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            return obj.author == request.user
+            return obj.author_id == request.user.id
         return False
 
     def get_author_role(self, obj):
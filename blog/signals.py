@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from . import cache, related, search
+from .models import BlogPost, Comment, RelatedPost
+
+@receiver(post_delete, sender=BlogPost)
+def remove_deleted_post_from_search(sender, instance, using, **kwargs):
+    search.remove_post(instance.pk, using=using)
+
+@receiver(pre_delete, sender=BlogPost)
+def remember_posts_listing_deleted_post(sender, instance, **kwargs):
+    # The cascade removes their RelatedPost rows before post_delete runs
+    instance._related_listing = list(
+        RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True)
+    )
+
+@receiver(post_delete, sender=BlogPost)
+def refresh_posts_listing_deleted_post(sender, instance, **kwargs):
+    listing = getattr(instance, '_related_listing', [])
+    if listing:
+        related.schedule_refresh([instance.pk], affected=listing)
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_cached_posts(sender, **kwargs):
+    cache.invalidate()
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_feeds(sender, instance, **kwargs):
+    # Sitemaps and feeds only list published posts; edits to drafts leave them alone
+    if 'PUBLISHED' in (instance.status, getattr(instance, '_loaded_status', None)):
+        cache.invalidate(cache.FEEDS_VERSION_KEY)
+    instance._loaded_status = instance.status
+
+@receiver(post_save, sender=Comment)
+def invalidate_on_comment_approval(sender, instance, **kwargs):
+    # Unapproved comments are invisible to cached readers, so only approval changes count
+    if instance.approval_changed:
+        cache.invalidate()
+    instance._loaded_is_approved = instance.is_approved
+
+@receiver(post_delete, sender=Comment)
+def invalidate_on_approved_comment_delete(sender, instance, **kwargs):
+    if instance.is_approved:
+        cache.invalidate()
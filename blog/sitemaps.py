@@ -0,0 +1,100 @@
+"""
+``/sitemap.xml`` for published posts.
+
+Up to ``BLOG_SITEMAP_LIMIT`` (the protocol maximum, 50,000) URLs are served as a
+single ``<urlset>``. Past that, ``/sitemap.xml`` becomes a ``<sitemapindex>`` of
+``/sitemap-<n>.xml`` sections, each covering a contiguous id range, so a
+section is one indexed range scan rather than an ``OFFSET``. Section bounds
+come from a single pass over the ids. Posts are streamed with ``.only()`` and
+``iterator()``, and every document is cached until a post is saved or deleted
+(see ``blog.cache.cached_document``).
+"""
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from .cache import FEEDS_VERSION_KEY, cached_document, get_feeds_timeout, get_version
+from .models import BlogPost
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def get_limit():
+    return getattr(settings, 'BLOG_SITEMAP_LIMIT', 50_000)
+
+
+def published_posts():
+    return BlogPost.objects.filter(status='PUBLISHED')
+
+
+def get_sections():
+    """``[(first_id, last_id, lastmod), ...]``, one per sitemap file."""
+    key = f'blog:sitemap:sections:{get_version(FEEDS_VERSION_KEY)}'
+    sections = cache.get(key)
+    if sections is None:
+        limit = get_limit()
+        sections = []
+        first = last = lastmod = None
+        size = 0
+        rows = published_posts().order_by('id').values_list('id', 'updated_at').iterator(chunk_size=10_000)
+        for post_id, updated_at in rows:
+            if size == limit:
+                sections.append((first, last, lastmod))
+                first, lastmod, size = None, None, 0
+            first = post_id if first is None else first
+            last = post_id
+            lastmod = updated_at if lastmod is None else max(lastmod, updated_at)
+            size += 1
+        if size:
+            sections.append((first, last, lastmod))
+        cache.set(key, sections, get_feeds_timeout())
+    return sections
+
+
+def render_urlset(request, first=None, last=None):
+    posts = published_posts().only('id', 'slug', 'updated_at').order_by('id')
+    if first is not None:
+        posts = posts.filter(id__gte=first, id__lte=last)
+    parts = [XML_HEADER, f'<urlset xmlns="{SITEMAP_NS}">\n']
+    for post in posts.iterator(chunk_size=2000):
+        parts.append(
+            f'<url><loc>{escape(request.build_absolute_uri(post.get_absolute_url()))}</loc>'
+            f'<lastmod>{post.updated_at.isoformat()}</lastmod></url>\n'
+        )
+    parts.append('</urlset>\n')
+    return HttpResponse(''.join(parts), content_type='application/xml; charset=utf-8')
+
+
+def render_index(request, sections):
+    parts = [XML_HEADER, f'<sitemapindex xmlns="{SITEMAP_NS}">\n']
+    for number, (_, _, lastmod) in enumerate(sections, start=1):
+        location = request.build_absolute_uri(reverse('sitemap-section', args=[number]))
+        parts.append(f'<sitemap><loc>{escape(location)}</loc><lastmod>{lastmod.isoformat()}</lastmod></sitemap>\n')
+    parts.append('</sitemapindex>\n')
+    return HttpResponse(''.join(parts), content_type='application/xml; charset=utf-8')
+
+
+@require_safe
+def sitemap(request):
+    def build():
+        sections = get_sections()
+        if len(sections) <= 1:
+            return render_urlset(request)
+        return render_index(request, sections)
+    return cached_document(request, 'sitemap', build)
+
+
+@require_safe
+def sitemap_section(request, section):
+    def build():
+        sections = get_sections()
+        if not 1 <= section <= len(sections) or len(sections) == 1:
+            raise Http404('No such sitemap section')
+        first, last, _ = sections[section - 1]
+        return render_urlset(request, first, last)
+    return cached_document(request, f'sitemap-{section}', build)
@@ -1,3 +1,619 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from datetime import timedelta
+from django.utils import timezone
+from . import counters, related, rendering
+from .cache import VERSION_KEY
+from .models import BlogPost, Comment, PostViewDaily, RelatedPost
 
-# Create your tests here.
+User = get_user_model()
+
+class BlogListingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # Views buffered by earlier tests could make a flush due and add queries
+        counters.reset()
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            first_name='Asha',
+            last_name='Rao',
+            role='DOCTOR'
+        )
+        self.patient = User.objects.create_user(
+            username='testpatient',
+            password='testpass123',
+            role='PATIENT'
+        )
+        self.list_url = reverse('blog-list')
+
+    def create_posts(self, count, comments_per_post):
+        start = BlogPost.objects.count()
+        for i in range(start, start + count):
+            post = BlogPost.objects.create(
+                title=f'Remedies for season {i}',
+                content='A long article body about homoeopathic remedies. ' * 20,
+                author=self.doctor,
+                status='PUBLISHED'
+            )
+            for j in range(comments_per_post):
+                Comment.objects.create(
+                    post=post,
+                    author=self.patient,
+                    content=f'Comment {j}',
+                    is_approved=j % 2 == 0
+                )
+
+    def test_list_uses_compact_representation(self):
+        """Listings carry the summary and a comment count, not content or comments"""
+        self.create_posts(1, 3)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        post = response.data['results'][0]
+        self.assertNotIn('content', post)
+        self.assertNotIn('comments', post)
+        self.assertEqual(post['comment_count'], 2)
+        self.assertEqual(post['author_name'], 'Dr. Asha Rao')
+
+    def test_list_query_count_is_constant(self):
+        """The number of queries does not grow with posts or comments"""
+        self.create_posts(2, 1)
+        with self.assertNumQueries(2):
+            self.client.get(self.list_url)
+
+        self.create_posts(8, 5)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data['results']), 10)
+
+        with self.assertNumQueries(2):
+            self.client.get(reverse('blogpost-list'))
+
+    def test_detail_includes_only_approved_comments(self):
+        """Detail routes keep the full serializer with approved comments"""
+        self.create_posts(1, 4)
+        post = BlogPost.objects.get()
+        # The post, its latest comments and its related posts
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('blog-detail', args=[post.slug]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('content', response.data)
+        self.assertEqual(len(response.data['comments']), 2)
+        self.assertTrue(all(c['is_approved'] for c in response.data['comments']))
+
+class BlogKeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        for i in range(25):
+            BlogPost.objects.create(
+                title=f'Keyset post number {i}',
+                content='Content long enough to pass validation rules.',
+                author=self.doctor,
+                status='PUBLISHED'
+            )
+        # Force ties on created_at so the id tie-breaker matters
+        first_ids = list(BlogPost.objects.order_by('id').values_list('id', flat=True)[:12])
+        BlogPost.objects.filter(id__in=first_ids).update(created_at=BlogPost.objects.get(id=first_ids[0]).created_at)
+
+    def test_cursor_walks_every_post_once_without_count(self):
+        """Cursor mode pages forward and back over ties without a COUNT query"""
+        url = reverse('blog-list') + '?pagination=cursor'
+        seen = []
+        pages = []
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append([post['id'] for post in response.data['results']])
+            seen.extend(pages[-1])
+            url = response.data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        expected = list(BlogPost.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(reverse('blog-list') + '?pagination=cursor')
+        response = self.client.get(response.data['next'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([post['id'] for post in response.data['results']], pages[0])
+        self.assertIsNone(response.data['previous'])
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get(reverse('blog-list'))
+        self.assertEqual(response.data['count'], 25)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('blog-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class BlogSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            first_name='Meera',
+            last_name='Shah',
+            role='DOCTOR'
+        )
+        self.title_hit = BlogPost.objects.create(
+            title='Arnica for bruises',
+            content='How to use the remedy after minor injuries and sprains.',
+            author=self.doctor,
+            status='PUBLISHED'
+        )
+        self.body_hit = BlogPost.objects.create(
+            title='Sports first aid kit',
+            content='Keep arnica, calendula and bandages in the kit at all times.',
+            author=self.doctor,
+            status='PUBLISHED'
+        )
+        self.miss = BlogPost.objects.create(
+            title='Sleep hygiene basics',
+            content='Regular hours and a quiet room matter more than anything else.',
+            author=self.doctor,
+            status='PUBLISHED'
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse('blog-list'), {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.search('arnica'), [self.title_hit.id, self.body_hit.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.miss.content = 'Arnica is not a sleep remedy, whatever the forums say.'
+        self.miss.save()
+        self.assertIn(self.miss.id, self.search('arnica'))
+        self.title_hit.delete()
+        self.assertNotIn(self.title_hit.id, self.search('arnica'))
+
+    def test_author_names_and_prefixes_match(self):
+        self.assertEqual(len(self.search('Shah')), 3)
+        self.assertEqual(self.search('calend'), [self.body_hit.id])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"arnica -(:'), [self.title_hit.id, self.body_hit.id])
+        self.assertEqual(self.search('***'), [])
+
+class BlogResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        counters.reset()
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        self.patient = User.objects.create_user(
+            username='testpatient',
+            password='testpass123',
+            role='PATIENT'
+        )
+        self.post = BlogPost.objects.create(
+            title='Cached remedies guide',
+            content='Content long enough to be a real post body.',
+            author=self.doctor,
+            status='PUBLISHED'
+        )
+        self.detail_url = reverse('blog-detail', args=[self.post.slug])
+
+    def test_repeat_requests_are_served_from_cache(self):
+        first = self.client.get(reverse('blog-list'))
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('blog-list'))
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_post_save_and_comment_approval_invalidate(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.post.title = 'Cached remedies guide, revised'
+        self.post.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Cached remedies guide, revised')
+
+        comment = Comment.objects.create(post=self.post, author=self.patient, content='Thanks!')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        comment = Comment.objects.get(pk=comment.pk)
+        comment.is_approved = True
+        comment.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['comments']), 1)
+
+    def test_last_modified_moves_when_a_post_leaves_the_list(self):
+        newer = BlogPost.objects.create(
+            title='Newer remedies guide', content='Another post body.', author=self.doctor, status='PUBLISHED'
+        )
+        # Posts and the last invalidation an hour ago, so the next change falls in a later second
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        BlogPost.objects.update(updated_at=an_hour_ago)
+        cache.clear()
+        cache.set(f'{VERSION_KEY}:changed_at', an_hour_ago.timestamp(), None)
+        response = self.client.get(reverse('blog-list'))
+        self.assertEqual(response.data['count'], 2)
+        last_modified = response['Last-Modified']
+        self.assertEqual(
+            self.client.get(reverse('blog-list'), HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+        newer.delete()
+        response = self.client.get(reverse('blog-list'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_last_modified_moves_when_a_comment_is_approved(self):
+        comment = Comment.objects.create(post=self.post, author=self.patient, content='Thanks!')
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        BlogPost.objects.update(updated_at=an_hour_ago)
+        cache.clear()
+        cache.set(f'{VERSION_KEY}:changed_at', an_hour_ago.timestamp(), None)
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+
+        comment.is_approved = True
+        comment.save()
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['comments']), 1)
+
+    def test_doctors_bypass_the_cache(self):
+        draft = BlogPost.objects.create(
+            title='Unpublished draft post',
+            content='Draft content that only doctors should see.',
+            author=self.doctor,
+            status='DRAFT'
+        )
+        self.client.get(reverse('blog-list'))
+        self.client.force_authenticate(self.doctor)
+        response = self.client.get(reverse('blog-list'))
+        self.assertIn(draft.id, [post['id'] for post in response.data['results']])
+        self.assertNotIn('ETag', response)
+
+
+class BlogImageVariantTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            BLOG_IMAGE_WIDTHS=[100, 200, 4000],
+            BLOG_IMAGE_FORMATS=['webp'],
+            BLOG_IMAGE_ASYNC=False,
+            BLOG_RELATED_ASYNC=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+
+    def make_image(self, name='photo.png', size=(400, 300), color='teal'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_post(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlogPost.objects.create(
+                title='Post with a picture',
+                content='Content long enough to be a real post body.',
+                author=self.doctor,
+                status='PUBLISHED',
+                image=image
+            )
+
+    def test_variants_are_generated_after_commit(self):
+        post = self.create_post(self.make_image())
+        post.refresh_from_db()
+        self.assertEqual(set(post.image_variants), {'png', 'webp'})
+        self.assertEqual(set(post.image_variants['webp']), {'100', '200'})
+        for paths in post.image_variants.values():
+            for width, path in paths.items():
+                self.assertTrue(default_storage.exists(path))
+                with Image.open(default_storage.path(path)) as image:
+                    self.assertEqual(image.width, int(width))
+
+        response = self.client.get(reverse('blog-detail', args=[post.slug]))
+        srcset = response.data['image_srcset']['webp']
+        self.assertIn('100w', srcset)
+        self.assertIn('http://testserver/', srcset)
+
+    def test_replacing_the_image_drops_old_variants(self):
+        post = self.create_post(self.make_image())
+        post.refresh_from_db()
+        old_paths = list(post.image_variants['webp'].values())
+        with self.captureOnCommitCallbacks(execute=True):
+            post.image = self.make_image('other.png', color='orange')
+            post.save()
+        post.refresh_from_db()
+        self.assertNotEqual(list(post.image_variants['webp'].values()), old_paths)
+        for path in old_paths:
+            self.assertFalse(default_storage.exists(path))
+
+class PostCommentsEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        self.patient = User.objects.create_user(
+            username='testpatient',
+            password='testpass123',
+            role='PATIENT'
+        )
+        self.post = BlogPost.objects.create(
+            title='A much discussed post',
+            content='Content long enough to be a real post body.',
+            author=self.doctor,
+            status='PUBLISHED'
+        )
+        for i in range(30):
+            Comment.objects.create(post=self.post, author=self.patient, content=f'Comment {i}', is_approved=i != 29)
+        self.url = reverse('blogpost-comments', args=[self.post.slug])
+
+    def test_comments_are_keyset_paginated(self):
+        seen = []
+        url = self.url
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(comment['content'] for comment in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [f'Comment {i}' for i in range(28, -1, -1)])
+
+    def test_doctors_also_see_unapproved_comments(self):
+        self.client.force_authenticate(self.doctor)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['results'][0]['content'], 'Comment 29')
+
+    def test_post_payload_embeds_only_latest_comments(self):
+        response = self.client.get(reverse('blogpost-detail', args=[self.post.slug]))
+        self.assertEqual(response.data['comment_count'], 29)
+        self.assertEqual([c['content'] for c in response.data['comments']], ['Comment 28', 'Comment 27', 'Comment 26'])
+
+    def test_comments_can_be_posted(self):
+        self.client.force_authenticate(self.patient)
+        response = self.client.post(self.url, {'content': 'Very helpful'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        comment = Comment.objects.get(pk=response.data['id'])
+        self.assertEqual(comment.post, self.post)
+        self.assertFalse(comment.is_approved)
+
+class RenderedContentTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+
+    def test_content_is_rendered_and_sanitised_on_save(self):
+        post = BlogPost.objects.create(
+            title='Markdown post',
+            content='# Heading\n\nSome **bold** text and a [link](javascript:alert(1)).\n\n'
+                    '<script>alert("x")</script><p onclick="steal()">Raw paragraph</p>',
+            author=self.doctor
+        )
+        self.assertIn('<h1>Heading</h1>', post.content_html)
+        self.assertIn('<strong>bold</strong>', post.content_html)
+        self.assertNotIn('javascript:', post.content_html)
+        self.assertNotIn('script', post.content_html)
+        self.assertNotIn('onclick', post.content_html)
+        self.assertEqual(post.excerpt, 'Heading Some bold text and a link. Raw paragraph')
+        self.assertEqual(post.summary, post.excerpt)
+        self.assertEqual(post.render_version, rendering.RENDERER_VERSION)
+
+        response = self.client.get(reverse('blog-detail', args=[post.slug]))
+        self.assertEqual(response.data['content_html'], post.content_html)
+
+    def test_summary_is_not_cut_inside_markup(self):
+        content = ' '.join(['[word](http://example.com/a-long-link-target)'] * 80)
+        post = BlogPost.objects.create(title='Long post', content=content, author=self.doctor)
+        self.assertTrue(post.summary.endswith('...'))
+        self.assertNotIn('[', post.summary)
+        self.assertLessEqual(len(post.summary), rendering.EXCERPT_LENGTH + 3)
+
+    def test_rerender_command_updates_stale_posts(self):
+        post = BlogPost.objects.create(title='Stale post', content='*old*', author=self.doctor)
+        BlogPost.objects.filter(pk=post.pk).update(content='*new*', content_html='', render_version=0)
+        call_command('rerender_posts', stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.content_html, '<p><em>new</em></p>')
+        self.assertEqual(post.render_version, rendering.RENDERER_VERSION)
+
+
+@override_settings(BLOG_VIEW_FLUSH_THRESHOLD=3, BLOG_VIEW_FLUSH_INTERVAL=3600)
+class ViewCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        counters.reset()
+        self.addCleanup(counters.reset)
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        self.trending = BlogPost.objects.create(title='Popular today', content='Body', author=self.doctor)
+        self.newest = BlogPost.objects.create(title='Popular last week', content='Body', author=self.doctor)
+
+    def test_views_are_buffered_and_flushed_in_batches(self):
+        url = reverse('blog-detail', args=[self.newest.slug])
+        self.client.get(url)
+        self.client.get(url)
+        self.newest.refresh_from_db()
+        self.assertEqual(self.newest.view_count, 0)
+
+        # The third (cached) read reaches the threshold and writes all three at once
+        self.client.get(url)
+        self.newest.refresh_from_db()
+        self.assertEqual(self.newest.view_count, 3)
+        self.assertEqual(PostViewDaily.objects.get(post=self.newest, date=timezone.localdate()).views, 3)
+
+    def test_trending_ordering_uses_decayed_views(self):
+        today = timezone.localdate()
+        PostViewDaily.objects.create(post=self.newest, date=today - timedelta(days=9), views=40)
+        PostViewDaily.objects.create(post=self.trending, date=today, views=10)
+        PostViewDaily.objects.create(post=self.trending, date=today - timedelta(days=30), views=1000)
+        call_command('compute_trending', stdout=io.StringIO())
+
+        self.newest.refresh_from_db()
+        self.trending.refresh_from_db()
+        self.assertAlmostEqual(self.newest.trending_score, 5.0)
+        self.assertAlmostEqual(self.trending.trending_score, 10.0)
+        response = self.client.get(reverse('blog-list'), {'ordering': 'trending'})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.trending.id, self.newest.id])
+
+
+@override_settings(BLOG_RELATED_ASYNC=False, BLOG_RELATED_POSTS=2)
+class RelatedPostsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        related._index = None
+        self.addCleanup(setattr, related, '_index', None)
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        self.migraine = self.create_post('Migraine relief', 'Belladonna for migraine headaches and light sensitivity.')
+        self.headache = self.create_post('Headache remedies', 'Gelsemium and belladonna for tension headaches and migraine.')
+        self.eczema = self.create_post('Eczema care', 'Sulphur and graphites for itchy eczema and dry skin.')
+        self.skin = self.create_post('Dry skin in winter', 'Graphites for cracked dry skin and winter eczema flares.')
+
+    def create_post(self, title, content, status='PUBLISHED'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlogPost.objects.create(title=title, content=content, author=self.doctor, status=status)
+
+    def related_ids(self, post):
+        return list(RelatedPost.objects.filter(post=post).values_list('related_id', flat=True))
+
+    def test_neighbours_are_refreshed_on_save(self):
+        self.assertEqual(self.related_ids(self.migraine)[0], self.headache.id)
+        self.assertEqual(self.related_ids(self.eczema), [self.skin.id])
+
+        response = self.client.get(reverse('blog-detail', args=[self.migraine.slug]))
+        self.assertEqual([post['slug'] for post in response.data['related_posts']], [self.headache.slug])
+
+        # Unpublishing drops the post from its neighbours' lists as well
+        with self.captureOnCommitCallbacks(execute=True):
+            self.headache.status = 'DRAFT'
+            self.headache.save()
+        self.assertEqual(self.related_ids(self.migraine), [])
+        self.assertEqual(self.related_ids(self.headache), [])
+
+    def test_new_post_enters_existing_lists(self):
+        newcomer = self.create_post('More on eczema', 'Eczema on dry skin: graphites, sulphur and skin care.')
+        self.assertIn(newcomer.id, self.related_ids(self.eczema))
+        self.assertIn(newcomer.id, self.related_ids(self.skin))
+
+    @override_settings(BLOG_RELATED_REFRESH_CANDIDATES=1)
+    def test_refresh_only_checks_the_closest_posts(self):
+        newcomer = self.create_post('More on eczema', 'Eczema on dry skin: graphites, sulphur and skin care.')
+        entered = [post for post in (self.eczema, self.skin) if newcomer.id in self.related_ids(post)]
+        self.assertEqual(len(entered), 1)
+
+    def test_batch_build_matches_incremental_lists(self):
+        incremental = {post.id: self.related_ids(post) for post in BlogPost.objects.all()}
+        call_command('build_related_posts', stdout=io.StringIO())
+        self.assertEqual({post.id: self.related_ids(post) for post in BlogPost.objects.all()}, incremental)
+
+
+class SitemapAndFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(
+            username='testdoctor',
+            password='testpass123',
+            role='DOCTOR'
+        )
+        self.posts = [
+            BlogPost.objects.create(title=f'Published post {i}', content='Body', author=self.doctor)
+            for i in range(5)
+        ]
+        self.draft = BlogPost.objects.create(title='Draft post', content='Body', author=self.doctor, status='DRAFT')
+
+    def test_sitemap_lists_published_posts_and_is_cached(self):
+        response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = response.content.decode()
+        self.assertTrue(content.startswith('<?xml'))
+        self.assertEqual(content.count('<url>'), 5)
+        self.assertIn(f'http://testserver/blog/{self.posts[0].slug}/', content)
+        self.assertNotIn(self.draft.slug, content)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/sitemap.xml').content, response.content)
+
+        # Draft edits leave the cached documents alone; publishing rebuilds them
+        self.draft.content = 'Still drafting'
+        self.draft.save()
+        with self.assertNumQueries(0):
+            self.client.get('/sitemap.xml')
+        self.draft.status = 'PUBLISHED'
+        self.draft.save()
+        self.assertEqual(self.client.get('/sitemap.xml').content.decode().count('<url>'), 6)
+
+    @override_settings(BLOG_SITEMAP_LIMIT=2)
+    def test_large_sitemaps_are_split_into_an_index(self):
+        index = self.client.get('/sitemap.xml').content.decode()
+        self.assertIn('<sitemapindex', index)
+        self.assertEqual(index.count('<sitemap>'), 3)
+        self.assertIn('http://testserver/sitemap-3.xml', index)
+
+        section = self.client.get('/sitemap-2.xml').content.decode()
+        self.assertEqual(section.count('<url>'), 2)
+        self.assertIn(self.posts[2].slug, section)
+        self.assertIn(self.posts[3].slug, section)
+        self.assertEqual(self.client.get('/sitemap-4.xml').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rss_and_atom_feeds(self):
+        rss = self.client.get(reverse('blog-feed-rss'))
+        self.assertEqual(rss.status_code, status.HTTP_200_OK)
+        self.assertIn('<rss', rss.content.decode())
+        self.assertIn('Published post 4', rss.content.decode())
+        self.assertNotIn('Draft post', rss.content.decode())
+
+        atom = self.client.get(reverse('blog-feed-atom'))
+        self.assertIn('http://www.w3.org/2005/Atom', atom.content.decode())
+
+        response = self.client.get(reverse('blog-feed-rss'), HTTP_IF_NONE_MATCH=rss['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -2,6 +2,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import BlogPostViewSet, CommentViewSet, BlogPostList, BlogPostDetail
+from . import feeds
 
 router = DefaultRouter()
 router.register(r'posts', BlogPostViewSet, basename='blogpost')
@@ -9,6 +10,8 @@ router.register(r'comments', CommentViewSet, basename='comment')
 urlpatterns = [
     path('list/', BlogPostList.as_view(), name='blog-list'),
     path('detail/<slug:slug>/', BlogPostDetail.as_view(), name='blog-detail'),
+    path('feed/rss/', feeds.rss, name='blog-feed-rss'),
+    path('feed/atom/', feeds.atom, name='blog-feed-atom'),
     path('', include(router.urls)),
 ]
 
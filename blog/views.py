@@ -4,7 +4,12 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import BlogPost, Comment
-from .serializers import BlogPostSerializer, CommentSerializer
+from .serializers import BlogPostSerializer, BlogPostListSerializer, CommentSerializer, PostCommentSerializer
+from .search import FullTextSearchFilter
+from .cache import PublishedResponseCacheMixin
+from .counters import record_view
+from .filters import PostOrderingFilter
+from homoeoclinic_backend.pagination import KeysetPagination
 
 # Create your views here.
 
@@ -16,22 +21,34 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         # Write permissions are only allowed to the owner/author
         return obj.author == request.user and request.user.role == 'DOCTOR'
 
-class BlogPostList(generics.ListCreateAPIView):
+def count_view(request, response, slug):
+    # Cache hits and 304s are reads too; HEAD requests are not
+    if request.method == 'GET' and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        record_view(slug)
+
+class BlogPostList(PublishedResponseCacheMixin, generics.ListCreateAPIView):
     serializer_class = BlogPostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # Search runs after ordering so that relevance can take precedence over the default order
+    filter_backends = [PostOrderingFilter, FullTextSearchFilter]
     search_fields = ['title', 'content', 'author__first_name', 'author__last_name']
-    ordering_fields = ['created_at', 'title']
+    ordering_fields = ['created_at', 'title', 'view_count']
     ordering = ['-created_at']
+    keyset_ordering = ('-created_at', '-id')
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return BlogPostListSerializer
+        return BlogPostSerializer
 
     def get_queryset(self):
         # For authenticated doctors, show their drafts too
         if self.request.user.is_authenticated and self.request.user.role == 'DOCTOR':
-            queryset = BlogPost.objects.all()
+            queryset = BlogPost.objects.for_listing()
             if self.request.query_params.get('my_posts', None) == 'true':
                 queryset = queryset.filter(author=self.request.user)
         else:
-            queryset = BlogPost.objects.filter(status='PUBLISHED')
+            queryset = BlogPost.objects.for_listing().filter(status='PUBLISHED')
         
         # Filter by featured posts
         featured = self.request.query_params.get('featured', None)
@@ -61,7 +78,7 @@ class BlogPostList(generics.ListCreateAPIView):
             status=status
         )
 
-class BlogPostDetail(generics.RetrieveUpdateDestroyAPIView):
+class BlogPostDetail(PublishedResponseCacheMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = BlogPost.objects.all()
     serializer_class = BlogPostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
@@ -69,8 +86,13 @@ class BlogPostDetail(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.role == 'DOCTOR':
-            return BlogPost.objects.all()
-        return BlogPost.objects.filter(status='PUBLISHED')
+            return BlogPost.objects.with_comments()
+        return BlogPost.objects.with_comments().filter(status='PUBLISHED')
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        count_view(request, response, kwargs['slug'])
+        return response
 
     @action(detail=True, methods=['post'])
     def feature(self, request, *args, **kwargs):
@@ -88,13 +110,14 @@ class BlogPostDetail(generics.RetrieveUpdateDestroyAPIView):
         )
 
 class DoctorBlogPosts(generics.ListAPIView):
-    serializer_class = BlogPostSerializer
+    serializer_class = BlogPostListSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         if not self.request.user.role == 'DOCTOR':
             raise permissions.PermissionDenied("Only doctors can view their posts")
-        return BlogPost.objects.filter(author=self.request.user).order_by('-created_at')
+        return BlogPost.objects.for_listing().filter(author=self.request.user).order_by('-created_at')
 
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all()
@@ -104,29 +127,68 @@ class CommentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['post', 'author', 'is_approved']
     search_fields = ['content']
     ordering_fields = ['created_at']
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.role == 'DOCTOR':
-            return Comment.objects.all()
-        return Comment.objects.filter(is_approved=True)
+            return Comment.objects.select_related('author')
+        return Comment.objects.select_related('author').filter(is_approved=True)
 
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(PublishedResponseCacheMixin, viewsets.ModelViewSet):
     queryset = BlogPost.objects.all()
     serializer_class = BlogPostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, PostOrderingFilter, FullTextSearchFilter]
     filterset_fields = ['status', 'author', 'featured']
     search_fields = ['title', 'content', 'summary']
-    ordering_fields = ['created_at', 'title']
+    ordering_fields = ['created_at', 'title', 'view_count']
+    keyset_ordering = ('-created_at', '-id')
     lookup_field = 'slug'
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return BlogPostListSerializer
+        return BlogPostSerializer
+
     def get_queryset(self):
+        if self.action == 'list':
+            queryset = BlogPost.objects.for_listing()
+        elif self.action == 'comments':
+            queryset = BlogPost.objects.only('id', 'slug', 'status', 'author_id')
+        else:
+            queryset = BlogPost.objects.with_comments()
         if self.request.user.is_authenticated and self.request.user.role == 'DOCTOR':
-            return BlogPost.objects.all()
-        return BlogPost.objects.filter(status='PUBLISHED')
+            return queryset
+        return queryset.filter(status='PUBLISHED')
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        count_view(request, response, kwargs['slug'])
+        return response
 
     def perform_create(self, serializer):
         if not self.request.user.role == 'DOCTOR':
             raise permissions.PermissionDenied("Only doctors can create blog posts")
         status_value = self.request.data.get('status', 'DRAFT')
         serializer.save(author=self.request.user, status=status_value)
+
+    @action(detail=True, methods=['get', 'post'], url_path='comments')
+    def comments(self, request, slug=None):
+        """
+        The comments of one post, newest first, keyset paginated on
+        ``(created_at, id)``. Only doctors see comments awaiting approval.
+        """
+        post = self.get_object()
+        if request.method == 'POST':
+            serializer = PostCommentSerializer(data=request.data, context=self.get_serializer_context())
+            serializer.is_valid(raise_exception=True)
+            serializer.save(post=post)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        queryset = Comment.objects.filter(post=post).select_related('author')
+        if not (request.user.is_authenticated and request.user.role == 'DOCTOR'):
+            queryset = queryset.filter(is_approved=True)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = CommentSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
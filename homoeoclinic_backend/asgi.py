@@ -2,6 +2,9 @@
 ASGI config for homoeoclinic_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn homoeoclinic_backend.asgi:application``)
+for the appointment event stream, whose idle connections are async tasks
+rather than worker threads.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
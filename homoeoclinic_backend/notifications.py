@@ -0,0 +1,68 @@
+"""
+Delivery of notifications to users.
+
+``get_backend()`` returns an instance of the class named by
+``NOTIFICATION_BACKEND``. A backend has one method, ``send(user, subject,
+body)``, called from background jobs (see ``jobs/queue.py``); it raises to
+have the job retried.
+
+The backends here are local stand-ins: ``ConsoleBackend`` writes to stdout,
+``FileBackend`` appends JSON lines to ``NOTIFICATION_FILE_PATH`` and
+``LocmemBackend`` keeps messages in ``LocmemBackend.outbox`` for tests. Point
+``NOTIFICATION_BACKEND`` at an email or SMS gateway backend in production.
+"""
+import json
+import sys
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+def make_message(user, subject, body):
+    return {
+        'user': user.pk,
+        'email': user.email,
+        'subject': subject,
+        'body': body,
+        'sent_at': timezone.now().isoformat(),
+    }
+
+
+class ConsoleBackend:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def send(self, user, subject, body):
+        with self._lock:
+            self.stream.write(json.dumps(make_message(user, subject, body)) + '\n')
+            self.stream.flush()
+
+
+class FileBackend:
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'NOTIFICATION_FILE_PATH', settings.BASE_DIR / 'notifications.log')
+        self._lock = threading.Lock()
+
+    def send(self, user, subject, body):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(make_message(user, subject, body)) + '\n')
+
+
+class LocmemBackend:
+    outbox = []
+
+    def send(self, user, subject, body):
+        self.outbox.append(make_message(user, subject, body))
+
+
+def get_backend():
+    return load_backend(getattr(settings, 'NOTIFICATION_BACKEND', 'homoeoclinic_backend.notifications.ConsoleBackend'))
+
+
+@lru_cache(maxsize=None)
+def load_backend(path):
+    return import_string(path)()
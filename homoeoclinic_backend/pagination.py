@@ -0,0 +1,181 @@
+"""
+Shared pagination classes.
+
+``PageNumberOrKeysetPagination`` is the project default. It behaves exactly like
+DRF's ``PageNumberPagination`` unless the client asks for a cursor
+(``?pagination=cursor`` on the first request, then the ``cursor`` links returned
+in ``next``/``previous``) and the view declares a ``keyset_ordering``. Views that
+should always be cursor paginated set ``pagination_class = KeysetPagination``.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _resolve(obj, path):
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _encode_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over a compound ordering.
+
+    Each page is fetched with ``WHERE (ordering columns) < (last row seen)``
+    expanded into an OR of prefixes, so page 500 costs the same as page 1 and no
+    ``COUNT(*)`` is issued. The ordering comes from ``view.keyset_ordering`` and
+    must end in a unique column; ``id`` is appended as the tie-breaker if it is
+    missing. Ordering columns must not be nullable.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view):
+        ordering = list(getattr(view, 'keyset_ordering', None) or self.ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values, reverse = payload['v'], bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering_fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, obj, reverse):
+        values = [_encode_value(_resolve(obj, field)) for field in self.ordering_fields]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def build_filter(self, ordering, values, reverse):
+        """
+        Expand ``(a, b, c) > (x, y, z)`` into
+        ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)``
+        with the comparison flipped for descending columns.
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for term, value in zip(ordering, values):
+            field = term.lstrip('-')
+            descending = term.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal_prefix & Q(**{f'{field}__{lookup}': value})
+            equal_prefix &= Q(**{field: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(view)
+        self.ordering_fields = [term.lstrip('-') for term in ordering]
+
+        values, reverse = self.decode_cursor(request)
+        if reverse:
+            queryset = queryset.order_by(*[term[1:] if term.startswith('-') else f'-{term}' for term in ordering])
+        else:
+            queryset = queryset.order_by(*ordering)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.build_filter(ordering, values, reverse))
+            except (DjangoValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next = None
+        self.previous = None
+        if results:
+            if has_more or reverse:
+                self.next = self.encode_cursor(results[-1], reverse=False)
+            if values is not None and (has_more or not reverse):
+                self.previous = self.encode_cursor(results[0], reverse=True)
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next,
+            'previous': self.previous,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """
+    Page numbers by default, keyset pagination on request.
+
+    Clients opt in with ``?pagination=cursor`` (or by following a ``cursor`` link)
+    on views that define ``keyset_ordering``; every other request gets the usual
+    ``count``/``next``/``previous`` page-number envelope.
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def wants_keyset(self, request, view):
+        if getattr(view, 'keyset_ordering', None) is None:
+            return False
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or self.keyset_class.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.wants_keyset(request, view):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
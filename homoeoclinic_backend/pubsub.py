@@ -0,0 +1,70 @@
+"""
+Publish/subscribe for pushing events to open connections.
+
+``get_broker()`` returns an instance of the class named by ``PUBSUB_BACKEND``.
+A broker has two methods: ``publish(channel, message)``, which may be called
+from any thread (sync views, signal handlers, ``on_commit`` callbacks), and
+``subscribe(*channels)``, an async context manager yielding an
+``asyncio.Queue`` of the messages published to those channels while it is
+open.
+
+``InMemoryBroker`` keeps the subscribers in a dictionary and hands messages to
+their event loops with ``call_soon_threadsafe``, so it needs nothing else
+running. It only reaches connections held by the same process; with several
+ASGI workers, point ``PUBSUB_BACKEND`` at a broker built on a shared channel
+(Redis pub/sub, PostgreSQL ``LISTEN``/``NOTIFY``) with the same two methods.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class InMemoryBroker:
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:
+                # The subscriber's loop has closed; it unsubscribes on its way out
+                pass
+
+    @staticmethod
+    def _deliver(queue, message):
+        if queue.full():
+            # A consumer this far behind has lost track anyway; keep the newest
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    @asynccontextmanager
+    async def subscribe(self, *channels):
+        queue = asyncio.Queue(maxsize=self.max_queued)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscriber)
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                for channel in channels:
+                    self._subscribers[channel].discard(subscriber)
+                    if not self._subscribers[channel]:
+                        del self._subscribers[channel]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    backend = getattr(settings, 'PUBSUB_BACKEND', 'homoeoclinic_backend.pubsub.InMemoryBroker')
+    return import_string(backend)()
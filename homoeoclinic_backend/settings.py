@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'appointments.apps.AppointmentsConfig',
     'patients.apps.PatientsConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
@@ -78,7 +79,7 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'homoeoclinic_backend.pagination.PageNumberOrKeysetPagination',
     'PAGE_SIZE': 10,
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
     'NON_FIELD_ERRORS_KEY': 'error',
@@ -183,10 +184,75 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than SQLite's in-memory default. The in-memory test
+        # database is shared between threads through SQLite's shared cache, where
+        # a write that meets another thread's lock fails at once with "database
+        # table is locked" instead of waiting for it. ConcurrentBookingTests
+        # (appointments/tests.py) books from several threads at once and needs
+        # them to wait. The file is git-ignored.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# The blog response cache is invalidated by bumping a version key, so every
+# worker process must share the same cache; use Redis/Memcached in production.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+BLOG_CACHE_TIMEOUT = 300  # seconds
+BLOG_LATEST_COMMENTS = 3  # approved comments embedded in post payloads
+BLOG_FEED_ITEMS = 50
+BLOG_SITEMAP_LIMIT = 50000  # URLs per sitemap file before splitting into an index
+DASHBOARD_CACHE_TIMEOUT = 10  # seconds a doctor's dashboard may be stale
+CALENDAR_PAST_DAYS = 90  # history included in the doctors' .ics feeds
+APPOINTMENT_ARCHIVE_AFTER_DAYS = 180  # finished appointments older than this move to the archive
+PATIENT_RECORD_CACHE_TIMEOUT = 300  # seconds; saves and approved update requests invalidate earlier
+PATIENT_RECORD_SNAPSHOT_INTERVAL = 50  # record revisions between full snapshots (see patients/history.py)
+EXPORT_CHUNK_SIZE = 2000  # rows fetched at a time by the streaming exports (see api/export.py)
+EXPORT_CURSOR_OVERLAP = 60  # seconds an incremental export re-reads before the previous one started
+
+# Appointment server-sent events (see appointments/events.py). The in-memory
+# broker only reaches clients of the same process; use a shared backend when
+# running several ASGI workers.
+PUBSUB_BACKEND = 'homoeoclinic_backend.pubsub.InMemoryBroker'
+APPOINTMENT_EVENTS_KEEPALIVE = 15  # seconds between comments on an idle stream
+APPOINTMENT_EVENTS_MAX_AGE = 300  # seconds before a stream ends and the client reconnects
+
+# Background jobs (see jobs/queue.py), run by ``manage.py run_jobs``
+JOBS_LEASE_SECONDS = 300  # a claimed job is retried by another worker after this
+JOBS_BATCH_SIZE = 20  # jobs a worker claims at a time
+JOBS_RETRY_DELAY = 60  # seconds before the first retry, doubling after each failure
+
+# Notifications (see homoeoclinic_backend/notifications.py). The console and
+# file backends are local stand-ins for an email/SMS gateway.
+NOTIFICATION_BACKEND = 'homoeoclinic_backend.notifications.ConsoleBackend'
+NOTIFICATION_FILE_PATH = BASE_DIR / 'notifications.log'  # used by FileBackend
+APPOINTMENT_REMINDER_HOURS = 24  # reminders go out this long before an approved appointment
+
+# Blog image derivatives (see blog/images.py)
+BLOG_IMAGE_WIDTHS = [320, 640, 1280]
+BLOG_IMAGE_FORMATS = ['webp', 'avif']
+BLOG_IMAGE_WORKERS = 2
+
+# Blog view counting and trending (see blog/counters.py)
+BLOG_VIEW_FLUSH_THRESHOLD = 100  # buffered views before writing them out
+BLOG_VIEW_FLUSH_INTERVAL = 30  # seconds
+BLOG_TRENDING_DAYS = 14
+BLOG_TRENDING_HALF_LIFE = 3  # days
+
+# Related posts (see blog/related.py)
+BLOG_RELATED_POSTS = 5
+BLOG_RELATED_MAX_TERMS = 40  # heaviest terms kept per post vector
+BLOG_RELATED_INDEX_TTL = 3600  # seconds before a worker refits its TF-IDF model
+BLOG_RELATED_REFRESH_CANDIDATES = 200  # closest posts a save may enter the lists of
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
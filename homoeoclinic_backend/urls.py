@@ -19,9 +19,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from blog import sitemaps
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Served from the root so the sitemap may list the /blog/ pages
+    path('sitemap.xml', sitemaps.sitemap, name='sitemap'),
+    path('sitemap-<int:section>.xml', sitemaps.sitemap_section, name='sitemap-section'),
     path('api/', include([
         path('accounts/', include('accounts.urls')),
         path('blog/', include('blog.urls')),
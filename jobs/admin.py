@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'queue', 'status', 'run_at', 'attempts', 'locked_by')
+    list_filter = ('status', 'queue', 'name')
+    search_fields = ('name', 'key', 'last_error')
+    date_hierarchy = 'run_at'
@@ -0,0 +1,54 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from jobs import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued jobs as they fall due. Start as many workers as needed; '
+        'each claims its own batches and stops after the current batch on SIGTERM or SIGINT.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', default='default')
+        parser.add_argument('--batch-size', type=int, help='Jobs claimed at a time (default JOBS_BATCH_SIZE).')
+        parser.add_argument('--lease', type=int, help='Seconds a claimed batch is reserved (default JOBS_LEASE_SECONDS).')
+        parser.add_argument('--sleep', type=float, default=5, help='Seconds to wait when no job is due.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of waiting.')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        worker = queue.get_worker_id()
+        done = failed = 0
+        while not self.stopping:
+            jobs = queue.claim(
+                options['queue'], batch_size=options['batch_size'], worker=worker, lease=options['lease']
+            )
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            for job in jobs:
+                try:
+                    succeeded = queue.run(job)
+                except Exception:
+                    # Recording the outcome failed; the job is claimed again once its lease expires
+                    logger.exception('Running job %s (%s) failed', job.pk, job.name)
+                    succeeded = False
+                if succeeded:
+                    done += 1
+                else:
+                    failed += 1
+        self.stdout.write(self.style.SUCCESS(f'Ran {done} jobs, {failed} failed.'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
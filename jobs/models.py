@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    A unit of background work: the handler registered as ``name`` is called
+    with ``payload`` once ``run_at`` has passed (see ``jobs/queue.py``).
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+
+    queue = models.CharField(max_length=50, default='default')
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Identifies the job to its producer so it can be replaced or cancelled,
+    # e.g. ``appointment-reminder:42``; at most one queued job per key
+    key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    run_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='QUEUED'),
+                name='job_unique_queued_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()}) at {self.run_at}"
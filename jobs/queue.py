@@ -0,0 +1,157 @@
+"""
+A job queue kept in the database.
+
+Producers ``enqueue`` jobs, usually inside the transaction that makes them
+necessary, so a job exists exactly when its cause was committed. Handlers are
+plain functions registered with ``@task('name')`` in an app's ``tasks``
+module and are called with the job's JSON payload.
+
+Workers (``manage.py run_jobs``) ``claim`` due jobs in batches: the batch is
+marked ``RUNNING`` with a lease (``locked_by``/``leased_until``) in one
+``UPDATE``. Where the database supports it (PostgreSQL, MySQL 8), the batch is
+picked with ``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent workers take
+disjoint batches without waiting on each other. Elsewhere (SQLite) the
+``UPDATE`` repeats the due conditions and each worker keeps only the rows it
+stamped. A job whose worker died is claimed again once its lease expires.
+
+A failing job is retried after ``JOBS_RETRY_DELAY * 2 ** (attempts - 1)``
+seconds until it has been attempted ``max_attempts`` times, then marked
+``FAILED`` with the error kept in ``last_error``. If a job with the same key
+was queued while it ran, the failed one is cancelled instead of retried.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def task(name):
+    """Register the decorated function as the handler of jobs called ``name``."""
+    def register(function):
+        _handlers[name] = function
+        return function
+    return register
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def get_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def get_lease():
+    return getattr(settings, 'JOBS_LEASE_SECONDS', 300)
+
+
+def get_batch_size():
+    return getattr(settings, 'JOBS_BATCH_SIZE', 20)
+
+
+def get_retry_delay():
+    return getattr(settings, 'JOBS_RETRY_DELAY', 60)
+
+
+def cancel(*keys):
+    """Cancel the queued jobs with these keys; running ones finish."""
+    return Job.objects.filter(key__in=keys, status='QUEUED').update(status='CANCELLED', updated_at=timezone.now())
+
+
+def enqueue_many(jobs):
+    """
+    Save unsaved ``Job`` instances in one ``INSERT``, replacing queued jobs
+    with the same keys.
+    """
+    if not jobs:
+        return []
+    for job in jobs:
+        if job.run_at is None:
+            job.run_at = timezone.now()
+    with transaction.atomic(savepoint=False):
+        keys = [job.key for job in jobs if job.key]
+        if keys:
+            cancel(*keys)
+        return Job.objects.bulk_create(jobs)
+
+
+def enqueue(name, payload=None, run_at=None, key=None, queue='default', max_attempts=5):
+    return enqueue_many([Job(
+        name=name, payload=payload or {}, run_at=run_at, key=key, queue=queue, max_attempts=max_attempts,
+    )])[0]
+
+
+def claim(queue='default', batch_size=None, worker=None, lease=None, now=None):
+    """Lease up to ``batch_size`` due jobs of ``queue`` to ``worker`` and return them."""
+    now = now or timezone.now()
+    worker = worker or get_worker_id()
+    leased_until = now + timedelta(seconds=lease or get_lease())
+    due = Job.objects.filter(queue=queue).filter(
+        models.Q(status='QUEUED', run_at__lte=now)
+        | models.Q(status='RUNNING', leased_until__lt=now, attempts__lt=models.F('max_attempts'))
+    )
+    features = connection.features
+    with transaction.atomic():
+        # Jobs whose worker died on their last attempt are not retried
+        Job.objects.filter(
+            queue=queue, status='RUNNING', leased_until__lt=now, attempts__gte=models.F('max_attempts')
+        ).update(status='FAILED', last_error='Lease expired on the last attempt', updated_at=now)
+
+        candidates = due.order_by('run_at', 'id')
+        if features.has_select_for_update_skip_locked and features.supports_select_for_update_with_limit:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size or get_batch_size()])
+        if not ids:
+            return []
+        claimed = due.filter(pk__in=ids).update(
+            status='RUNNING', locked_by=worker, leased_until=leased_until,
+            attempts=models.F('attempts') + 1, updated_at=now,
+        )
+        if not claimed:
+            return []
+        return list(Job.objects.filter(pk__in=ids, locked_by=worker, leased_until=leased_until).order_by('run_at', 'id'))
+
+
+def finish(job, **changes):
+    # Only while the lease is ours: a job reclaimed after its lease expired
+    # belongs to the other worker now
+    return Job.objects.filter(
+        pk=job.pk, status='RUNNING', locked_by=job.locked_by, leased_until=job.leased_until
+    ).update(leased_until=None, updated_at=timezone.now(), **changes)
+
+
+def run(job):
+    """Run a claimed job and record the outcome. Returns True on success."""
+    handler = get_handler(job.name)
+    if handler is None:
+        finish(job, status='FAILED', last_error=f'No handler registered for {job.name!r}')
+        return False
+    try:
+        handler(job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts, exc_info=True)
+        if job.attempts >= job.max_attempts:
+            finish(job, status='FAILED', last_error=error)
+        else:
+            delay = get_retry_delay() * 2 ** (job.attempts - 1)
+            try:
+                with transaction.atomic():
+                    finish(job, status='QUEUED', last_error=error, run_at=timezone.now() + timedelta(seconds=delay))
+            except IntegrityError:
+                # A replacement with the same key was queued while this one ran
+                finish(job, status='CANCELLED', last_error=error)
+        return False
+    finish(job, status='DONE', last_error='')
+    return True
@@ -0,0 +1,87 @@
+from datetime import timedelta
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from . import queue
+from .models import Job
+
+calls = []
+
+
+@queue.task('jobs.tests.record')
+def record(payload):
+    calls.append(payload)
+
+
+@queue.task('jobs.tests.fail')
+def fail(payload):
+    raise RuntimeError('Gateway unavailable')
+
+
+class JobQueueTests(APITestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_workers_claim_disjoint_batches(self):
+        for number in range(3):
+            queue.enqueue('jobs.tests.record', {'number': number})
+        queue.enqueue('jobs.tests.record', run_at=timezone.now() + timedelta(hours=1))
+
+        first = queue.claim(batch_size=2, worker='a')
+        second = queue.claim(batch_size=2, worker='b')
+        self.assertEqual([job.payload['number'] for job in first], [0, 1])
+        self.assertEqual([job.payload['number'] for job in second], [2])
+        self.assertEqual(queue.claim(worker='c'), [])
+        self.assertTrue(all(job.status == 'RUNNING' and job.attempts == 1 for job in first + second))
+
+    def test_expired_lease_is_claimed_again(self):
+        queue.enqueue('jobs.tests.record', {'number': 1})
+        [job] = queue.claim(worker='a', lease=60)
+        later = timezone.now() + timedelta(seconds=61)
+        [again] = queue.claim(worker='b', now=later)
+        self.assertEqual((again.pk, again.attempts, again.locked_by), (job.pk, 2, 'b'))
+
+        # The first worker lost its lease, so its outcome is ignored
+        self.assertEqual(queue.finish(job, status='DONE'), 0)
+        self.assertTrue(queue.run(again))
+        self.assertEqual(Job.objects.get().status, 'DONE')
+        self.assertEqual(calls, [{'number': 1}])
+
+    @override_settings(JOBS_RETRY_DELAY=60)
+    def test_failures_back_off_then_fail(self):
+        queue.enqueue('jobs.tests.fail', max_attempts=2)
+        [job] = queue.claim(worker='a')
+        before = timezone.now()
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(queue.run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'QUEUED')
+        self.assertIn('Gateway unavailable', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=60))
+        self.assertEqual(queue.claim(worker='a'), [])
+
+        [job] = queue.claim(worker='a', now=job.run_at)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(queue.run(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+
+    def test_enqueue_replaces_the_queued_job_with_the_same_key(self):
+        queue.enqueue('jobs.tests.record', {'number': 1}, key='reminder:1')
+        queue.enqueue('jobs.tests.record', {'number': 2}, key='reminder:1')
+        self.assertEqual(
+            list(Job.objects.values_list('payload__number', 'status')), [(1, 'CANCELLED'), (2, 'QUEUED')]
+        )
+        queue.cancel('reminder:1')
+        self.assertFalse(Job.objects.filter(status='QUEUED').exists())
+
+    def test_failed_job_replaced_while_running_is_cancelled(self):
+        queue.enqueue('jobs.tests.fail', key='reminder:1')
+        [job] = queue.claim(worker='a')
+        replacement = queue.enqueue('jobs.tests.record', {'number': 2}, key='reminder:1')
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(queue.run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'CANCELLED')
+        self.assertIn('Gateway unavailable', job.last_error)
+        self.assertEqual(Job.objects.get(status='QUEUED'), replacement)
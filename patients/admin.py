@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PatientRecord, UpdateRequest
+from .models import PatientRecord, PatientRecordRevision, UpdateRequest
 
 @admin.register(PatientRecord)
 class PatientRecordAdmin(admin.ModelAdmin):
@@ -13,3 +13,13 @@ class UpdateRequestAdmin(admin.ModelAdmin):
     list_filter = ('status', 'field_name')
     search_fields = ('patient__username', 'field_name', 'reason')
     date_hierarchy = 'created_at'
+
+@admin.register(PatientRecordRevision)
+class PatientRecordRevisionAdmin(admin.ModelAdmin):
+    list_display = ('record', 'number', 'snapshot', 'created_at')
+    list_filter = ('snapshot',)
+    raw_id_fields = ('record',)
+
+    def has_change_permission(self, request, obj=None):
+        # History is append-only
+        return False
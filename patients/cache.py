@@ -0,0 +1,39 @@
+"""
+Per-patient cache of the record served by ``PatientRecordDetail``.
+
+A GET is answered from the cache entry of the patient's record (the
+serialized payload and its ``updated_at``) and carries an ETag and
+Last-Modified built from ``updated_at``, so a client revalidating an
+unchanged record gets a 304 without the database being touched.
+
+Entries are dropped whenever the record or its patient is saved (see
+``patients/signals.py``) and by the code paths that change records with
+``QuerySet.update()``, such as approving an update request. As with the blog
+cache, every worker process must share the cache backend.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_timeout():
+    return getattr(settings, 'PATIENT_RECORD_CACHE_TIMEOUT', 300)
+
+
+def make_key(patient_id):
+    return f'patient-record:{patient_id}'
+
+
+def make_etag(patient_id, updated_at):
+    return f'"{patient_id}-{updated_at.timestamp():.6f}"'
+
+
+def invalidate(patient_ids):
+    """
+    Drop the cached records of these patients, again after commit so a reader
+    that re-cached the old row before the transaction committed does not keep
+    serving it.
+    """
+    keys = [make_key(patient_id) for patient_id in patient_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,95 @@
+"""
+Version history of patient records.
+
+Every change to a record's ``TRACKED_FIELDS`` appends a
+``PatientRecordRevision``, numbered from 1, in the transaction that makes it:
+
+* the first revision (the record as created) and every
+  ``PATIENT_RECORD_SNAPSHOT_INTERVAL``-th one store all tracked fields in full;
+* the others store, for each field that changed, a line diff against the
+  previous value: ``[start, end, text]`` operations, each replacing lines
+  ``start:end`` of the old value with ``text``.
+
+A revision therefore costs storage in proportion to the change, not to the
+record, while rebuilding the record as of any time (``as_of``) replays at most
+``PATIENT_RECORD_SNAPSHOT_INTERVAL - 1`` diffs on top of the latest snapshot
+taken by then.
+
+Revisions are written by ``PatientRecord.save()``, which diffs against the row
+it locks, and by the ``bulk_update`` in ``patients.review``, which diffs
+against the rows it loaded with ``select_for_update``. Changes made any other
+way (``QuerySet.update``, raw SQL) are not recorded, and the diffs recorded
+after one no longer apply cleanly until the next snapshot, so tracked fields
+must only be written through those two paths.
+"""
+from difflib import SequenceMatcher
+
+from django.conf import settings
+
+from .models import PatientRecordRevision
+
+TRACKED_FIELDS = ('blood_group', 'allergies', 'medical_history', 'current_medications')
+
+
+def get_snapshot_interval():
+    return getattr(settings, 'PATIENT_RECORD_SNAPSHOT_INTERVAL', 50)
+
+
+def diff(old, new):
+    """Operations turning ``old`` into ``new``, by lines."""
+    old_lines, new_lines = old.splitlines(keepends=True), new.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        [start, end, ''.join(new_lines[new_start:new_end])]
+        for tag, start, end, new_start, new_end in matcher.get_opcodes() if tag != 'equal'
+    ]
+
+
+def patch(old, operations):
+    lines = old.splitlines(keepends=True)
+    # From the end, so the line numbers of earlier operations still hold
+    for start, end, text in reversed(operations):
+        lines[start:end] = [text]
+    return ''.join(lines)
+
+
+def make_revision(record, previous, created_at=None):
+    """
+    Bump ``record.revision`` and return the unsaved revision from the
+    ``previous`` values of the tracked fields (None for a new record) to the
+    record's current ones; None if no tracked field changed.
+    """
+    current = {field: getattr(record, field) for field in TRACKED_FIELDS}
+    if previous is not None:
+        changed = [field for field in TRACKED_FIELDS if previous.get(field) != current[field]]
+        if not changed:
+            return None
+    number = record.revision + 1
+    record.revision = number
+    snapshot = (
+        previous is None or number == 1 or number % get_snapshot_interval() == 0
+        or any(previous.get(field) is None for field in changed)
+    )
+    if snapshot:
+        changes = current
+    else:
+        changes = {field: diff(previous[field], current[field]) for field in changed}
+    return PatientRecordRevision(
+        record=record, number=number, snapshot=snapshot, changes=changes, created_at=created_at
+    )
+
+
+def as_of(record_id, at):
+    """
+    ``(revision number, {field: value})`` of the record as it was at ``at``, or
+    None if it had no revision by then. Two queries.
+    """
+    revisions = PatientRecordRevision.objects.filter(record_id=record_id, created_at__lte=at)
+    base = revisions.filter(snapshot=True).order_by('-number').values_list('number', 'changes').first()
+    if base is None:
+        return None
+    number, values = base
+    for number, changes in revisions.filter(number__gt=number).order_by('number').values_list('number', 'changes'):
+        for field, operations in changes.items():
+            values[field] = patch(values[field], operations)
+    return number, values
@@ -0,0 +1,73 @@
+import json
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from patients import history
+from patients.models import PatientRecord, PatientRecordRevision
+
+
+class Command(BaseCommand):
+    help = (
+        'Write many revisions of one patient record through save() and time rebuilding it '
+        'as of random points in its history. Runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revisions', type=int, default=1000)
+        parser.add_argument('--interval', type=int, help='Snapshot interval (default PATIENT_RECORD_SNAPSHOT_INTERVAL).')
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        interval = options['interval'] or history.get_snapshot_interval()
+        with override_settings(PATIENT_RECORD_SNAPSHOT_INTERVAL=interval), transaction.atomic():
+            record, write_timings, full_size = self.generate(options['revisions'], rng)
+            revisions = PatientRecordRevision.objects.filter(record=record)
+            stored = sum(len(json.dumps(changes)) for changes in revisions.values_list('changes', flat=True))
+            self.stdout.write(
+                f'{revisions.count()} revisions, snapshot every {interval}: save() median '
+                f'{statistics.median(write_timings):.2f} ms; {stored / 1024:.0f} KiB stored vs '
+                f'{full_size / 1024:.0f} KiB as full copies'
+            )
+
+            points = list(revisions.values_list('number', 'created_at'))
+            timings, replayed = [], []
+            for _ in range(options['repeat']):
+                number, at = rng.choice(points)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    state = history.as_of(record.id, at)
+                    timings.append((time.perf_counter() - started) * 1000)
+                assert state[0] == number
+                replayed.append(number % interval if number >= interval else number - 1)
+            self.stdout.write(
+                f'as_of: median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms, '
+                f'{len(queries)} queries, {statistics.mean(replayed):.1f} diffs replayed on average'
+            )
+            transaction.set_rollback(True)
+
+    def generate(self, count, rng):
+        """Edit the record's long fields the way notes grow: mostly appends, some edits."""
+        patient = get_user_model().objects.create_user(username='benchmark-patient', role='PATIENT')
+        record = PatientRecord.objects.get(patient=patient)
+        notes = {'medical_history': [], 'allergies': [], 'current_medications': []}
+        timings, full_size = [], 0
+        for number in range(count):
+            field = rng.choice(list(notes))
+            lines = notes[field]
+            if lines and rng.random() < 0.3:
+                lines[rng.randrange(len(lines))] = f'Amended at revision {number}: {rng.random():.6f}\n'
+            else:
+                lines.append(f'Revision {number}: {"observation " * rng.randint(3, 12)}\n')
+            setattr(record, field, ''.join(lines))
+            started = time.perf_counter()
+            record.save()
+            timings.append((time.perf_counter() - started) * 1000)
+            full_size += sum(len(getattr(record, name)) for name in history.TRACKED_FIELDS)
+        return record, timings, full_size
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_records(apps, schema_editor):
+    """Records are created at registration from now on; give earlier patients theirs."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    PatientRecord = apps.get_model('patients', 'PatientRecord')
+    missing = User.objects.filter(role='PATIENT', medical_record__isnull=True).values_list('id', flat=True)
+    PatientRecord.objects.bulk_create(
+        [PatientRecord(patient_id=patient_id) for patient_id in missing.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TRACKED_FIELDS = ('blood_group', 'allergies', 'medical_history', 'current_medications')
+
+
+def snapshot_existing_records(apps, schema_editor):
+    """History starts with each existing record as it is now."""
+    PatientRecord = apps.get_model('patients', 'PatientRecord')
+    PatientRecordRevision = apps.get_model('patients', 'PatientRecordRevision')
+    records = PatientRecord.objects.filter(revision=0).values('id', 'updated_at', *TRACKED_FIELDS)
+    PatientRecordRevision.objects.bulk_create(
+        [PatientRecordRevision(
+            record_id=record['id'], number=1, snapshot=True, created_at=record['updated_at'],
+            changes={field: record[field] for field in TRACKED_FIELDS},
+        ) for record in records.iterator()],
+        batch_size=1000,
+    )
+    PatientRecord.objects.filter(revision=0).update(revision=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_create_missing_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientrecord',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PatientRecordRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('snapshot', models.BooleanField(default=False)),
+                ('changes', models.JSONField()),
+                ('created_at', models.DateTimeField()),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='patients.patientrecord')),
+            ],
+            options={
+                'ordering': ['record', 'number'],
+                'indexes': [models.Index(fields=['record', 'created_at'], name='patients_pa_record__25c86f_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='patientrecordrevision',
+            constraint=models.UniqueConstraint(fields=('record', 'number'), name='patientrecordrevision_unique_number'),
+        ),
+        migrations.RunPython(snapshot_existing_records, migrations.RunPython.noop),
+    ]
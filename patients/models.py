@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
 
 class PatientRecord(models.Model):
@@ -11,12 +11,77 @@ class PatientRecord(models.Model):
     allergies = models.TextField(blank=True)
     medical_history = models.TextField(blank=True)
     current_medications = models.TextField(blank=True)
+    # Number of the latest PatientRecordRevision; bumped with every change
+    revision = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.patient}'s Medical Record"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets patients.review diff its bulk_update against what it loaded
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the record and its ``PatientRecordRevision`` (see
+        ``patients/history.py``) in one transaction. The revision is numbered
+        and diffed against the row as locked here, not as this instance loaded
+        it, so concurrent or stale saves each get the next number and a diff
+        that applies.
+        """
+        from . import history
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(history.TRACKED_FIELDS) & set(update_fields):
+            return super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous = None
+            if not self._state.adding:
+                previous = PatientRecord.objects.using(using).select_for_update().filter(pk=self.pk).values(
+                    'revision', *history.TRACKED_FIELDS
+                ).first()
+            if previous is not None:
+                self.revision = previous.pop('revision')
+            revision = history.make_revision(self, previous)
+            if revision is not None and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'revision'}
+            super().save(*args, **kwargs)
+            if revision is not None:
+                revision.record = self
+                revision.created_at = self.updated_at
+                revision.save(using=using)
+        self._loaded_values = {field: getattr(self, field) for field in history.TRACKED_FIELDS}
+
+class PatientRecordRevision(models.Model):
+    """
+    One change to a ``PatientRecord``, append-only (see ``patients/history.py``).
+    ``changes`` holds every tracked field in full when ``snapshot`` is set, and
+    otherwise a line diff of each field that changed against the revision before.
+    """
+    record = models.ForeignKey(PatientRecord, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    snapshot = models.BooleanField(default=False)
+    changes = models.JSONField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['record', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['record', 'number'], name='patientrecordrevision_unique_number'),
+        ]
+        indexes = [
+            models.Index(fields=['record', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Revision {self.number} of {self.record}"
+
 class UpdateRequest(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -0,0 +1,115 @@
+"""
+Review of patient update requests.
+
+``review`` decides many pending requests at once, in one transaction and a
+fixed number of queries however many requests there are: one read of the
+requests, one conditional ``UPDATE`` per decision, one read of the affected
+records, one ``bulk_update`` of them and one ``bulk_create`` of their
+revisions (plus one more for patients who have no record yet).
+
+Only the fields in ``EDITABLE_FIELDS`` can be changed this way; a request for
+any other field, or with a value too long for its field, is reported as
+``invalid`` and left pending. Approved requests for the same field of the same
+patient are applied in the order they were made, so the latest wins.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, history
+from .models import PatientRecord, PatientRecordRevision, UpdateRequest
+
+EDITABLE_FIELDS = ('blood_group', 'allergies', 'medical_history', 'current_medications')
+DECISIONS = ('APPROVED', 'REJECTED')
+
+
+def validate_change(field_name, value):
+    """The reason ``value`` can't be written to ``field_name``, or None."""
+    if field_name not in EDITABLE_FIELDS:
+        return f'{field_name!r} cannot be changed by an update request'
+    max_length = PatientRecord._meta.get_field(field_name).max_length
+    if max_length and len(value) > max_length:
+        return f'{field_name} is at most {max_length} characters'
+    return None
+
+
+def review(decisions):
+    """
+    Apply ``{request_id: 'APPROVED' | 'REJECTED'}``. Returns ``{id: outcome}``
+    with outcome one of ``'approved'``, ``'rejected'``, ``'not_found'``,
+    ``'conflict'`` (already reviewed) or ``'invalid'``.
+    """
+    outcomes = dict.fromkeys(decisions, 'not_found')
+    rows = UpdateRequest.objects.filter(pk__in=decisions).order_by('created_at', 'id').values_list(
+        'pk', 'patient_id', 'field_name', 'requested_value', 'status'
+    )
+    changes, groups = {}, defaultdict(list)
+    for pk, patient_id, field_name, value, current in rows:
+        decision = decisions[pk]
+        if current != 'PENDING':
+            outcomes[pk] = 'conflict'
+        elif decision == 'APPROVED' and validate_change(field_name, value):
+            outcomes[pk] = 'invalid'
+        else:
+            groups[decision].append(pk)
+            if decision == 'APPROVED':
+                changes[pk] = (patient_id, field_name, value)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for decision, group in groups.items():
+            count = UpdateRequest.objects.filter(pk__in=group, status='PENDING').update(
+                status=decision, updated_at=now
+            )
+            if count < len(group):
+                # Some were reviewed since they were read; keep the ones this update stamped
+                outcomes.update((pk, 'conflict') for pk in group)
+                group[:] = UpdateRequest.objects.filter(
+                    pk__in=group, status=decision, updated_at=now
+                ).values_list('pk', flat=True)
+            outcomes.update((pk, decision.lower()) for pk in group)
+
+        # ``changes`` is in request order, so later requests overwrite earlier ones
+        updates = defaultdict(dict)
+        for pk in groups['APPROVED']:
+            patient_id, field_name, value = changes[pk]
+            updates[patient_id][field_name] = value
+        if updates:
+            apply(updates, now)
+    return outcomes
+
+
+def apply(updates, now):
+    """Write ``{patient_id: {field: value}}`` to the patients' records, with their revisions."""
+    fields = sorted({field for values in updates.values() for field in values})
+
+    def load(patient_ids):
+        # Every tracked field, which the revisions are diffed against
+        return {
+            record.patient_id: record
+            for record in PatientRecord.objects.select_for_update().filter(patient_id__in=patient_ids).only(
+                'id', 'patient_id', 'revision', *history.TRACKED_FIELDS
+            )
+        }
+
+    records = load(updates)
+    missing = [patient_id for patient_id in updates if patient_id not in records]
+    if missing:
+        # Patients registered before records were created at registration
+        PatientRecord.objects.bulk_create(
+            [PatientRecord(patient_id=patient_id) for patient_id in missing], ignore_conflicts=True
+        )
+        records.update(load(missing))
+    revisions = []
+    for patient_id, values in updates.items():
+        record = records[patient_id]
+        for field, value in values.items():
+            setattr(record, field, value)
+        record.updated_at = now
+        revision = history.make_revision(record, record._loaded_values, created_at=now)
+        if revision is not None:
+            revisions.append(revision)
+    PatientRecord.objects.bulk_update(records.values(), fields + ['revision', 'updated_at'])
+    PatientRecordRevision.objects.bulk_create(revisions)
+    cache.invalidate(list(updates))
@@ -0,0 +1,61 @@
+"""
+Prefix search for the patient directory.
+
+Every search term must be the start of one of the view's
+``prefix_search_fields``, compared in lower case. Instead of ``LIKE 'term%'``,
+which only some databases can answer from an index (PostgreSQL needs a
+``pattern_ops`` index, SQLite a ``NOCASE`` column), each term becomes the range
+``LOWER(field) >= 'term' AND LOWER(field) < 'terN'``, where ``terN`` is the term
+with its last character bumped. Any database answers that range from the
+``Lower()`` expression indexes declared on ``accounts.CustomUser``.
+
+Terms are lowered the way the database's ``LOWER()`` lowers the column, or the
+range would miss: SQLite only folds ASCII letters, so there ``É`` stays ``É``
+on both sides and non-ASCII letters match case-sensitively (``Émi`` and
+``ÉMILE`` find Émile, ``émile`` does not). Other databases fold all of Unicode,
+as ``str.lower()`` does.
+"""
+import string
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+MAX_TERMS = 5
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def lower(value, vendor):
+    """``value`` lowered as ``LOWER()`` lowers it on the ``vendor`` database."""
+    if vendor == 'sqlite':
+        return value.translate(ASCII_LOWER)
+    return value.lower()
+
+
+def prefix_range(prefix):
+    """The half-open range ``[start, end)`` of strings beginning with ``prefix``."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class PrefixSearchFilter(filters.BaseFilterBackend):
+    search_param = api_settings.SEARCH_PARAM
+
+    def get_terms(self, request, vendor):
+        value = request.query_params.get(self.search_param, '')
+        return [term for term in lower(value, vendor).replace(',', ' ').split() if term][:MAX_TERMS]
+
+    def filter_queryset(self, request, queryset, view):
+        fields = getattr(view, 'prefix_search_fields', None)
+        terms = self.get_terms(request, connections[queryset.db].vendor)
+        if not fields or not terms:
+            return queryset
+        aliases = {f'{field}_lower': Lower(field) for field in fields}
+        queryset = queryset.alias(**aliases)
+        for term in terms:
+            start, end = prefix_range(term)
+            queryset = queryset.filter(Q(*[
+                Q(**{f'{alias}__gte': start, f'{alias}__lt': end}) for alias in aliases
+            ], _connector=Q.OR))
+        return queryset
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import PatientRecord, UpdateRequest
+from .review import DECISIONS, EDITABLE_FIELDS
 
 class PatientRecordSerializer(serializers.ModelSerializer):
     patient_name = serializers.SerializerMethodField()
@@ -13,6 +14,20 @@ class PatientRecordSerializer(serializers.ModelSerializer):
     def get_patient_name(self, obj):
         return f"{obj.patient.first_name} {obj.patient.last_name}"
 
+class PatientDirectorySerializer(serializers.ModelSerializer):
+    """A directory row: who the patient is, without the record's long text fields."""
+    patient_name = serializers.SerializerMethodField()
+    email = serializers.EmailField(source='patient.email', read_only=True)
+    phone_number = serializers.CharField(source='patient.phone_number', read_only=True)
+
+    class Meta:
+        model = PatientRecord
+        fields = ('id', 'patient', 'patient_name', 'email', 'phone_number', 'blood_group', 'updated_at')
+        read_only_fields = fields
+
+    def get_patient_name(self, obj):
+        return f"{obj.patient.first_name} {obj.patient.last_name}"
+
 class UpdateRequestSerializer(serializers.ModelSerializer):
     patient = serializers.PrimaryKeyRelatedField(read_only=True)
     patient_name = serializers.SerializerMethodField()
@@ -25,3 +40,28 @@ class UpdateRequestSerializer(serializers.ModelSerializer):
     
     def get_patient_name(self, obj):
         return f"{obj.patient.first_name} {obj.patient.last_name}"
+
+    def validate_field_name(self, value):
+        if value not in EDITABLE_FIELDS:
+            raise serializers.ValidationError(f'{value!r} cannot be changed by an update request')
+        return value
+
+class ReviewDecisionSerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=DECISIONS)
+
+class UpdateRequestReviewSerializer(serializers.Serializer):
+    """Body of the batch review endpoint: a decision for each update request."""
+    MAX_DECISIONS = 500
+
+    decisions = ReviewDecisionSerializer(many=True, allow_empty=False, max_length=MAX_DECISIONS)
+
+    def validate_decisions(self, value):
+        decisions = {item['id']: item['status'] for item in value}
+        if len(decisions) < len(value):
+            raise serializers.ValidationError('Each request can only be decided once.')
+        return decisions
+
+class HistoryQuerySerializer(serializers.Serializer):
+    """Query parameters of the record history endpoint."""
+    at = serializers.DateTimeField(required=False)
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import cache
+from .models import PatientRecord
+
+NAME_FIELDS = {'first_name', 'last_name'}
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_patient_record(sender, instance, created, update_fields=None, **kwargs):
+    # Every patient has a record from registration on, so reading one never writes
+    if created:
+        if instance.role == 'PATIENT':
+            PatientRecord.objects.create(patient=instance)
+    elif update_fields is None or NAME_FIELDS & set(update_fields):
+        # The cached record carries the patient's name
+        cache.invalidate([instance.pk])
+
+@receiver(post_save, sender=PatientRecord)
+@receiver(post_delete, sender=PatientRecord)
+def invalidate_cached_record(sender, instance, **kwargs):
+    cache.invalidate([instance.patient_id])
@@ -1,3 +1,305 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from . import history
+from .models import PatientRecord, PatientRecordRevision, UpdateRequest
 
-# Create your tests here.
+User = get_user_model()
+
+
+class PatientDirectoryTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.url = reverse('patient-directory')
+        for username, first_name, last_name, phone_number in [
+            ('asmith', 'Alice', 'Smith', '0171000001'),
+            ('bsmithers', 'Bob', 'Smithers', '0171000002'),
+            ('cjones', 'Carol', 'Jones', '0181000003'),
+        ]:
+            patient = User.objects.create_user(
+                username=username, password='testpass123', role='PATIENT', first_name=first_name,
+                last_name=last_name, email=f'{username}@example.com', phone_number=phone_number,
+            )
+            record = patient.medical_record
+            record.blood_group, record.medical_history = 'O+', 'Long history'
+            record.save()
+
+    def names(self, response):
+        return [row['patient_name'] for row in response.data['results']]
+
+    def test_pages_are_one_query_without_the_long_fields(self):
+        self.client.force_authenticate(self.doctor)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(response), ['Carol Jones', 'Alice Smith'])
+        self.assertNotIn('medical_history', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['email'], 'cjones@example.com')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertEqual(self.names(response), ['Bob Smithers'])
+        self.assertIsNone(response.data['next'])
+
+    def test_search_matches_prefixes_of_name_email_and_phone(self):
+        self.client.force_authenticate(self.doctor)
+        for search, expected in [
+            ('smi', ['Alice Smith', 'Bob Smithers']),
+            ('SMITH b', ['Bob Smithers']),
+            ('cjon', ['Carol Jones']),
+            ('0171', ['Alice Smith', 'Bob Smithers']),
+            ('mith', []),
+        ]:
+            response = self.client.get(self.url, {'search': search})
+            self.assertEqual(self.names(response), expected, search)
+
+    def test_search_matches_non_ascii_names(self):
+        User.objects.create_user(
+            username='ezola', password='testpass123', role='PATIENT', first_name='Émile', last_name='Zola'
+        )
+        self.client.force_authenticate(self.doctor)
+        for search in ['Émi', 'ÉMILE', 'zol']:
+            response = self.client.get(self.url, {'search': search})
+            self.assertEqual(self.names(response), ['Émile Zola'], search)
+
+    def test_patients_cannot_browse(self):
+        self.client.force_authenticate(User.objects.get(username='asmith'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PatientRecordCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(
+            username='testpatient', password='testpass123', role='PATIENT', first_name='Ann'
+        )
+        self.url = reverse('patient-record')
+
+    def test_registration_creates_the_record(self):
+        self.assertTrue(PatientRecord.objects.filter(patient=self.patient).exists())
+        self.assertFalse(PatientRecord.objects.filter(patient=self.doctor).exists())
+
+    def test_reads_are_cached_and_conditional(self):
+        self.client.force_authenticate(self.patient)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['patient_name'], 'Ann ')
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], etag)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.force_authenticate(self.doctor)
+        response = self.client.get(reverse('patient-record-by-id', args=[self.patient.id]))
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(reverse('patient-record-by-id', args=[self.doctor.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_updates_and_approved_requests_invalidate(self):
+        self.client.force_authenticate(self.patient)
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, {'allergies': 'Pollen'})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['allergies'], 'Pollen')
+
+        update_request = UpdateRequest.objects.create(
+            patient=self.patient, field_name='blood_group', current_value='', requested_value='A+', reason='Lab result'
+        )
+        # The api viewset lets staff review requests
+        self.client.force_authenticate(User.objects.create_user(username='staff', password='testpass123', is_staff=True))
+        response = self.client.post(reverse('update-request-approve', args=[update_request.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(self.patient)
+        self.assertEqual(self.client.get(self.url).data['blood_group'], 'A+')
+
+    def test_reading_a_missing_record_does_not_create_it(self):
+        PatientRecord.objects.filter(patient=self.patient).delete()
+        self.client.force_authenticate(self.patient)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['id'])
+        self.assertFalse(PatientRecord.objects.exists())
+
+        self.client.patch(self.url, {'allergies': 'Pollen'})
+        self.assertEqual(self.client.get(self.url).data['allergies'], 'Pollen')
+
+
+class UpdateRequestReviewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patients = [
+            User.objects.create_user(username=f'patient{number}', password='testpass123', role='PATIENT')
+            for number in range(3)
+        ]
+        self.url = reverse('update-request-review')
+
+    def request(self, patient, field_name, value, **kwargs):
+        return UpdateRequest.objects.create(
+            patient=patient, field_name=field_name, current_value='', requested_value=value,
+            reason='Lab result', **kwargs
+        )
+
+    def review(self, decisions):
+        self.client.force_authenticate(self.doctor)
+        return self.client.post(self.url, {
+            'decisions': [{'id': pk, 'status': decision} for pk, decision in decisions]
+        }, format='json')
+
+    def test_batch_is_applied_in_a_fixed_number_of_queries(self):
+        first, second = self.patients[:2]
+        older = self.request(first, 'blood_group', 'A+')
+        newer = self.request(first, 'blood_group', 'B+')
+        allergies = self.request(first, 'allergies', 'Pollen')
+        history = self.request(second, 'medical_history', 'Asthma')
+        rejected = self.request(second, 'allergies', 'Dust')
+        reviewed = self.request(second, 'allergies', 'Nuts', status='APPROVED')
+        invalid = self.request(second, 'patient_id', '1')
+
+        # read, savepoint, one UPDATE per decision, read and bulk_update the
+        # records, insert their revisions, release
+        with self.assertNumQueries(8):
+            response = self.review([
+                (older.id, 'APPROVED'), (newer.id, 'APPROVED'), (allergies.id, 'APPROVED'),
+                (history.id, 'APPROVED'), (rejected.id, 'REJECTED'), (reviewed.id, 'APPROVED'),
+                (invalid.id, 'APPROVED'), (999999, 'REJECTED'),
+            ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['approved'], response.data['rejected']), (4, 1))
+        self.assertEqual({row['id']: row['result'] for row in response.data['results']}, {
+            older.id: 'approved', newer.id: 'approved', allergies.id: 'approved', history.id: 'approved',
+            rejected.id: 'rejected', reviewed.id: 'conflict', invalid.id: 'invalid', 999999: 'not_found',
+        })
+
+        record = PatientRecord.objects.get(patient=first)
+        self.assertEqual((record.blood_group, record.allergies), ('B+', 'Pollen'))
+        record = PatientRecord.objects.get(patient=second)
+        self.assertEqual((record.medical_history, record.allergies), ('Asthma', ''))
+        self.assertEqual(UpdateRequest.objects.get(pk=invalid.id).status, 'PENDING')
+
+        # Already reviewed the second time round
+        response = self.review([(older.id, 'REJECTED')])
+        self.assertEqual(response.data['results'], [{'id': older.id, 'result': 'conflict'}])
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        requests = [
+            self.request(patient, 'allergies', f'Allergy {number}')
+            for number in range(10) for patient in self.patients
+        ]
+        with self.assertNumQueries(7):
+            response = self.review([(update_request.id, 'APPROVED') for update_request in requests])
+        self.assertEqual(response.data['approved'], 30)
+
+    def test_only_doctors_review_and_only_editable_fields_are_requested(self):
+        patient = self.patients[0]
+        self.client.force_authenticate(patient)
+        response = self.client.post(self.url, {'decisions': [{'id': 1, 'status': 'APPROVED'}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.post(reverse('update-request-list'), {
+            'field_name': 'patient', 'current_value': '', 'requested_value': '2', 'reason': 'Mine now'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('field_name', response.data)
+
+    def test_detail_update_approves_through_the_same_path(self):
+        update_request = self.request(self.patients[0], 'blood_group', 'AB-')
+        self.client.force_authenticate(self.doctor)
+        # The api router's 'update-request-detail' shadows this app's name
+        url = f'/api/patients/updates/{update_request.id}/'
+        response = self.client.patch(url, {'status': 'APPROVED'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'APPROVED')
+        self.assertEqual(PatientRecord.objects.get(patient=self.patients[0]).blood_group, 'AB-')
+        response = self.client.patch(url, {'status': 'REJECTED'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+@override_settings(PATIENT_RECORD_SNAPSHOT_INTERVAL=4)
+class RecordHistoryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = User.objects.create_user(username='testdoctor', password='testpass123', role='DOCTOR')
+        self.patient = User.objects.create_user(username='testpatient', password='testpass123', role='PATIENT')
+        self.record = PatientRecord.objects.get(patient=self.patient)
+
+    def test_diff_and_patch_round_trip(self):
+        old = 'Asthma since 2001\nPenicillin rash\nNo surgery'
+        for new in ['', old + '\n', 'Asthma since 2001\nNo surgery\nAppendix out 2020\n', 'x']:
+            self.assertEqual(history.patch(old, history.diff(old, new)), new)
+
+    def test_revisions_store_diffs_between_snapshots(self):
+        states, lines = [], []
+        for number in range(6):
+            lines.append(f'Visit {number}: notes\n')
+            self.record.medical_history = ''.join(lines)
+            self.record.save()
+            states.append((self.record.revision, self.record.medical_history))
+            PatientRecordRevision.objects.filter(record=self.record, number=self.record.revision).update(
+                created_at=timezone.now() + timedelta(minutes=number + 1)
+            )
+
+        revisions = list(self.record.revisions.values_list('number', 'snapshot', 'changes'))
+        # Revision 1 is the record as created, 4 the interval's snapshot
+        self.assertEqual([number for number, snapshot, _ in revisions if snapshot], [1, 4])
+        self.assertEqual(revisions[4][2], {'medical_history': [[3, 3, 'Visit 3: notes\n']]})
+
+        for (number, text), minutes in zip(states, range(1, 7)):
+            at = timezone.now() + timedelta(minutes=minutes, seconds=30)
+            with self.assertNumQueries(2):
+                self.assertEqual(history.as_of(self.record.id, at), (number, {
+                    'blood_group': '', 'allergies': '', 'medical_history': text, 'current_medications': '',
+                }))
+
+    def test_stale_saves_get_their_own_revisions(self):
+        first = PatientRecord.objects.get(pk=self.record.pk)
+        second = PatientRecord.objects.get(pk=self.record.pk)
+        first.allergies = 'a\nb\n'
+        first.save()
+        # Loaded before the first save; diffed against the saved row, not what it loaded
+        second.allergies = 'a\nb\nc\n'
+        second.medical_history = 'x\n'
+        second.save()
+        first.current_medications = 'Arnica'
+        first.save()
+
+        record = PatientRecord.objects.get(pk=self.record.pk)
+        self.assertEqual(list(record.revisions.values_list('number', flat=True)), [1, 2, 3, 4])
+        self.assertEqual(record.revision, 4)
+        # The history rebuilds whatever the last save wrote
+        self.assertEqual(history.as_of(record.id, timezone.now()), (4, {
+            'blood_group': '', 'allergies': 'a\nb\n', 'medical_history': '', 'current_medications': 'Arnica',
+        }))
+
+    def test_endpoint_and_approved_requests(self):
+        update_request = UpdateRequest.objects.create(
+            patient=self.patient, field_name='allergies', current_value='', requested_value='Pollen', reason='Test'
+        )
+        before = timezone.now()
+        self.client.force_authenticate(self.doctor)
+        self.client.post(reverse('update-request-review'), {
+            'decisions': [{'id': update_request.id, 'status': 'APPROVED'}]
+        }, format='json')
+
+        url = reverse('patient-record-history-by-id', args=[self.patient.id])
+        response = self.client.get(url)
+        self.assertEqual((response.data['revision'], response.data['allergies']), (2, 'Pollen'))
+        response = self.client.get(url, {'at': before.isoformat()})
+        self.assertEqual((response.data['revision'], response.data['allergies']), (1, ''))
+        response = self.client.get(url, {'at': (before - timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(self.patient)
+        self.assertEqual(self.client.get(reverse('patient-record-history')).data['allergies'], 'Pollen')
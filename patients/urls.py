@@ -7,7 +7,11 @@ router = DefaultRouter()
 urlpatterns = [
     path('record/', views.PatientRecordDetail.as_view(), name='patient-record'),
     path('record/<int:patient_id>/', views.PatientRecordDetail.as_view(), name='patient-record-by-id'),
+    path('record/history/', views.PatientRecordHistory.as_view(), name='patient-record-history'),
+    path('record/<int:patient_id>/history/', views.PatientRecordHistory.as_view(), name='patient-record-history-by-id'),
     path('records/', views.PatientRecordList.as_view(), name='patient-record-list'),  # Added plural endpoint
+    path('directory/', views.PatientDirectory.as_view(), name='patient-directory'),
     path('updates/', views.UpdateRequestList.as_view(), name='update-request-list'),
+    path('updates/review/', views.UpdateRequestReview.as_view(), name='update-request-review'),
     path('updates/<int:pk>/', views.UpdateRequestDetail.as_view(), name='update-request-detail'),
 ] + router.urls
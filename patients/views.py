@@ -1,9 +1,24 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
-from rest_framework.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from homoeoclinic_backend.pagination import KeysetPagination
+from . import cache as record_cache, history
 from .models import PatientRecord, UpdateRequest
-from .serializers import PatientRecordSerializer, UpdateRequestSerializer
+from .review import DECISIONS, review, validate_change
+from .search import PrefixSearchFilter
+from .serializers import (
+    HistoryQuerySerializer,
+    PatientDirectorySerializer,
+    PatientRecordSerializer,
+    UpdateRequestReviewSerializer,
+    UpdateRequestSerializer,
+)
 
 class IsOwnerOrDoctor(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -18,22 +33,105 @@ class PatientRecordList(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.role == 'DOCTOR':
-            return PatientRecord.objects.all()
-        return PatientRecord.objects.filter(patient=user)
+            return PatientRecord.objects.select_related('patient')
+        return PatientRecord.objects.filter(patient=user).select_related('patient')
+
+class PatientDirectory(generics.ListAPIView):
+    """
+    Doctors' list of patients, ordered by name and searchable by the start of
+    a name, email or phone number (``?search=``). One query per page: the
+    patient is joined in, the record's long text fields are left out (they
+    load on ``PatientRecordDetail``) and pages are keyset paginated.
+    """
+    serializer_class = PatientDirectorySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('patient__last_name', 'patient__first_name', 'id')
+    filter_backends = [PrefixSearchFilter]
+    prefix_search_fields = ('patient__first_name', 'patient__last_name', 'patient__email', 'patient__phone_number')
+
+    def get_queryset(self):
+        if self.request.user.role != 'DOCTOR':
+            raise PermissionDenied('Only doctors can browse the patient directory.')
+        return PatientRecord.objects.select_related('patient').only(
+            'id', 'blood_group', 'updated_at', 'patient__id', 'patient__first_name',
+            'patient__last_name', 'patient__email', 'patient__phone_number',
+        )
+
+def get_patient_id(request, kwargs):
+    """Whose record a ``record/`` URL is about: the patient's own, or the one a doctor names."""
+    if request.user.role == 'PATIENT':
+        return request.user.pk
+    # For doctors, allow /api/patients/record/<patient_id>/
+    patient_id = kwargs.get('patient_id')
+    if patient_id:
+        return patient_id
+    # If no patient_id, return 404
+    raise ValidationError({'detail': 'Patient ID required for doctors.'})
 
 class PatientRecordDetail(generics.RetrieveUpdateAPIView):
+    """
+    A patient's own record (``record/``) or, for doctors, any patient's
+    (``record/<patient_id>/``). GETs are served from the per-patient cache in
+    ``patients/cache.py`` and support conditional requests; they never write.
+    A patient without a record yet (one registered before records were
+    created at registration) sees an empty one until their first update.
+    """
     serializer_class = PatientRecordSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrDoctor]
 
+    def get_patient_id(self):
+        return get_patient_id(self.request, self.kwargs)
+
     def get_object(self):
         if self.request.user.role == 'PATIENT':
             return PatientRecord.objects.get_or_create(patient=self.request.user)[0]
-        # For doctors, allow /api/patients/record/<patient_id>/
-        patient_id = self.kwargs.get('patient_id')
-        if patient_id:
-            return get_object_or_404(PatientRecord, patient_id=patient_id)
-        # If no patient_id, return 404
-        raise ValidationError({'detail': 'Patient ID required for doctors.'})
+        return get_object_or_404(PatientRecord.objects.select_related('patient'), patient_id=self.get_patient_id())
+
+    def retrieve(self, request, *args, **kwargs):
+        patient_id = self.get_patient_id()
+        key = record_cache.make_key(patient_id)
+        entry = cache.get(key)
+        if entry is None:
+            record = PatientRecord.objects.select_related('patient').filter(patient_id=patient_id).first()
+            if record is None:
+                if request.user.role != 'PATIENT':
+                    raise NotFound()
+                record = PatientRecord(patient=request.user)
+            entry = {'data': self.get_serializer(record).data, 'updated_at': record.updated_at}
+            cache.set(key, entry, record_cache.get_timeout())
+
+        updated_at = entry['updated_at']
+        etag = record_cache.make_etag(patient_id, updated_at) if updated_at else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=updated_at and int(updated_at.timestamp())
+        ) or Response(entry['data'])
+        if etag:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(updated_at.timestamp())
+        # Medical data: never stored by shared caches, always revalidated
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+class PatientRecordHistory(APIView):
+    """
+    The record as it was at ``?at=`` (default now), rebuilt from its revisions
+    (see ``patients/history.py``).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None, **kwargs):
+        query = HistoryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        at = query.validated_data.get('at') or timezone.now()
+        patient_id = get_patient_id(request, kwargs)
+        record_id = PatientRecord.objects.filter(patient_id=patient_id).values_list('id', flat=True).first()
+        state = record_id and history.as_of(record_id, at)
+        if not state:
+            return Response({'error': 'No revision of this record by then'}, status=status.HTTP_404_NOT_FOUND)
+        revision, values = state
+        return Response({'patient': int(patient_id), 'at': at, 'revision': revision, **values})
 
 class UpdateRequestList(generics.ListCreateAPIView):
     serializer_class = UpdateRequestSerializer
@@ -49,7 +147,7 @@ class UpdateRequestList(generics.ListCreateAPIView):
         serializer.save(patient=self.request.user)
 
 class UpdateRequestDetail(generics.RetrieveUpdateAPIView):
-    queryset = UpdateRequest.objects.all()
+    queryset = UpdateRequest.objects.select_related('patient')
     serializer_class = UpdateRequestSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrDoctor]
 
@@ -59,4 +157,45 @@ class UpdateRequestDetail(generics.RetrieveUpdateAPIView):
                 {'error': 'Only doctors can approve/reject update requests'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        return super().update(request, *args, **kwargs)
+        decision = request.data.get('status')
+        if decision is None:
+            return super().update(request, *args, **kwargs)
+
+        # Approving or rejecting goes through the same path as the batch review
+        update_request = self.get_object()
+        if decision not in DECISIONS:
+            return Response({'error': f'Invalid status: {decision}'}, status=status.HTTP_400_BAD_REQUEST)
+        outcome = review({update_request.pk: decision})[update_request.pk]
+        if outcome == 'conflict':
+            return Response({'error': 'This request has already been reviewed'}, status=status.HTTP_409_CONFLICT)
+        if outcome == 'invalid':
+            return Response(
+                {'error': validate_change(update_request.field_name, update_request.requested_value)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(self.get_serializer(self.get_object()).data)
+
+class UpdateRequestReview(APIView):
+    """
+    Approve or reject many update requests at once:
+    ``{"decisions": [{"id": 1, "status": "APPROVED"}, ...]}``. Approved changes
+    are applied to the patients' records in the same transaction (see
+    ``patients/review.py``). Each id is reported as approved, rejected,
+    not_found, conflict or invalid.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        if request.user.role != 'DOCTOR':
+            return Response(
+                {'error': 'Only doctors can approve/reject update requests'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        serializer = UpdateRequestReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        outcomes = review(serializer.validated_data['decisions'])
+        return Response({
+            'approved': sum(outcome == 'approved' for outcome in outcomes.values()),
+            'rejected': sum(outcome == 'rejected' for outcome in outcomes.values()),
+            'results': [{'id': pk, 'result': outcome} for pk, outcome in outcomes.items()],
+        })